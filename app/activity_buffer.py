@@ -0,0 +1,193 @@
+# app/activity_buffer.py
+"""
+Antrean write-behind untuk log aktivitas (download, dll.).
+
+Request hanya memasukkan event ke antrean di memori lalu langsung lanjut
+mengirim file. Thread latar belakang menulis event secara batch (INSERT
+multi-baris + satu COMMIT) ketika batch penuh atau interval flush habis.
+
+Perilaku saat lonjakan: antrean dibatasi ``ACTIVITY_QUEUE_SIZE`` event. Jika
+penuh, request menunggu paling lama ``ACTIVITY_ENQUEUE_TIMEOUT`` detik, lalu
+menulis event-nya sendiri secara sinkron (perilaku lama). Event tidak pernah
+dibuang hanya karena antrean penuh; lonjakan diubah menjadi perlambatan.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import crud
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", 500))
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", 1.0))
+ACTIVITY_QUEUE_SIZE = int(os.getenv("ACTIVITY_QUEUE_SIZE", 10000))
+ACTIVITY_ENQUEUE_TIMEOUT = float(os.getenv("ACTIVITY_ENQUEUE_TIMEOUT", 0.05))
+# Percobaan ulang untuk batch yang gagal ditulis sebelum batch dibuang
+ACTIVITY_FLUSH_RETRIES = 3
+
+_STOP = object()
+
+
+class ActivityBuffer:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        batch_size: int = ACTIVITY_BATCH_SIZE,
+        flush_interval: float = ACTIVITY_FLUSH_INTERVAL,
+        max_pending: int = ACTIVITY_QUEUE_SIZE,
+        enqueue_timeout: float = ACTIVITY_ENQUEUE_TIMEOUT,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Penghitung sederhana untuk observasi
+        self.enqueued = 0
+        self.flushed = 0
+        self.overflowed = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._thread = threading.Thread(target=self._run, name="activity-buffer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Menghentikan worker setelah semua event di antrean ditulis."""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            # put() tanpa timeout: sentinel harus masuk walau antrean sedang penuh
+            self._queue.put(_STOP)
+            thread.join(timeout)
+            self._thread = None
+
+    @staticmethod
+    def _event(user_id: int, ebook_id: int, action: str) -> dict:
+        return {
+            "user_id": user_id,
+            "ebook_id": ebook_id,
+            "action": action,
+            "timestamp": datetime.now(timezone.utc),
+        }
+
+    def record(self, db: Session, user_id: int, ebook_id: int, action: str):
+        """
+        Mencatat satu event aktivitas. Jika worker tidak berjalan atau antrean
+        penuh, event ditulis langsung memakai sesi ``db`` milik request.
+        """
+        event = self._event(user_id, ebook_id, action)
+        if self.running:
+            try:
+                self._queue.put(event, timeout=self.enqueue_timeout)
+                self.enqueued += 1
+                return
+            except queue.Full:
+                self.overflowed += 1
+        crud.create_activity_logs_bulk(db, [event])
+
+    async def record_async(self, db, user_id: int, ebook_id: int, action: str):
+        """
+        Varian record() untuk AsyncSession. Event loop tidak pernah menunggu
+        antrean: jika antrean penuh, event langsung ditulis lewat ``db``.
+        """
+        from . import async_crud
+
+        event = self._event(user_id, ebook_id, action)
+        if self.running:
+            try:
+                self._queue.put_nowait(event)
+                self.enqueued += 1
+                return
+            except queue.Full:
+                self.overflowed += 1
+        await async_crud.create_activity_logs_bulk(db, [event])
+
+    def _run(self):
+        batch: List[dict] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                # Kuras sisa antrean sebelum berhenti
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        self._flush(batch)
+                        batch = []
+                self._flush(batch)
+                return
+
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, batch: List[dict]):
+        if not batch:
+            return
+        for attempt in range(1, ACTIVITY_FLUSH_RETRIES + 1):
+            db = self.session_factory()
+            try:
+                crud.create_activity_logs_bulk(db, batch)
+                self.flushed += len(batch)
+                return
+            except Exception:
+                db.rollback()
+                logger.exception(
+                    "Gagal menulis %d log aktivitas (percobaan %d/%d)",
+                    len(batch), attempt, ACTIVITY_FLUSH_RETRIES,
+                )
+                time.sleep(min(2 ** attempt * 0.1, 2.0))
+            finally:
+                db.close()
+        self.dropped += len(batch)
+        logger.error("%d log aktivitas dibuang setelah gagal ditulis", len(batch))
+
+
+# Instance yang dipakai aplikasi; dijalankan dan dikuras oleh lifespan di main.py
+activity_buffer = ActivityBuffer()
+
+
+def record_activity(db: Session, user_id: int, ebook_id: int, action: str):
+    """Mencatat aktivitas lewat antrean write-behind milik aplikasi."""
+    activity_buffer.record(db, user_id=user_id, ebook_id=ebook_id, action=action)
+
+
+async def record_activity_async(db, user_id: int, ebook_id: int, action: str):
+    """Varian async dari record_activity untuk handler yang memakai AsyncSession."""
+    await activity_buffer.record_async(db, user_id=user_id, ebook_id=ebook_id, action=action)
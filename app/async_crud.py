@@ -0,0 +1,60 @@
+# app/async_crud.py
+"""
+Varian async dari fungsi crud untuk jalur baca yang paling sering dipanggil.
+
+Query, pagination, dan profil eager loading tidak ditulis ulang: fungsi crud
+yang sama dijalankan lewat ``AsyncSession.run_sync``. I/O database berjalan di
+driver async (asyncpg/aiosqlite) di event loop, tanpa memakai thread pool
+Starlette. Semua relasi yang diserialisasi sudah dimuat oleh profil, sehingga
+tidak ada lazy load setelah fungsi kembali.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud
+
+
+async def get_ebook(db: AsyncSession, ebook_id: int):
+    return await db.run_sync(crud.get_ebook, ebook_id)
+
+
+async def get_ebooks_page(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
+    return await db.run_sync(
+        crud.get_ebooks_page, skip=skip, limit=limit, search=search, sort_by=sort_by, cursor=cursor
+    )
+
+
+async def get_ebook_rows(
+    db: AsyncSession,
+    fields: Tuple[str, ...],
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
+    return await db.run_sync(
+        crud.get_ebook_rows, fields, skip=skip, limit=limit, search=search, sort_by=sort_by, cursor=cursor
+    )
+
+
+async def get_ebooks_by_ids(db: AsyncSession, ebook_ids: List[int]):
+    return await db.run_sync(crud.get_ebooks_by_ids, ebook_ids)
+
+
+async def get_ebook_reviews_page(
+    db: AsyncSession, ebook_id: int, limit: int = 100, cursor: Optional[str] = None, sort: str = "oldest"
+):
+    return await db.run_sync(crud.get_ebook_reviews_page, ebook_id=ebook_id, limit=limit, cursor=cursor, sort=sort)
+
+
+async def create_activity_logs_bulk(db: AsyncSession, events: List[Dict]):
+    await db.run_sync(crud.create_activity_logs_bulk, events)
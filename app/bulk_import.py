@@ -0,0 +1,529 @@
+# app/bulk_import.py
+"""
+Impor katalog dalam jumlah besar dari sebuah direktori atau manifest CSV/JSON.
+
+Sumber yang didukung:
+
+- direktori: semua ``*.pdf`` di dalamnya (rekursif). Cover diambil dari file
+  gambar dengan nama yang sama (``buku.jpg`` untuk ``buku.pdf``), dan nama
+  subdirektori dipakai sebagai kategori.
+- manifest ``.csv`` atau ``.json`` (list objek) dengan kolom ``file`` dan
+  opsional ``cover``, ``title``, ``author``, ``description``,
+  ``publication_year``, ``page_count``, ``categories`` (dipisah ``;`` di CSV,
+  list di JSON). Path relatif terhadap lokasi manifest dan harus berada di
+  dalam direktori manifest; baris yang tidak valid dihitung gagal.
+
+File di-hash dan disalin ke penyimpanan blob secara paralel di thread pool,
+sementara batch sebelumnya dimasukkan ke database. Judul, penulis, dan jumlah
+halaman yang kosong diisi dari metadata PDF jika pypdf terpasang (opsional).
+
+Setiap batch dimasukkan dalam satu transaksi, lalu path sumbernya dicatat di
+file checkpoint, sehingga impor yang terhenti bisa dijalankan ulang dan
+melanjutkan dari batch terakhir. PDF yang sudah ada di katalog (blob yang
+sama) dilewati, termasuk yang ter-commit tepat sebelum proses mati.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import content_index, crud, models, response_cache, storage, thumbnails
+from . import search as search_index
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Endpoint admin hanya boleh mengimpor dari dalam direktori ini
+IMPORT_ROOT = os.getenv("IMPORT_ROOT", "imports")
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 4))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 200))
+# Berisi path sumber di server; jangan di bawah storage.UPLOAD_DIRECTORY yang disajikan publik
+CHECKPOINT_DIRECTORY = os.getenv("IMPORT_CHECKPOINT_DIRECTORY", os.path.join("data", "import-checkpoints"))
+
+COVER_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+CATEGORY_SEPARATOR = ";"
+
+
+class ImportItem(NamedTuple):
+    # Path absolut PDF sumber, sekaligus kunci di file checkpoint
+    key: str
+    cover_path: Optional[str] = None
+    title: Optional[str] = None
+    author: Optional[str] = None
+    description: Optional[str] = None
+    publication_year: Optional[int] = None
+    page_count: Optional[int] = None
+    categories: Tuple[str, ...] = ()
+    # Alasan penolakan untuk baris manifest yang tidak valid; item tidak disalin
+    rejected: Optional[str] = None
+
+
+class PreparedItem(NamedTuple):
+    item: ImportItem
+    pdf_blob: storage.StoredBlob
+    cover_blob: Optional[storage.StoredBlob]
+
+
+class ImportReport:
+    """Penghitung progres dan throughput satu proses impor."""
+
+    def __init__(self, source: Optional[str] = None):
+        self.source = source
+        self.imported = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes_copied = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def files_per_second(self) -> float:
+        elapsed = self.elapsed_seconds
+        return self.imported / elapsed if elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        elapsed = self.elapsed_seconds
+        return self.bytes_copied / (1024 * 1024) / elapsed if elapsed else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "source": self.source,
+            "running": self.finished is None,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "bytes_copied": self.bytes_copied,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "files_per_second": round(self.files_per_second, 2),
+            "megabytes_per_second": round(self.megabytes_per_second, 2),
+            "error": self.error,
+        }
+
+    def summary(self) -> str:
+        return (
+            f"{self.imported} diimpor, {self.skipped} dilewati, {self.failed} gagal dalam "
+            f"{self.elapsed_seconds:.1f} detik ({self.files_per_second:.1f} file/detik, "
+            f"{self.megabytes_per_second:.1f} MB/detik)"
+        )
+
+
+# --- Sumber impor ---
+
+def _int_or_none(value) -> Optional[int]:
+    if value in (None, ""):
+        return None
+    return int(value)
+
+
+def _text_or_none(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _categories(value) -> Tuple[str, ...]:
+    if not value:
+        return ()
+    names = value.split(CATEGORY_SEPARATOR) if isinstance(value, str) else value
+    return tuple(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+
+
+def _sibling_cover(pdf_path: str) -> Optional[str]:
+    stem = os.path.splitext(pdf_path)[0]
+    for extension in COVER_EXTENSIONS:
+        for candidate in (stem + extension, stem + extension.upper()):
+            if os.path.exists(candidate):
+                return candidate
+    return None
+
+
+def iter_directory(directory: str) -> Iterator[ImportItem]:
+    """Semua PDF di dalam direktori, dengan urutan yang stabil antar-run."""
+    directory = os.path.abspath(directory)
+    for current, subdirectories, files in os.walk(directory):
+        subdirectories.sort()
+        relative = os.path.relpath(current, directory)
+        categories = () if relative == "." else (os.path.basename(current),)
+        for name in sorted(files):
+            if not name.lower().endswith(".pdf"):
+                continue
+            path = os.path.join(current, name)
+            yield ImportItem(key=path, cover_path=_sibling_cover(path), categories=categories)
+
+
+def _manifest_rows(path: str) -> Iterable[Dict]:
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as handle:
+            rows = json.load(handle)
+        if not isinstance(rows, list):
+            raise ValueError("Manifest JSON harus berupa list objek.")
+        return rows
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        return list(csv.DictReader(handle))
+
+
+def _is_within(root: str, path: str) -> bool:
+    try:
+        return os.path.commonpath([root, path]) == root
+    except ValueError:  # drive berbeda di Windows
+        return False
+
+
+def _manifest_item(base: str, row) -> ImportItem:
+    """Satu baris manifest; ValueError jika barisnya tidak valid."""
+    if not isinstance(row, dict):
+        raise ValueError("baris manifest harus berupa objek")
+    file_path = _text_or_none(row.get("file"))
+    if file_path is None:
+        raise ValueError("kolom 'file' kosong")
+    cover_path = _text_or_none(row.get("cover"))
+    key = os.path.realpath(os.path.join(base, file_path))
+    cover_path = os.path.realpath(os.path.join(base, cover_path)) if cover_path else None
+    if not all(_is_within(base, candidate) for candidate in (key, cover_path) if candidate):
+        raise ValueError("path file atau cover berada di luar direktori manifest")
+    try:
+        return ImportItem(
+            key=key,
+            cover_path=cover_path,
+            title=_text_or_none(row.get("title")),
+            author=_text_or_none(row.get("author")),
+            description=_text_or_none(row.get("description")),
+            publication_year=_int_or_none(row.get("publication_year")),
+            page_count=_int_or_none(row.get("page_count")),
+            categories=_categories(row.get("categories")),
+        )
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"nilai kolom tidak valid ({exc})") from exc
+
+
+def iter_manifest(path: str) -> Iterator[ImportItem]:
+    """
+    Baris-baris manifest CSV/JSON; path file relatif terhadap manifest. Baris
+    yang tidak valid (tanpa ``file``, angka yang tidak bisa dibaca, atau path
+    absolut, ``..``, maupun symlink yang keluar dari direktori manifest)
+    ditandai ``rejected`` agar dihitung gagal tanpa menghentikan impor.
+    """
+    base = os.path.dirname(os.path.realpath(path))
+    for number, row in enumerate(_manifest_rows(path), start=1):
+        try:
+            item = _manifest_item(base, row)
+        except ValueError as exc:
+            item = ImportItem(key=f"{path}#{number}", rejected=str(exc))
+        yield item
+
+
+def iter_source(source: str) -> Iterator[ImportItem]:
+    if os.path.isdir(source):
+        return iter_directory(source)
+    if source.lower().endswith((".csv", ".json")):
+        return iter_manifest(source)
+    raise ValueError(f"Sumber impor harus direktori atau manifest .csv/.json: {source}")
+
+
+def resolve_source(source: str) -> str:
+    """Path sumber untuk endpoint admin; harus ada dan berada di dalam IMPORT_ROOT."""
+    root = os.path.realpath(IMPORT_ROOT)
+    path = os.path.realpath(os.path.join(root, source))
+    if not _is_within(root, path):
+        raise ValueError("Sumber impor harus berada di dalam IMPORT_ROOT.")
+    if not os.path.exists(path):
+        raise ValueError(f"Sumber impor tidak ditemukan: {source}")
+    return path
+
+
+# --- Checkpoint ---
+
+def checkpoint_path_for(source: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(source).encode()).hexdigest()
+    return os.path.join(CHECKPOINT_DIRECTORY, f"{digest}.txt")
+
+
+class Checkpoint:
+    """File teks berisi path sumber yang sudah ter-commit, satu per baris."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as handle:
+                self.done = {line.rstrip("\n") for line in handle if line.strip()}
+
+    def mark(self, keys: List[str]):
+        if not keys:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.writelines(f"{key}\n" for key in keys)
+            handle.flush()
+            os.fsync(handle.fileno())
+        self.done.update(keys)
+
+
+# --- Persiapan file (thread pool) ---
+
+def _pypdf():
+    """Mengimpor pypdf saat dibutuhkan saja; None jika tidak terpasang."""
+    try:
+        import pypdf
+    except ImportError:
+        return None
+    return pypdf
+
+
+def read_pdf_metadata(path: str) -> Dict:
+    """Judul, penulis, dan jumlah halaman dari info PDF (kosong tanpa pypdf)."""
+    pypdf = _pypdf()
+    if pypdf is None:
+        return {}
+    try:
+        reader = pypdf.PdfReader(path, strict=False)
+        info = reader.metadata
+        return {
+            "title": _text_or_none(info.title) if info else None,
+            "author": _text_or_none(info.author) if info else None,
+            "page_count": len(reader.pages),
+        }
+    except Exception as exc:  # PDF rusak tidak menggagalkan impor
+        logger.warning("Metadata PDF %s tidak terbaca: %s", path, exc)
+        return {}
+
+
+def _save(path: str) -> storage.StoredBlob:
+    with open(path, "rb") as source:
+        return storage.save_file(source, os.path.basename(path))
+
+
+def prepare_item(item: ImportItem) -> PreparedItem:
+    """Menyalin PDF dan cover ke blob storage dan melengkapi metadata yang kosong."""
+    pdf_blob = _save(item.key)
+    cover_blob = _save(item.cover_path) if item.cover_path else None
+    if item.title is None or item.author is None or item.page_count is None:
+        metadata = read_pdf_metadata(pdf_blob.path)
+        item = item._replace(
+            title=item.title or metadata.get("title")
+            or os.path.splitext(os.path.basename(item.key))[0].replace("_", " "),
+            author=item.author or metadata.get("author"),
+            page_count=item.page_count or metadata.get("page_count"),
+        )
+    return PreparedItem(item=item, pdf_blob=pdf_blob, cover_blob=cover_blob)
+
+
+# --- Insert per batch ---
+
+def _category_map(db: Session, names) -> Dict[str, models.Category]:
+    """Kategori berdasarkan nama; yang belum ada dibuat dalam transaksi yang sama."""
+    names = set(names)
+    if not names:
+        return {}
+    existing = {
+        category.name: category
+        for category in db.query(models.Category).filter(models.Category.name.in_(names))
+    }
+    for name in names - existing.keys():
+        existing[name] = models.Category(name=name)
+        db.add(existing[name])
+    return existing
+
+
+def insert_batch(db: Session, prepared: List[PreparedItem]) -> Tuple[List[PreparedItem], List[PreparedItem]]:
+    """
+    Memasukkan satu batch eBook dalam satu transaksi. Mengembalikan (dimasukkan,
+    dilewati); yang dilewati adalah PDF yang sudah ada di katalog.
+    """
+    paths = {entry.pdf_blob.path for entry in prepared}
+    existing = {
+        path for (path,) in db.query(models.Ebook.file_path).filter(models.Ebook.file_path.in_(paths))
+    }
+    inserted, skipped = [], []
+    for entry in prepared:
+        if entry.pdf_blob.path in existing:
+            skipped.append(entry)
+        else:
+            existing.add(entry.pdf_blob.path)
+            inserted.append(entry)
+
+    categories = _category_map(db, (name for entry in inserted for name in entry.item.categories))
+    ebooks = []
+    for entry in inserted:
+        crud.acquire_stored_file(db, entry.pdf_blob)
+        if entry.cover_blob is not None:
+            crud.acquire_stored_file(db, entry.cover_blob)
+        item = entry.item
+        ebook = models.Ebook(
+            title=item.title[:200],
+            author=item.author[:100] if item.author else None,
+            description=item.description,
+            publication_year=item.publication_year,
+            page_count=item.page_count,
+            file_path=entry.pdf_blob.path,
+            cover_image_path=entry.cover_blob.path if entry.cover_blob is not None else None,
+            categories=[categories[name] for name in item.categories],
+            stats=models.EbookStats(),
+        )
+        # Ditambahkan langsung agar ikut flush bersama relasi kategorinya
+        db.add(ebook)
+        ebooks.append(ebook)
+    db.flush()
+    for ebook in ebooks:
+        search_index.index_ebook(db, ebook)
+    db.commit()
+    return inserted, skipped
+
+
+# --- Pipeline ---
+
+def _chunks(items: Iterable[ImportItem], size: int) -> Iterator[List[ImportItem]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _Importer:
+    def __init__(self, db: Session, report: ImportReport, checkpoint: Checkpoint, progress: Optional[Callable]):
+        self.db = db
+        self.report = report
+        self.checkpoint = checkpoint
+        self.progress = progress
+
+    def _collect(self, futures: List[Tuple[ImportItem, Future]]) -> List[PreparedItem]:
+        prepared = []
+        for item, future in futures:
+            try:
+                prepared.append(future.result())
+            except Exception as exc:
+                self.report.failed += 1
+                logger.error("Gagal menyalin %s: %s", item.key, exc)
+        return prepared
+
+    def _insert(self, prepared: List[PreparedItem]) -> Tuple[List[PreparedItem], List[PreparedItem]]:
+        """Mengembalikan (selesai, baru dimasukkan); selesai termasuk duplikat yang dilewati."""
+        try:
+            inserted, skipped = insert_batch(self.db, prepared)
+        except Exception as exc:
+            # Satu baris bermasalah tidak boleh menggagalkan seluruh batch:
+            # ulangi per item untuk memisahkan yang gagal
+            self.db.rollback()
+            logger.warning("Batch gagal (%s), diulang per item.", exc)
+            inserted, skipped = [], []
+            for entry in prepared:
+                try:
+                    done, duplicate = insert_batch(self.db, [entry])
+                except Exception as item_exc:
+                    self.db.rollback()
+                    self.report.failed += 1
+                    logger.error("Gagal mengimpor %s: %s", entry.item.key, item_exc)
+                    continue
+                inserted += done
+                skipped += duplicate
+        self.report.skipped += len(skipped)
+        return inserted + skipped, inserted
+
+    def process(self, futures: List[Tuple[ImportItem, Future]]):
+        prepared = self._collect(futures)
+        if not prepared:
+            return
+        done, inserted = self._insert(prepared)
+        self.checkpoint.mark([entry.item.key for entry in done])
+        self.report.imported += len(inserted)
+        self.report.bytes_copied += sum(
+            entry.pdf_blob.size + (entry.cover_blob.size if entry.cover_blob else 0) for entry in inserted
+        )
+        if inserted:
+            response_cache.invalidate_ebook()
+            for entry in inserted:
+                content_index.schedule(entry.pdf_blob.path)
+                if entry.cover_blob is not None:
+                    thumbnails.schedule(entry.cover_blob.path)
+        if self.progress is not None:
+            self.progress(self.report)
+
+
+def import_ebooks(
+    source: str,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    workers: int = IMPORT_WORKERS,
+    checkpoint_path: Optional[str] = None,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+    report: Optional[ImportReport] = None,
+) -> ImportReport:
+    """
+    Mengimpor semua eBook dari ``source``. Penyalinan batch berikutnya berjalan
+    di thread pool selagi batch sebelumnya dimasukkan ke database.
+    """
+    report = report or ImportReport(source)
+    checkpoint = Checkpoint(checkpoint_path or checkpoint_path_for(source))
+    db = SessionLocal()
+    importer = _Importer(db, report, checkpoint, progress)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-import") as executor:
+            pending = None
+            for chunk in _chunks(iter_source(source), batch_size):
+                remaining = [item for item in chunk if item.key not in checkpoint.done]
+                report.skipped += len(chunk) - len(remaining)
+                for item in remaining:
+                    if item.rejected:
+                        report.failed += 1
+                        logger.error("Baris manifest %s ditolak: %s", item.key, item.rejected)
+                remaining = [item for item in remaining if not item.rejected]
+                futures = [(item, executor.submit(prepare_item, item)) for item in remaining]
+                if pending:
+                    importer.process(pending)
+                pending = futures
+            if pending:
+                importer.process(pending)
+    finally:
+        db.close()
+        report.finished = time.monotonic()
+    return report
+
+
+# --- Job latar belakang untuk endpoint admin ---
+
+_current_report: Optional[ImportReport] = None
+_job_lock = threading.Lock()
+
+
+def _run_job(source: str, batch_size: int, report: ImportReport):
+    try:
+        import_ebooks(source, batch_size=batch_size, report=report)
+    except Exception as exc:
+        report.error = str(exc)
+        report.finished = time.monotonic()
+        logger.exception("Impor %s gagal", source)
+
+
+def start_job(source: str, batch_size: Optional[int] = None) -> Optional[ImportReport]:
+    """Menjalankan impor di thread latar belakang; None jika masih ada impor yang berjalan."""
+    global _current_report
+    with _job_lock:
+        if _current_report is not None and _current_report.finished is None:
+            return None
+        report = _current_report = ImportReport(source)
+    thread = threading.Thread(
+        target=_run_job, args=(source, batch_size or IMPORT_BATCH_SIZE, report), name="bulk-import", daemon=True
+    )
+    thread.start()
+    return report
+
+
+def current_job() -> Optional[ImportReport]:
+    return _current_report
@@ -0,0 +1,494 @@
+# app/content_index.py
+"""
+Ekstraksi teks PDF di latar belakang dan indeks pencarian isi buku.
+
+Teks diambil per halaman di process pool (pypdf, dependensi opsional), lalu
+disimpan terkompresi zlib di tabel ``document_pages`` dengan kunci sha256 isi
+file. Karena kuncinya isi file, PDF yang sama yang di-upload ulang tidak
+diekstrak lagi, dan ekstraksi ulang (versi extractor baru atau ``--force``)
+hanya menulis dan meng-index ulang halaman yang teksnya berubah.
+
+Backend indeks dipilih per dialek, seperti app/search.py:
+
+- PostgreSQL: kolom tsvector ``search_vector`` di document_pages dengan indeks GIN.
+- SQLite: tabel FTS5 contentless ``document_pages_fts`` (teks tidak disimpan dua kali).
+- Lainnya (atau SQLite tanpa FTS5): search.InvertedIndex di dalam proses.
+
+Snippet dibuat dari teks halaman yang didekompresi, hanya untuk hasil yang
+dikembalikan.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import zlib
+from datetime import datetime, timezone
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from . import database, models, storage
+from .search import InvertedIndex, normalize, tokenize
+
+logger = logging.getLogger(__name__)
+
+CONTENT_EXTRACTION_WORKERS = int(os.getenv("CONTENT_EXTRACTION_WORKERS", 1))
+# Naikkan jika cara ekstraksi berubah, agar backfill mengekstrak ulang semua dokumen
+EXTRACTOR_VERSION = 1
+COMPRESSION_LEVEL = 6
+SNIPPET_CHARS = 160
+# Hasil per eBook dibatasi agar satu buku tidak memenuhi seluruh halaman hasil
+MAX_HITS_PER_EBOOK = 3
+CANDIDATE_FACTOR = 5
+
+
+class PageHit(NamedTuple):
+    ebook: models.Ebook
+    page_number: int
+    snippet: str
+
+
+def compress(value: str) -> bytes:
+    return zlib.compress(value.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decompress(value: bytes) -> str:
+    return zlib.decompress(value).decode("utf-8")
+
+
+def _text_hash(value: str) -> str:
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+
+# --- Ekstraksi (process pool) ---
+
+def _pypdf():
+    """Mengimpor pypdf saat dibutuhkan saja; None jika tidak terpasang."""
+    try:
+        import pypdf
+    except ImportError:
+        return None
+    return pypdf
+
+
+def available() -> bool:
+    return _pypdf() is not None
+
+
+def extract_pages(path: str) -> List[Tuple[str, bytes]]:
+    """
+    Mengambil teks setiap halaman PDF. Dijalankan di process pool;
+    mengembalikan (hash teks, teks terkompresi) per halaman agar data yang
+    dikirim balik ke proses utama tetap kecil.
+    """
+    reader = _pypdf().PdfReader(path, strict=False)
+    pages = []
+    for page in reader.pages:
+        try:
+            content = page.extract_text() or ""
+        except Exception:  # Halaman rusak tidak menggagalkan seluruh dokumen
+            content = ""
+        content = " ".join(content.split())
+        pages.append((_text_hash(content), compress(content)))
+    return pages
+
+
+# --- Backend indeks ---
+
+class PostgresContentBackend:
+    name = "postgresql"
+    index_name = "ix_document_pages_search"
+
+    def ensure(self, connection):
+        connection.execute(text("ALTER TABLE document_pages ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {self.index_name} ON document_pages USING gin (search_vector)"
+        ))
+
+    def search(self, db: Session, term: str, limit: int) -> List[Tuple[int, float]]:
+        tokens = tokenize(term)
+        if not tokens:
+            return []
+        rows = db.execute(
+            text(
+                "SELECT id, ts_rank(search_vector, query) AS rank "
+                "FROM document_pages, to_tsquery('simple', :query) AS query "
+                "WHERE search_vector @@ query ORDER BY rank DESC, id LIMIT :limit"
+            ),
+            {"query": " & ".join(f"{token}:*" for token in tokens), "limit": limit},
+        )
+        return [(row.id, row.rank) for row in rows]
+
+    def upsert(self, db: Session, page_id: int, content: str):
+        db.execute(
+            text("UPDATE document_pages SET search_vector = to_tsvector('simple', :content) WHERE id = :id"),
+            {"id": page_id, "content": normalize(content)},
+        )
+
+    def delete(self, db: Session, page_id: int, content: str):
+        # Ikut terhapus bersama baris document_pages
+        pass
+
+
+class SqliteFtsContentBackend:
+    name = "sqlite-fts5"
+    table_name = "document_pages_fts"
+
+    def ensure(self, connection) -> bool:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": self.table_name},
+        ).first()
+        if exists:
+            return False
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE {self.table_name} USING fts5("
+            "body, content = '', tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+        return True
+
+    def search(self, db: Session, term: str, limit: int) -> List[Tuple[int, float]]:
+        tokens = tokenize(term)
+        if not tokens:
+            return []
+        rows = db.execute(
+            text(
+                f"SELECT rowid AS id, bm25({self.table_name}) AS rank FROM {self.table_name} "
+                f"WHERE {self.table_name} MATCH :match ORDER BY rank LIMIT :limit"
+            ),
+            {"match": " ".join(f'"{token}"*' for token in tokens), "limit": limit},
+        )
+        # bm25 bernilai negatif; semakin kecil semakin relevan
+        return [(row.id, -row.rank) for row in rows]
+
+    def upsert(self, db: Session, page_id: int, content: str):
+        db.execute(
+            text(f"INSERT INTO {self.table_name} (rowid, body) VALUES (:id, :content)"),
+            {"id": page_id, "content": content},
+        )
+
+    def delete(self, db: Session, page_id: int, content: str):
+        # Tabel contentless hanya bisa dihapus dengan menyebut ulang isi lamanya
+        db.execute(
+            text(
+                f"INSERT INTO {self.table_name} ({self.table_name}, rowid, body) "
+                "VALUES ('delete', :id, :content)"
+            ),
+            {"id": page_id, "content": content},
+        )
+
+
+class MemoryContentBackend:
+    """Fallback di dalam proses; dimuat dari document_pages saat pencarian pertama."""
+
+    name = "memory"
+
+    def __init__(self):
+        self.index = InvertedIndex()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def _ensure_loaded(self, db: Session):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            rows = db.query(models.DocumentPage.id, models.DocumentPage.text_zlib).yield_per(500)
+            for row in rows:
+                self.index.add(row.id, {"content": decompress(row.text_zlib)}, {})
+            self._loaded = True
+
+    def search(self, db: Session, term: str, limit: int) -> List[Tuple[int, float]]:
+        self._ensure_loaded(db)
+        return self.index.search(term, limit=limit)
+
+    def upsert(self, db: Session, page_id: int, content: str):
+        if self._loaded:
+            self.index.add(page_id, {"content": content}, {})
+
+    def delete(self, db: Session, page_id: int, content: str):
+        self.index.remove(page_id)
+
+
+_backends: Dict[object, object] = {}
+_backends_lock = threading.Lock()
+
+
+def ensure_index(engine):
+    """Menyiapkan struktur indeks isi untuk engine tertentu. Aman dipanggil berulang kali."""
+    with _backends_lock:
+        backend = _backends.get(engine)
+        if backend is not None:
+            return backend
+
+        dialect = engine.dialect.name
+        if dialect == "postgresql":
+            backend = PostgresContentBackend()
+            with engine.begin() as connection:
+                backend.ensure(connection)
+        elif dialect == "sqlite":
+            backend = SqliteFtsContentBackend()
+            try:
+                with engine.begin() as connection:
+                    created = backend.ensure(connection)
+                if created:
+                    _reindex_all(engine, backend)
+            except OperationalError:
+                backend = MemoryContentBackend()
+        else:
+            backend = MemoryContentBackend()
+
+        _backends[engine] = backend
+        return backend
+
+
+def _reindex_all(engine, backend):
+    """Mengisi indeks baru dari halaman yang sudah tersimpan."""
+    db = Session(bind=engine)
+    try:
+        rows = db.query(models.DocumentPage.id, models.DocumentPage.text_zlib).yield_per(500)
+        for row in rows:
+            backend.upsert(db, row.id, decompress(row.text_zlib))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _has_table(engine, name: str) -> bool:
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": name}
+        ).first() is not None
+
+
+def select_backend(engine):
+    """
+    Memilih backend indeks isi untuk engine tanpa DDL; dipakai saat worker start
+    dan per request. Strukturnya disiapkan ensure_index lewat
+    migrations.migrate. Hanya SQLite yang belum punya tabel FTS masih dibuat
+    di sini (SQLite hanya dipakai untuk pengembangan).
+    """
+    with _backends_lock:
+        backend = _backends.get(engine)
+        if backend is not None:
+            return backend
+        dialect = engine.dialect.name
+        if dialect == "postgresql":
+            backend = _backends[engine] = PostgresContentBackend()
+            return backend
+        if dialect == "sqlite" and _has_table(engine, SqliteFtsContentBackend.table_name):
+            backend = _backends[engine] = SqliteFtsContentBackend()
+            return backend
+    return ensure_index(engine)
+
+def get_backend(db: Session):
+    engine = database.primary_engine(db.get_bind())
+    return _backends.get(engine) or select_backend(engine)
+
+
+# --- Penyimpanan teks ---
+
+def document_key(path: str) -> str:
+    """sha256 isi file; diambil dari nama blob jika file content-addressed."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    if storage.is_content_address(name):
+        return name
+    hasher = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(storage.CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def store_document(db: Session, sha256: str, path: str, pages: List[Tuple[str, bytes]]) -> int:
+    """
+    Menyimpan hasil ekstraksi. Hanya halaman yang hash teksnya berubah yang
+    ditulis dan di-index ulang; mengembalikan jumlah halaman tersebut.
+    """
+    backend = get_backend(db)
+    existing = {
+        page.page_number: page
+        for page in db.query(models.DocumentPage).filter(models.DocumentPage.sha256 == sha256)
+    }
+    changed = 0
+    for page_number, (text_hash, compressed) in enumerate(pages, start=1):
+        page = existing.pop(page_number, None)
+        if page is not None and page.text_hash == text_hash:
+            continue
+        if page is None:
+            page = models.DocumentPage(sha256=sha256, page_number=page_number)
+            db.add(page)
+        else:
+            backend.delete(db, page.id, decompress(page.text_zlib))
+        page.text_hash = text_hash
+        page.text_zlib = compressed
+        db.flush()
+        backend.upsert(db, page.id, decompress(compressed))
+        changed += 1
+    # Halaman yang sudah tidak ada di versi baru
+    for page in existing.values():
+        backend.delete(db, page.id, decompress(page.text_zlib))
+        db.delete(page)
+
+    _set_status(db, sha256, path, "done", page_count=len(pages))
+    db.commit()
+    return changed
+
+
+def _set_status(db: Session, sha256: str, path: str, status: str, page_count: int = 0, error: Optional[str] = None):
+    document = db.get(models.DocumentText, sha256)
+    if document is None:
+        document = models.DocumentText(sha256=sha256)
+        db.add(document)
+    document.path = path
+    document.status = status
+    document.page_count = page_count
+    document.error = error
+    document.extractor_version = EXTRACTOR_VERSION
+    document.extracted_at = datetime.now(timezone.utc)
+
+
+def remove_document(db: Session, path: str):
+    """Menghapus teks dan indeks milik blob yang sudah dihapus dari disk."""
+    document = db.query(models.DocumentText).filter(models.DocumentText.path == path).first()
+    if document is None:
+        return
+    backend = get_backend(db)
+    for page in db.query(models.DocumentPage).filter(models.DocumentPage.sha256 == document.sha256):
+        backend.delete(db, page.id, decompress(page.text_zlib))
+        db.delete(page)
+    db.delete(document)
+
+
+def needs_extraction(db: Session, sha256: str) -> bool:
+    document = db.get(models.DocumentText, sha256)
+    return document is None or document.extractor_version < EXTRACTOR_VERSION
+
+
+# --- Penjadwalan ---
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_coordinator: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executors() -> Tuple[ThreadPoolExecutor, ProcessPoolExecutor]:
+    global _process_pool, _coordinator
+    with _executor_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=CONTENT_EXTRACTION_WORKERS)
+            _coordinator = ThreadPoolExecutor(
+                max_workers=CONTENT_EXTRACTION_WORKERS, thread_name_prefix="content-index"
+            )
+        return _coordinator, _process_pool
+
+
+def index_document(path: str, force: bool = False) -> Optional[int]:
+    """
+    Mengekstrak dan meng-index satu PDF jika belum pernah (atau ``force``).
+    Dijalankan di thread koordinator; ekstraksinya sendiri di process pool.
+    Mengembalikan jumlah halaman yang berubah, atau None jika dilewati.
+    """
+    sha256 = document_key(path)
+    db = database.SessionLocal()
+    try:
+        if not force and not needs_extraction(db, sha256):
+            return None
+        try:
+            pages = _get_executors()[1].submit(extract_pages, path).result()
+        except Exception as exc:
+            # Dicatat agar backfill tidak terus mencoba PDF yang rusak
+            db.rollback()
+            _set_status(db, sha256, path, "failed", error=str(exc)[:1000])
+            db.commit()
+            raise
+        return store_document(db, sha256, path, pages)
+    finally:
+        db.close()
+
+
+def _log_failure(future: Future):
+    exception = future.exception()
+    if exception is not None:
+        logger.error("Gagal mengekstrak teks PDF: %s", exception)
+
+
+def schedule(path: Optional[str], force: bool = False) -> Optional[Future]:
+    """Menjadwalkan ekstraksi teks di latar belakang (fire-and-forget)."""
+    if not path or not available():
+        return None
+    future = _get_executors()[0].submit(index_document, path, force)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def shutdown():
+    global _process_pool, _coordinator
+    with _executor_lock:
+        if _coordinator is not None:
+            _coordinator.shutdown(wait=True)
+            _process_pool.shutdown(wait=True)
+            _process_pool = _coordinator = None
+
+
+# --- Pencarian ---
+
+def _snippet(content: str, tokens: List[str]) -> str:
+    """Potongan teks di sekitar kemunculan pertama salah satu token."""
+    normalized = normalize(content)
+    start = -1
+    for token in tokens:
+        match = re.search(r"\b" + re.escape(token), normalized)
+        if match and (start < 0 or match.start() < start):
+            start = match.start()
+    start = max(0, start - SNIPPET_CHARS // 4) if start >= 0 else 0
+    end = min(len(content), start + SNIPPET_CHARS)
+    # Posisi diambil dari teks ternormalisasi; pada teks berdiakritik potongannya bisa sedikit bergeser
+    snippet = content[start:end].strip()
+    return f"{'…' if start > 0 else ''}{snippet}{'…' if end < len(content) else ''}"
+
+
+def search_content(db: Session, term: str, limit: int = 20) -> List[PageHit]:
+    """Halaman-halaman yang memuat semua token pencarian, dari yang paling relevan."""
+    from .crud import with_profile
+
+    tokens = tokenize(term)
+    if not tokens:
+        return []
+    ranked = get_backend(db).search(db, term, limit * CANDIDATE_FACTOR)
+    if not ranked:
+        return []
+    pages = {
+        page.id: page
+        for page in db.query(models.DocumentPage).filter(models.DocumentPage.id.in_([page_id for page_id, _ in ranked]))
+    }
+    paths = {
+        document.sha256: document.path
+        for document in db.query(models.DocumentText)
+        .filter(models.DocumentText.sha256.in_({page.sha256 for page in pages.values()}))
+    }
+    ebooks_by_path: Dict[str, List[models.Ebook]] = {}
+    for ebook in with_profile(db.query(models.Ebook), "ebook").filter(models.Ebook.file_path.in_(set(paths.values()))):
+        ebooks_by_path.setdefault(ebook.file_path, []).append(ebook)
+
+    hits: List[PageHit] = []
+    per_ebook: Dict[int, int] = {}
+    for page_id, _ in ranked:
+        page = pages.get(page_id)
+        if page is None:
+            continue
+        content = None
+        for ebook in ebooks_by_path.get(paths.get(page.sha256), []):
+            if per_ebook.get(ebook.id, 0) >= MAX_HITS_PER_EBOOK:
+                continue
+            per_ebook[ebook.id] = per_ebook.get(ebook.id, 0) + 1
+            content = content if content is not None else decompress(page.text_zlib)
+            hits.append(PageHit(ebook=ebook, page_number=page.page_number, snippet=_snippet(content, tokens)))
+            if len(hits) >= limit:
+                return hits
+    return hits
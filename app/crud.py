@@ -1,11 +1,34 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, or_ 
-from . import models, schemas, security
-from fastapi import UploadFile
-from typing import List, Optional
-import shutil, os
+from sqlalchemy.orm import Session, contains_eager, joinedload, selectinload
+from sqlalchemy import func, update, insert, case, cast, select, and_, exists, literal, Float
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from . import models, schemas, security, pagination, partitions, recommendations, response_cache, storage, thumbnails, content_index, search as search_index
+from typing import Dict, List, Optional, Tuple
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 
 
+# Profil eager loading per bentuk respons. Relasi yang ikut diserialisasi oleh
+# skema dimuat sekaligus, sehingga jumlah query per endpoint tetap berapa pun
+# ukuran halamannya (tanpa N+1 dari lazy loading).
+LOAD_PROFILES = {
+    # schemas.Ebook -> categories, stats (ringkasan rating)
+    "ebook": (selectinload(models.Ebook.categories), joinedload(models.Ebook.stats)),
+    # Sama, untuk query yang sudah JOIN ebook_stats sendiri (sort popular/rating)
+    "ebook_joined_stats": (selectinload(models.Ebook.categories), contains_eager(models.Ebook.stats)),
+    # schemas.Review -> user
+    "review": (joinedload(models.Review.user),),
+    # schemas.ActivityLog -> ebook -> categories, stats
+    "activity": (
+        joinedload(models.ActivityLog.ebook).selectinload(models.Ebook.categories),
+        joinedload(models.ActivityLog.ebook).joinedload(models.Ebook.stats),
+    ),
+}
+
+def with_profile(query, profile: str):
+    """Menerapkan profil eager loading ke sebuah query."""
+    return query.options(*LOAD_PROFILES[profile])
+
 def get_user_by_email(db: Session, email: str):
     """Mencari user berdasarkan email."""
     return db.query(models.User).filter(models.User.email == email).first()
@@ -23,85 +46,313 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
-UPLOAD_DIRECTORY = "uploads"
-os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
+def update_user_password_hash(db: Session, db_user: models.User, hashed_password: str):
+    """Menyimpan hash password baru (rehash saat login)."""
+    db_user.hashed_password = hashed_password
+    db.commit()
+    return db_user
+
+def update_user_role(db: Session, db_user: models.User, role: str):
+    """Mengubah role user dan membuang sesi autentikasi yang di-cache."""
+    db_user.role = role
+    db.commit()
+    db.refresh(db_user)
+    security.invalidate_user(db_user.id)
+    return db_user
+
+UPLOAD_DIRECTORY = storage.UPLOAD_DIRECTORY
 
 # Fungsi CRUD untuk eBook
+
+# Kunci urutan keyset untuk setiap mode sort_by: (kolom, menurun?, boleh NULL?).
+# Kolom terakhir selalu id agar urutan stabil. popular dan rating memakai
+# LEFT JOIN ebook_stats; eBook tanpa baris agregat dihitung 0.
+EBOOK_SORT_KEYS = {
+    "id": [(models.Ebook.id, False, False)],
+    "newest": [(models.Ebook.publication_year, True, True), (models.Ebook.id, True, False)],
+    "popular": [(func.coalesce(models.EbookStats.download_count, 0), True, False), (models.Ebook.id, True, False)],
+    "rating": [(func.coalesce(models.EbookStats.rating_avg, 0.0), True, False), (models.Ebook.id, True, False)],
+}
+
+def _ebook_sort_values(ebook: models.Ebook, sort: str) -> list:
+    """Nilai kunci urutan dari satu eBook, untuk dimasukkan ke cursor."""
+    if sort == "newest":
+        return [ebook.publication_year, ebook.id]
+    if sort == "popular":
+        return [ebook.stats.download_count if ebook.stats else 0, ebook.id]
+    if sort == "rating":
+        return [ebook.stats.rating_avg if ebook.stats else 0.0, ebook.id]
+    return [ebook.id]
+
+def _ebook_sort_mode(search: Optional[str], sort_by: Optional[str]) -> str:
+    if search and sort_by is None:
+        return "relevance"
+    return sort_by if sort_by in EBOOK_SORT_KEYS else "id"
+
 def get_ebooks(
     db: Session,
     skip: int = 0,
     limit: int = 100,
     search: Optional[str] = None,
     sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
 ):
     """
     Mengambil daftar semua eBook, dengan opsi pencarian dan pengurutan.
+    Jika ``cursor`` diberikan, halaman diambil dengan keyset dan ``skip`` diabaikan.
     """
-    query = db.query(models.Ebook)
+    sort = _ebook_sort_mode(search, sort_by)
+    # popular dan rating memakai tabel agregat ebook_stats yang terindeks
+    if sort in ("popular", "rating"):
+        query = with_profile(db.query(models.Ebook).outerjoin(models.Ebook.stats), "ebook_joined_stats")
+    else:
+        query = with_profile(db.query(models.Ebook), "ebook")
+    return _paginate_ebooks(db, query, sort, skip, limit, search, cursor).all()
 
-    # Logika Pencarian (sudah ada)
+def _paginate_ebooks(db: Session, query, sort: str, skip: int, limit: int, search: Optional[str], cursor: Optional[str]):
+    """Pencarian, urutan, dan halaman katalog; dipakai bersama oleh get_ebooks dan get_ebook_rows."""
+    # Pencarian memakai indeks teks; tanpa sort_by hasil diurutkan menurut relevansi
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                models.Ebook.title.ilike(search_term),
-                models.Ebook.author.ilike(search_term),
-            )
-        )
+        query = search_index.apply_search(db, query, search, order=sort == "relevance")
 
-    # === LOGIKA PENGURUTAN BARU ===
-    if sort_by == "popular":
-        # Mengurutkan berdasarkan jumlah unduhan
-        query = (
-            query.outerjoin(models.ActivityLog)
-            .filter(models.ActivityLog.action == "download")
-            .group_by(models.Ebook.id)
-            .order_by(func.count(models.ActivityLog.id).desc())
-        )
-    elif sort_by == "rating":
-        # Mengurutkan berdasarkan rata-rata rating
-        query = (
-            query.outerjoin(models.Review)
-            .group_by(models.Ebook.id)
-            .order_by(func.avg(models.Review.rating).desc().nullslast())
-        )
-    elif sort_by == "newest":
-        # Mengurutkan berdasarkan tahun terbit terbaru
-        query = query.order_by(models.Ebook.publication_year.desc())
+    if sort == "relevance":
+        # Skor relevansi tidak stabil untuk keyset, jadi cursor menyimpan offset
+        if cursor:
+            skip = max(0, int(pagination.decode_cursor(cursor, sort, 1)[0] or 0))
+        return query.order_by(models.Ebook.id.asc()).offset(skip).limit(limit)
+
+    keys = EBOOK_SORT_KEYS[sort]
+    query = query.order_by(*pagination.order_clauses(keys))
+    if cursor:
+        values = pagination.decode_cursor(cursor, sort, len(keys))
+        query = query.filter(pagination.after_condition(keys, values))
     else:
-        # Pengurutan default jika tidak ada parameter sort_by
-        query = query.order_by(models.Ebook.id.asc())
+        query = query.offset(skip)
 
-    return query.offset(skip).limit(limit).all()
+    return query.limit(limit)
+
+def get_ebooks_page(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
+) -> Tuple[List[models.Ebook], Optional[str]]:
+    """
+    Seperti get_ebooks, tetapi juga mengembalikan cursor halaman berikutnya
+    (None jika sudah halaman terakhir).
+    """
+    ebooks = get_ebooks(db, skip=skip, limit=limit + 1, search=search, sort_by=sort_by, cursor=cursor)
+    if len(ebooks) <= limit:
+        return ebooks, None
+
+    ebooks = ebooks[:limit]
+    sort = _ebook_sort_mode(search, sort_by)
+    if sort == "relevance":
+        offset = max(0, int(pagination.decode_cursor(cursor, sort, 1)[0] or 0)) if cursor else skip
+        return ebooks, pagination.encode_cursor(sort, [offset + limit])
+    return ebooks, pagination.encode_cursor(sort, _ebook_sort_values(ebooks[-1], sort))
+
+# Field yang boleh dipilih lewat parameter fields= pada GET /ebooks/.
+# cover_thumbnails diturunkan dari cover_image_path dan thumbnail_sizes; categories dimuat dengan
+# satu query tambahan untuk seluruh halaman; rating dari JOIN ebook_stats.
+EBOOK_LIST_COLUMNS = {
+    "id": models.Ebook.id,
+    "title": models.Ebook.title,
+    "author": models.Ebook.author,
+    "description": models.Ebook.description,
+    "publication_year": models.Ebook.publication_year,
+    "page_count": models.Ebook.page_count,
+    "cover_image_path": models.Ebook.cover_image_path,
+}
+EBOOK_RATING_COLUMNS = [models.EbookStats.review_count, models.EbookStats.rating_avg] + [
+    getattr(models.EbookStats, f"rating_{value}") for value in models.RATING_VALUES
+]
+EBOOK_LIST_FIELDS = tuple(EBOOK_LIST_COLUMNS) + ("cover_thumbnails", "categories", "rating")
+EBOOK_FIELD_PRESETS = {"summary": tuple(schemas.EbookSummary.model_fields)}
+
+def parse_ebook_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Mengurai parameter fields= ("summary" atau daftar field dipisah koma)
+    menjadi tuple berurutan kanonis; id selalu disertakan. None berarti
+    bentuk lengkap schemas.Ebook. ValueError untuk field yang tidak dikenal.
+    """
+    if not value:
+        return None
+    requested = {"id"}
+    for name in (part.strip() for part in value.split(",")):
+        if name in EBOOK_FIELD_PRESETS:
+            requested.update(EBOOK_FIELD_PRESETS[name])
+        elif name in EBOOK_LIST_FIELDS:
+            requested.add(name)
+        elif name:
+            raise ValueError(f"Unknown field: {name}")
+    return tuple(name for name in EBOOK_LIST_FIELDS if name in requested)
+
+def _ebook_categories(db: Session, ebook_ids: List[int]) -> Dict[int, List[dict]]:
+    rows = (
+        db.query(models.EbookCategory.ebook_id, models.Category.id, models.Category.name)
+        .join(models.Category, models.Category.id == models.EbookCategory.category_id)
+        .filter(models.EbookCategory.ebook_id.in_(ebook_ids))
+        .order_by(models.EbookCategory.ebook_id, models.Category.id)
+    )
+    categories = {ebook_id: [] for ebook_id in ebook_ids}
+    for ebook_id, category_id, name in rows:
+        categories[ebook_id].append({"id": category_id, "name": name})
+    return categories
+
+def get_ebook_rows(
+    db: Session,
+    fields: Tuple[str, ...],
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Versi proyeksi dari get_ebooks_page untuk listing baca-saja: hanya kolom
+    ``fields`` yang di-SELECT, dikembalikan sebagai dict biasa tanpa membuat
+    objek ORM (tanpa identity map, tanpa kolom description jika tidak diminta).
+    """
+    sort = _ebook_sort_mode(search, sort_by)
+    keys = EBOOK_SORT_KEYS.get(sort, [])
+    columns = _ebook_row_columns(fields)
+    columns += [column.label(f"sort_{index}") for index, (column, _, _) in enumerate(keys)]
+
+    query = db.query(*columns).select_from(models.Ebook)
+    if sort in ("popular", "rating") or "rating" in fields:
+        query = query.outerjoin(models.Ebook.stats)
+    rows = _paginate_ebooks(db, query, sort, skip, limit + 1, search, cursor).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if sort == "relevance":
+            offset = max(0, int(pagination.decode_cursor(cursor, sort, 1)[0] or 0)) if cursor else skip
+            next_cursor = pagination.encode_cursor(sort, [offset + limit])
+        else:
+            last = rows[-1]._mapping
+            next_cursor = pagination.encode_cursor(sort, [last[f"sort_{index}"] for index in range(len(keys))])
+
+    return _ebook_row_items(db, rows, fields), next_cursor
+
+def get_ebook_rows_by_ids(db: Session, fields: Tuple[str, ...], ebook_ids: List[int]) -> List[dict]:
+    """Proyeksi ``fields`` untuk banyak eBook sesuai urutan ``ebook_ids``; id yang tidak ada dilewati."""
+    if not ebook_ids:
+        return []
+    query = db.query(*_ebook_row_columns(fields)).select_from(models.Ebook)
+    if "rating" in fields:
+        query = query.outerjoin(models.Ebook.stats)
+    rows = query.filter(models.Ebook.id.in_(ebook_ids)).all()
+    by_id = {item["id"]: item for item in _ebook_row_items(db, rows, fields)}
+    return [by_id[ebook_id] for ebook_id in ebook_ids if ebook_id in by_id]
+
+def _ebook_row_columns(fields: Tuple[str, ...]) -> list:
+    selected = [name for name in EBOOK_LIST_COLUMNS if name in fields]
+    if "cover_thumbnails" in fields and "cover_image_path" not in selected:
+        selected.append("cover_image_path")
+    columns = [EBOOK_LIST_COLUMNS[name].label(name) for name in selected]
+    if "cover_thumbnails" in fields:
+        columns.append(models.Ebook.thumbnail_sizes.label("thumbnail_sizes"))
+    if "rating" in fields:
+        columns += [column.label(f"stats_{column.key}") for column in EBOOK_RATING_COLUMNS]
+    return columns
+
+def _ebook_row_items(db: Session, rows, fields: Tuple[str, ...]) -> List[dict]:
+    categories = _ebook_categories(db, [row.id for row in rows]) if "categories" in fields and rows else {}
+    items = []
+    for row in rows:
+        values = row._mapping
+        item = {}
+        for name in fields:
+            if name == "cover_thumbnails":
+                item[name] = thumbnails.thumbnail_urls(values["cover_image_path"], values["thumbnail_sizes"])
+            elif name == "categories":
+                item[name] = categories[values["id"]]
+            elif name == "rating":
+                item[name] = _row_rating(values)
+            else:
+                item[name] = values[name]
+        items.append(item)
+    return items
+
+def create_ebook(
+    db: Session,
+    ebook: schemas.EbookCreate,
+    pdf_blob: storage.StoredBlob,
+    cover_blob: Optional[storage.StoredBlob] = None,
+):
+    """
+    Membuat eBook baru dari file yang sudah disimpan oleh storage.save_upload,
+    sekaligus menambah jumlah referensi blob-nya.
+    """
+    # Catat referensi blob dalam transaksi yang sama dengan entri eBook
+    acquire_stored_file(db, pdf_blob)
+    if cover_blob is not None:
+        acquire_stored_file(db, cover_blob)
 
-def create_ebook(db: Session, ebook: schemas.EbookCreate, pdf_file: UploadFile, cover_image: UploadFile):
-    """Membuat eBook baru, termasuk menyimpan file."""
-    # Simpan file PDF
-    pdf_path = os.path.join(UPLOAD_DIRECTORY, pdf_file.filename)
-    with open(pdf_path, "wb") as buffer:
-        shutil.copyfileobj(pdf_file.file, buffer)
-        
-    # Simpan file cover image
-    cover_path = os.path.join(UPLOAD_DIRECTORY, cover_image.filename)
-    with open(cover_path, "wb") as buffer:
-        shutil.copyfileobj(cover_image.file, buffer)
-        
     # Buat entri di database
     db_ebook = models.Ebook(
         title=ebook.title,
         author=ebook.author,
         description=ebook.description,
         publication_year=ebook.publication_year,
-        file_path=pdf_path,
-        cover_image_path=cover_path
+        file_path=pdf_blob.path,
+        cover_image_path=cover_blob.path if cover_blob is not None else None,
+        stats=models.EbookStats(),
     )
     db.add(db_ebook)
+    db.flush()
+    search_index.index_ebook(db, db_ebook)
     db.commit()
-    db.refresh(db_ebook)
-    return db_ebook
+    response_cache.invalidate_ebook()
+    return get_ebook(db, db_ebook.id)
+
 def get_ebook(db: Session, ebook_id: int):
     """Mengambil satu eBook berdasarkan ID-nya."""
-    return db.query(models.Ebook).filter(models.Ebook.id == ebook_id).first()
+    return with_profile(db.query(models.Ebook), "ebook").filter(models.Ebook.id == ebook_id).first()
+
+# Batas jumlah id per request batch (GET /ebooks/batch, favorit massal)
+BATCH_MAX_IDS = 500
+
+def parse_ebook_ids(values: List[str]) -> List[int]:
+    """
+    Mengurai parameter ids= (boleh dipisah koma dan/atau diulang) menjadi
+    daftar id unik sesuai urutan permintaan. ValueError jika tidak valid.
+    """
+    ids = []
+    for value in values:
+        for part in value.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if not part.isdigit():
+                raise ValueError(f"Invalid ebook id: {part}")
+            ids.append(int(part))
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > BATCH_MAX_IDS:
+        raise ValueError(f"At most {BATCH_MAX_IDS} ids per request")
+    return ids
+
+def get_ebooks_by_ids(db: Session, ebook_ids: List[int]) -> List[models.Ebook]:
+    """Mengambil banyak eBook dalam satu query, sesuai urutan ``ebook_ids``; id yang tidak ada dilewati."""
+    if not ebook_ids:
+        return []
+    ebooks = with_profile(db.query(models.Ebook), "ebook").filter(models.Ebook.id.in_(ebook_ids)).all()
+    by_id = {ebook.id: ebook for ebook in ebooks}
+    return [by_id[ebook_id] for ebook_id in ebook_ids if ebook_id in by_id]
+
+def _row_rating(values) -> Optional[dict]:
+    if values["stats_review_count"] is None:
+        return None
+    histogram = [values[f"stats_rating_{value}"] for value in models.RATING_VALUES]
+    return models.rating_summary(values["stats_review_count"], values["stats_rating_avg"], histogram)
+
+def ebook_exists(db: Session, ebook_id: int) -> bool:
+    """Memeriksa apakah eBook ada, tanpa memuat kolom dan relasinya."""
+    return db.query(models.Ebook.id).filter(models.Ebook.id == ebook_id).first() is not None
 
 def update_ebook(db: Session, db_ebook: models.Ebook, ebook_update: schemas.EbookUpdate):
     """Memperbarui data eBook di database."""
@@ -113,22 +364,102 @@ def update_ebook(db: Session, db_ebook: models.Ebook, ebook_update: schemas.Eboo
         setattr(db_ebook, key, value)
         
     db.add(db_ebook)
+    search_index.index_ebook(db, db_ebook)
     db.commit()
+    response_cache.invalidate_ebook(db_ebook.id)
     db.refresh(db_ebook)
     return db_ebook
 
 def delete_ebook(db: Session, db_ebook: models.Ebook):
-    """Menghapus eBook dari database dan file fisiknya."""
-    if db_ebook.file_path and os.path.exists(db_ebook.file_path):
-        os.remove(db_ebook.file_path)
-    if db_ebook.cover_image_path and os.path.exists(db_ebook.cover_image_path):
-        os.remove(db_ebook.cover_image_path)
-        
+    """
+    Menghapus eBook dari database dan melepas referensi blob-nya. Blob yang
+    tidak lagi direferensikan tidak dihapus di sini, melainkan oleh
+    collect_orphan_blobs (manage gc-blobs) setelah masa tenggang: upload
+    paralel dengan isi yang sama bisa saja sedang memakai ulang blob itu.
+    File lama di luar penyimpanan content-addressed langsung dihapus.
+    """
+    paths = [path for path in (db_ebook.file_path, db_ebook.cover_image_path) if path]
+    unreferenced = [path for path in paths if release_stored_file(db, path)]
+
     # Hapus data dari database
+    ebook_id = db_ebook.id
+    search_index.remove_ebook(db, ebook_id)
     db.delete(db_ebook)
     db.commit()
+    response_cache.invalidate_ebook(ebook_id)
+
+    # File lama (bukan blob) tidak pernah dipakai bersama, aman dihapus setelah COMMIT
+    for path in unreferenced:
+        if not storage.is_blob_path(path):
+            _remove_file(db, path)
+    db.commit()
     return {"message": "Ebook deleted successfully"}
 
+# Fungsi untuk referensi blob di penyimpanan content-addressed
+def get_stored_file(db: Session, path: str):
+    return db.query(models.StoredFile).filter(models.StoredFile.path == path).first()
+
+def acquire_stored_file(db: Session, blob: storage.StoredBlob):
+    """Menambah jumlah referensi sebuah blob (membuat barisnya jika belum ada)."""
+    stored = models.StoredFile
+    result = db.execute(
+        update(stored).where(stored.path == blob.path).values(ref_count=stored.ref_count + 1),
+        execution_options={"synchronize_session": False},
+    )
+    if result.rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.add(models.StoredFile(path=blob.path, sha256=blob.sha256, size=blob.size, ref_count=1))
+    except IntegrityError:
+        # Upload paralel dengan isi yang sama lebih dulu membuat barisnya
+        db.execute(
+            update(stored).where(stored.path == blob.path).values(ref_count=stored.ref_count + 1),
+            execution_options={"synchronize_session": False},
+        )
+
+def release_stored_file(db: Session, path: str) -> bool:
+    """
+    Mengurangi jumlah referensi blob. Mengembalikan True jika file di disk
+    boleh dihapus: referensi terakhir sudah dilepas, atau file lama di luar
+    penyimpanan content-addressed.
+    """
+    if not storage.is_blob_path(path):
+        return True
+    stored = models.StoredFile
+    db.execute(
+        update(stored)
+        .where(stored.path == path, stored.ref_count > 0)
+        .values(ref_count=stored.ref_count - 1),
+        execution_options={"synchronize_session": False},
+    )
+    deleted = db.execute(
+        stored.__table__.delete().where(stored.path == path, stored.ref_count <= 0)
+    )
+    return deleted.rowcount > 0
+
+def _remove_file(db: Session, path: str):
+    storage.remove_blob(path)
+    thumbnails.remove_thumbnails(path)
+    content_index.remove_document(db, path)
+
+def collect_orphan_blobs(db: Session, min_age_seconds: float = 3600) -> int:
+    """
+    Menghapus blob di disk yang tidak tercatat di stored_files: milik eBook
+    yang sudah dihapus, atau dari upload yang gagal disimpan ke database.
+    Blob yang lebih muda dari ``min_age_seconds`` dilewati karena mungkin
+    sedang dipakai upload (storage menyegarkan mtime blob yang dipakai ulang).
+    """
+    removed = 0
+    for path in storage.iter_blob_paths():
+        # Referensi dicek dulu, umur file sesudahnya: upload yang memakai ulang
+        # blob di antara kedua cek sudah menyegarkan mtime-nya
+        if get_stored_file(db, path) is None and storage.is_stale(path, min_age_seconds):
+            _remove_file(db, path)
+            removed += 1
+    db.commit()
+    return removed
+
 # Fungsi CRUD untuk fitur favorit
 def get_favorite(db: Session, user_id: int, ebook_id: int):
     """Mencari entri favorit spesifik."""
@@ -136,52 +467,469 @@ def get_favorite(db: Session, user_id: int, ebook_id: int):
 
 def add_to_favorites(db: Session, user_id: int, ebook_id: int):
     """Menambahkan buku ke daftar favorit pengguna."""
-    db_favorite = get_favorite(db, user_id=user_id, ebook_id=ebook_id)
-    if db_favorite:
-        return db_favorite 
-    
-    db_favorite = models.Favorite(user_id=user_id, ebook_id=ebook_id)
-    db.add(db_favorite)
+    add_favorites(db, user_id=user_id, ebook_ids=[ebook_id])
+    return get_favorite(db, user_id=user_id, ebook_id=ebook_id)
+
+def add_favorites(db: Session, user_id: int, ebook_ids: List[int]) -> int:
+    """
+    Menambahkan banyak buku ke favorit dalam satu INSERT ... SELECT dan satu
+    transaksi. Entri yang sudah ada dilewati lewat ON CONFLICT DO NOTHING
+    (aman dari request serentak), id yang bukan eBook diabaikan.
+    Mengembalikan jumlah entri baru.
+    """
+    if not ebook_ids:
+        return 0
+    table = models.Favorite.__table__
+    source = select(literal(user_id), models.Ebook.id).where(models.Ebook.id.in_(ebook_ids))
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = dialect_insert(table).from_select(["user_id", "ebook_id"], source).on_conflict_do_nothing(
+            index_elements=["user_id", "ebook_id"]
+        )
+    else:
+        existing = select(models.Favorite.ebook_id).where(models.Favorite.user_id == user_id)
+        statement = insert(table).from_select(["user_id", "ebook_id"], source.where(models.Ebook.id.not_in(existing)))
+    added = db.execute(statement).rowcount
     db.commit()
-    db.refresh(db_favorite)
-    return db_favorite
+    return added
 
 def remove_from_favorites(db: Session, db_favorite: models.Favorite):
     """Menghapus buku dari daftar favorit."""
     db.delete(db_favorite)
     db.commit()
 
+def remove_favorites(db: Session, user_id: int, ebook_ids: List[int]) -> int:
+    """Menghapus banyak buku dari favorit dengan satu DELETE; mengembalikan jumlah yang terhapus."""
+    if not ebook_ids:
+        return 0
+    result = db.execute(
+        models.Favorite.__table__.delete().where(
+            models.Favorite.user_id == user_id, models.Favorite.ebook_id.in_(ebook_ids)
+        )
+    )
+    db.commit()
+    return result.rowcount
+
 def get_user_favorites(db: Session, user_id: int):
     """Mengambil semua buku favorit dari seorang pengguna."""
-    return db.query(models.Ebook).join(models.Favorite).filter(models.Favorite.user_id == user_id).all()
+    query = with_profile(db.query(models.Ebook), "ebook")
+    return query.join(models.Favorite).filter(models.Favorite.user_id == user_id).all()
 
 # Fungsi CRUD untuk fitur activity log
 def create_activity_log(db: Session, user_id: int, ebook_id: int, action: str):
     """Membuat entri log aktivitas baru."""
-    db_log = models.ActivityLog(user_id=user_id, ebook_id=ebook_id, action=action)
+    timestamp = datetime.now(timezone.utc)
+    db_log = models.ActivityLog(user_id=user_id, ebook_id=ebook_id, action=action, timestamp=timestamp)
     db.add(db_log)
+    if action == "download":
+        increment_ebook_stats(db, ebook_id, downloads=1)
+    record_activity_rollups(db, [
+        {"user_id": user_id, "ebook_id": ebook_id, "action": action, "timestamp": timestamp}
+    ])
     db.commit()
     db.refresh(db_log)
     return db_log
 
-def get_user_activity_logs(db: Session, user_id: int):
-    """Mengambil semua log aktivitas dari seorang pengguna."""
-    return db.query(models.ActivityLog).filter(models.ActivityLog.user_id == user_id).order_by(models.ActivityLog.timestamp.desc()).all()
+def create_activity_logs_bulk(db: Session, events: List[Dict]):
+    """
+    Menulis banyak log aktivitas sekaligus dengan INSERT multi-baris dan satu
+    COMMIT, termasuk pembaruan agregat unduhan dan rollup dashboard. Dipakai
+    oleh antrean write-behind (app/activity_buffer.py).
+    """
+    # Riwayat unduhan sebelum batch ini, untuk pembaruan inkremental rekomendasi
+    history = recommendations.collect_history(db, events)
+    db.execute(insert(models.ActivityLog), events)
+    downloads = Counter(event["ebook_id"] for event in events if event["action"] == "download")
+    # Urutan id tetap agar worker paralel tidak saling deadlock
+    for ebook_id in sorted(downloads):
+        increment_ebook_stats(db, ebook_id, downloads=downloads[ebook_id])
+    record_activity_rollups(db, events)
+    db.commit()
+    # Hanya memperbarui model di memori; tidak pernah melempar exception
+    # agar batch yang sudah ter-COMMIT tidak ditulis ulang oleh activity_buffer
+    recommendations.apply_downloads(history, events)
+
+# Riwayat diurutkan dari yang terbaru; id memutus seri timestamp yang sama.
+# Urutan ini dilayani langsung oleh indeks ix_activity_log_user_time.
+HISTORY_SORT_KEYS = [
+    (models.ActivityLog.timestamp, True, True),
+    (models.ActivityLog.id, True, False),
+]
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _timestamp_key(moment: Optional[datetime]) -> Optional[int]:
+    """Timestamp sebagai mikrodetik sejak epoch (nilai cursor harus numerik)."""
+    if moment is None:
+        return None
+    return (_as_utc(moment) - _EPOCH) // timedelta(microseconds=1)
+
+def _timestamp_from_key(key: Optional[int]) -> Optional[datetime]:
+    if key is None:
+        return None
+    return _EPOCH + timedelta(microseconds=int(key))
+
+def get_user_activity_logs(db: Session, user_id: int, limit: Optional[int] = None, cursor: Optional[str] = None):
+    """
+    Mengambil log aktivitas seorang pengguna, dari yang terbaru.
+    Dipaginasi dengan keyset (timestamp, id) agar di tabel yang dipartisi per
+    bulan hanya partisi terbaru yang perlu dibaca.
+    """
+    query = (
+        with_profile(db.query(models.ActivityLog), "activity")
+        .filter(models.ActivityLog.user_id == user_id)
+        .order_by(*pagination.order_clauses(HISTORY_SORT_KEYS))
+    )
+    if cursor:
+        timestamp_key, last_id = pagination.decode_cursor(cursor, "history", 2)
+        values = [_timestamp_from_key(timestamp_key), last_id]
+        query = query.filter(pagination.after_condition(HISTORY_SORT_KEYS, values))
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def get_user_activity_logs_page(db: Session, user_id: int, limit: int = 50, cursor: Optional[str] = None):
+    """Satu halaman riwayat aktivitas beserta cursor halaman berikutnya."""
+    logs = get_user_activity_logs(db, user_id=user_id, limit=limit + 1, cursor=cursor)
+    if len(logs) <= limit:
+        return logs, None
+    logs = logs[:limit]
+    last = logs[-1]
+    return logs, pagination.encode_cursor("history", [_timestamp_key(last.timestamp), last.id])
+
+# Fungsi untuk agregat statistik per eBook
+def increment_ebook_stats(db: Session, ebook_id: int, downloads: int = 0, reviews: int = 0, rating: int = 0):
+    """
+    Memperbarui agregat ebook_stats secara atomik dengan UPDATE col = col + n.
+    reviews adalah selisih jumlah ulasan (1 saat dibuat, -1 saat dihapus)
+    dengan bintang 'rating'. Dipanggil setelah perubahan sumbernya (log
+    unduhan, ulasan) masuk ke sesi. Tidak melakukan commit; ikut transaksi
+    pemanggil.
+    """
+    stats = models.EbookStats
+    values = {}
+    if downloads:
+        values["download_count"] = stats.download_count + downloads
+    if reviews:
+        new_count = stats.review_count + reviews
+        new_sum = stats.rating_sum + reviews * rating
+        histogram_column = f"rating_{rating}"
+        values["review_count"] = new_count
+        values["rating_sum"] = new_sum
+        values["rating_avg"] = case((new_count > 0, cast(new_sum, Float) / new_count), else_=0.0)
+        values[histogram_column] = getattr(stats, histogram_column) + reviews
+    if not values:
+        return
+
+    result = db.execute(
+        update(stats).where(stats.ebook_id == ebook_id).values(**values),
+        execution_options={"synchronize_session": False},
+    )
+    if result.rowcount == 0:
+        # eBook lama yang belum punya baris agregat: hitung penuh dari sumbernya,
+        # yang sudah memuat perubahan ini, bukan hanya selisihnya
+        db.flush()
+        _insert_ebook_stats(db, models.Ebook.id == ebook_id)
+
+def rebuild_rating_histograms(bind) -> None:
+    """Mengisi kolom histogram rating_1..rating_5 di ebook_stats dari tabel reviews."""
+    stats = models.EbookStats.__table__
+    values = {
+        f"rating_{value}": (
+            select(func.count())
+            .where(models.Review.ebook_id == stats.c.ebook_id, models.Review.rating == value)
+            .scalar_subquery()
+        )
+        for value in models.RATING_VALUES
+    }
+    with bind.begin() as connection:
+        connection.execute(update(stats).values(**values))
+
+def mark_thumbnails(db: Session, cover_path: str, sizes: Optional[str]) -> List[int]:
+    """
+    Mencatat ukuran thumbnail yang tersedia untuk semua eBook dengan cover
+    ``cover_path`` dan membuang cache katalognya. Mengembalikan id eBook-nya.
+    """
+    ebook_ids = [
+        ebook_id for (ebook_id,) in db.query(models.Ebook.id).filter(models.Ebook.cover_image_path == cover_path)
+    ]
+    if not ebook_ids:
+        return []
+    db.execute(
+        update(models.Ebook).where(models.Ebook.cover_image_path == cover_path).values(thumbnail_sizes=sizes),
+        execution_options={"synchronize_session": False},
+    )
+    db.commit()
+    for ebook_id in ebook_ids:
+        response_cache.invalidate_ebook(ebook_id)
+    return ebook_ids
+
+def mark_existing_thumbnails(bind) -> None:
+    """Mengisi ebooks.thumbnail_sizes dari thumbnail yang sudah ada di disk (sekali, saat migrasi)."""
+    with bind.begin() as connection:
+        covers = connection.execute(
+            select(models.Ebook.cover_image_path).where(models.Ebook.cover_image_path.isnot(None)).distinct()
+        ).scalars().all()
+        for cover_path in covers:
+            sizes = thumbnails.format_sizes(thumbnails.existing_thumbnails(cover_path))
+            if sizes is not None:
+                connection.execute(
+                    update(models.Ebook.__table__)
+                    .where(models.Ebook.cover_image_path == cover_path)
+                    .values(thumbnail_sizes=sizes)
+                )
+
+def backfill_new_columns(bind, added: List[str]) -> None:
+    """Mengisi kolom turunan yang baru ditambahkan oleh database.add_missing_columns."""
+    if any(name.startswith("ebook_stats.rating_") for name in added):
+        rebuild_rating_histograms(bind)
+    if "ebooks.thumbnail_sizes" in added:
+        mark_existing_thumbnails(bind)
+
+def _insert_ebook_stats(db, condition=None) -> int:
+    """
+    INSERT baris ebook_stats yang dihitung dari activity_log (beserta arsipnya)
+    dan reviews, untuk eBook yang memenuhi ``condition`` (semua jika None).
+    ``db`` boleh Session atau Connection; mengembalikan jumlah baris.
+    """
+    ebook_ids = None
+    if condition is not None:
+        ebook_ids = {ebook_id for (ebook_id,) in db.execute(select(models.Ebook.id).where(condition))}
+        if not ebook_ids:
+            return 0
+
+    downloads = (
+        select(models.ActivityLog.ebook_id, func.count().label("total"))
+        .where(models.ActivityLog.action == "download")
+        .group_by(models.ActivityLog.ebook_id)
+        .subquery()
+    )
+    reviews = (
+        select(
+            models.Review.ebook_id,
+            func.count().label("total"),
+            func.sum(models.Review.rating).label("rating_sum"),
+            *[
+                func.sum(case((models.Review.rating == value, 1), else_=0)).label(f"rating_{value}")
+                for value in models.RATING_VALUES
+            ],
+        )
+        .group_by(models.Review.ebook_id)
+        .subquery()
+    )
+    histogram = [f"rating_{value}" for value in models.RATING_VALUES]
+    review_count = func.coalesce(reviews.c.total, 0)
+    rating_sum = func.coalesce(reviews.c.rating_sum, 0)
+    rows = (
+        select(
+            models.Ebook.id,
+            func.coalesce(downloads.c.total, 0),
+            review_count,
+            rating_sum,
+            case((review_count > 0, cast(rating_sum, Float) / review_count), else_=0.0),
+            *[func.coalesce(reviews.c[name], 0) for name in histogram],
+        )
+        .outerjoin(downloads, downloads.c.ebook_id == models.Ebook.id)
+        .outerjoin(reviews, reviews.c.ebook_id == models.Ebook.id)
+    )
+    if condition is not None:
+        rows = rows.where(condition)
+
+    table = models.EbookStats.__table__
+    result = db.execute(
+        table.insert().from_select(
+            ["ebook_id", "download_count", "review_count", "rating_sum", "rating_avg", *histogram], rows
+        )
+    )
+    # Unduhan yang sudah dipindahkan ke arsip oleh retensi activity_log
+    archived = Counter(
+        event["ebook_id"] for event in partitions.iter_archived_activity() if event["action"] == "download"
+    )
+    for ebook_id in sorted(archived):
+        if ebook_ids is not None and ebook_id not in ebook_ids:
+            continue
+        db.execute(
+            update(table).where(table.c.ebook_id == ebook_id)
+            .values(download_count=table.c.download_count + archived[ebook_id])
+        )
+    return result.rowcount
+
+def fill_missing_ebook_stats(bind) -> int:
+    """
+    Membuat baris ebook_stats untuk eBook yang belum punya (mis. eBook dari
+    sebelum tabel agregat ada), dihitung penuh dari sumbernya. Dipanggil oleh
+    migrations.migrate; mengembalikan jumlah baris yang dibuat.
+    """
+    missing = ~exists().where(models.EbookStats.ebook_id == models.Ebook.id)
+    with bind.begin() as connection:
+        return _insert_ebook_stats(connection, missing)
+
+def rebuild_ebook_stats(db: Session) -> int:
+    """
+    Menghitung ulang seluruh tabel ebook_stats dari activity_log (beserta
+    arsipnya) dan reviews. Dipakai untuk backfill; mengembalikan jumlah eBook
+    yang diproses.
+    """
+    db.execute(models.EbookStats.__table__.delete())
+    count = _insert_ebook_stats(db)
+    db.commit()
+    return count
+
+# Rollup aktivitas untuk dashboard admin. Setiap event dihitung ke bucket per
+# jam dan per hari (UTC) saat ditulis, sehingga dashboard tidak perlu lagi
+# melakukan GROUP BY atas seluruh activity_log.
+ROLLUP_PERIODS = ("hour", "day")
+# Rentang sampai 7 hari dibaca dari bucket per jam, di atasnya dari bucket harian
+ROLLUP_HOURLY_MAX_SPAN = timedelta(days=7)
+# Batas baris per INSERT multi-baris (menjaga jumlah parameter tetap kecil)
+UPSERT_CHUNK_SIZE = 100
+
+def _as_utc(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+def rollup_bucket(moment: datetime, period: str) -> datetime:
+    """Awal bucket (UTC) yang memuat ``moment`` untuk period 'hour' atau 'day'."""
+    moment = _as_utc(moment).replace(minute=0, second=0, microsecond=0)
+    if period == "day":
+        moment = moment.replace(hour=0)
+    return moment
+
+def upsert_increment(db: Session, model, rows: List[Dict], counters: List[str]):
+    """
+    Menambahkan nilai kolom ``counters`` ke baris dengan primary key yang sama,
+    atau membuat barisnya jika belum ada. PostgreSQL dan SQLite memakai
+    INSERT ... ON CONFLICT DO UPDATE; dialek lain memakai UPDATE lalu INSERT.
+    Setiap primary key hanya boleh muncul sekali di ``rows``. Tidak melakukan commit.
+    """
+    table = model.__table__
+    keys = [column.name for column in table.primary_key.columns]
+    # Urutan kunci tetap agar worker paralel tidak saling deadlock
+    rows = sorted(rows, key=lambda row: tuple(row[key] for key in keys))
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        for offset in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            statement = dialect_insert(table).values(rows[offset:offset + UPSERT_CHUNK_SIZE])
+            statement = statement.on_conflict_do_update(
+                index_elements=keys,
+                set_={name: table.c[name] + statement.excluded[name] for name in counters},
+            )
+            db.execute(statement)
+        return
+    for row in rows:
+        condition = and_(*(table.c[key] == row[key] for key in keys))
+        result = db.execute(
+            update(table).where(condition).values({name: table.c[name] + row[name] for name in counters})
+        )
+        if result.rowcount == 0:
+            db.execute(insert(table).values(row))
+
+def record_activity_rollups(db: Session, events: List[Dict]):
+    """
+    Menambahkan sekumpulan event aktivitas ke tabel rollup per eBook, per user,
+    dan total per user (user_stats). Tidak melakukan commit.
+    """
+    ebook_counts = Counter()
+    user_counts = Counter()
+    user_totals = Counter()
+    for event in events:
+        timestamp = event.get("timestamp") or datetime.now(timezone.utc)
+        for period in ROLLUP_PERIODS:
+            bucket = rollup_bucket(timestamp, period)
+            ebook_counts[(period, bucket, event["ebook_id"], event["action"])] += 1
+            user_counts[(period, bucket, event["user_id"])] += 1
+        user_totals[event["user_id"]] += 1
+    if not user_totals:
+        return
+
+    upsert_increment(db, models.EbookActivityRollup, [
+        {"period": period, "bucket_start": bucket, "ebook_id": ebook_id, "action": action, "count": count}
+        for (period, bucket, ebook_id, action), count in ebook_counts.items()
+    ], ["count"])
+    upsert_increment(db, models.UserActivityRollup, [
+        {"period": period, "bucket_start": bucket, "user_id": user_id, "count": count}
+        for (period, bucket, user_id), count in user_counts.items()
+    ], ["count"])
+    upsert_increment(db, models.UserStats, [
+        {"user_id": user_id, "activity_count": count} for user_id, count in user_totals.items()
+    ], ["activity_count"])
+
+def rebuild_activity_rollups(db: Session, batch_size: int = 10000) -> int:
+    """
+    Menghitung ulang tabel rollup dan user_stats dari arsip dan activity_log
+    (backfill). Log dibaca bertahap per ``batch_size`` baris; mengembalikan
+    jumlah event.
+    """
+    for model in (models.EbookActivityRollup, models.UserActivityRollup, models.UserStats):
+        db.execute(model.__table__.delete())
+    log = models.ActivityLog
+    rows = db.execute(
+        select(log.user_id, log.ebook_id, log.action, log.timestamp)
+        .order_by(log.id)
+        .execution_options(yield_per=batch_size)
+    )
+    total = 0
+    archived: List[Dict] = []
+    for event in partitions.iter_archived_activity():
+        archived.append(event)
+        if len(archived) >= batch_size:
+            record_activity_rollups(db, archived)
+            total += len(archived)
+            archived = []
+    record_activity_rollups(db, archived)
+    total += len(archived)
+    for partition in rows.partitions():
+        events = [row._asdict() for row in partition]
+        record_activity_rollups(db, events)
+        total += len(events)
+    db.commit()
+    return total
+
+def _rollup_range(model, start: Optional[datetime], end: Optional[datetime]):
+    """
+    Filter bucket untuk rentang [start, end). Rentang pendek memakai bucket per
+    jam, selain itu harian; batas awal dibulatkan ke bawah ke awal bucket.
+    """
+    if start is not None and end is not None and _as_utc(end) - _as_utc(start) <= ROLLUP_HOURLY_MAX_SPAN:
+        period = "hour"
+    else:
+        period = "day"
+    conditions = [model.period == period]
+    if start is not None:
+        conditions.append(model.bucket_start >= rollup_bucket(start, period))
+    if end is not None:
+        conditions.append(model.bucket_start < _as_utc(end))
+    return conditions
 
 # Fungsi untuk mendapatkan statistik eBook (admin)
-def get_most_downloaded_ebooks(db: Session, limit: int = 5):
+def get_most_downloaded_ebooks(
+    db: Session, limit: int = 5, start: Optional[datetime] = None, end: Optional[datetime] = None
+):
     """
-    Mengambil daftar buku yang paling banyak diunduh.
+    Mengambil daftar buku yang paling banyak diunduh. Tanpa rentang waktu
+    dibaca dari ebook_stats; dengan rentang waktu dari rollup aktivitas.
     """
-    results = (
-        db.query(
-            models.Ebook,
-            func.count(models.ActivityLog.id).label("download_count")
+    if start is None and end is None:
+        download_count = models.EbookStats.download_count
+        query = with_profile(db.query(models.Ebook, download_count), "ebook").join(models.EbookStats)
+    else:
+        rollup = models.EbookActivityRollup
+        totals = (
+            select(rollup.ebook_id, func.sum(rollup.count).label("download_count"))
+            .where(rollup.action == "download", *_rollup_range(rollup, start, end))
+            .group_by(rollup.ebook_id)
+            .subquery()
+        )
+        download_count = totals.c.download_count
+        query = (
+            with_profile(db.query(models.Ebook, download_count), "ebook")
+            .join(totals, totals.c.ebook_id == models.Ebook.id)
         )
-        .join(models.ActivityLog, models.Ebook.id == models.ActivityLog.ebook_id)
-        .filter(models.ActivityLog.action == "download")
-        .group_by(models.Ebook.id)
-        .order_by(func.count(models.ActivityLog.id).desc())
+    results = (
+        query.filter(download_count > 0)
+        .order_by(download_count.desc(), models.Ebook.id.desc())
         .limit(limit)
         .all()
     )
@@ -193,18 +941,31 @@ def get_total_users_count(db: Session) -> int:
     """Menghitung total pengguna yang terdaftar."""
     return db.query(models.User).count()
 
-def get_most_active_users(db: Session, limit: int = 5):
+def get_most_active_users(
+    db: Session, limit: int = 5, start: Optional[datetime] = None, end: Optional[datetime] = None
+):
     """
-    Mengambil daftar pengguna paling aktif berdasarkan jumlah aktivitas (download).
+    Mengambil daftar pengguna paling aktif berdasarkan jumlah aktivitas. Tanpa
+    rentang waktu dibaca dari user_stats; dengan rentang waktu dari rollup.
     """
-    results = (
-        db.query(
-            models.User,
-            func.count(models.ActivityLog.id).label("activity_count")
+    if start is None and end is None:
+        activity_count = models.UserStats.activity_count
+        query = db.query(models.User, activity_count).join(
+            models.UserStats, models.UserStats.user_id == models.User.id
         )
-        .join(models.ActivityLog, models.User.id == models.ActivityLog.user_id)
-        .group_by(models.User.id)
-        .order_by(func.count(models.ActivityLog.id).desc())
+    else:
+        rollup = models.UserActivityRollup
+        totals = (
+            select(rollup.user_id, func.sum(rollup.count).label("activity_count"))
+            .where(*_rollup_range(rollup, start, end))
+            .group_by(rollup.user_id)
+            .subquery()
+        )
+        activity_count = totals.c.activity_count
+        query = db.query(models.User, activity_count).join(totals, totals.c.user_id == models.User.id)
+    results = (
+        query.filter(activity_count > 0)
+        .order_by(activity_count.desc(), models.User.id.desc())
         .limit(limit)
         .all()
     )
@@ -228,13 +989,73 @@ def create_ebook_review(db: Session, user_id: int, ebook_id: int, review: schema
         ebook_id=ebook_id
     )
     db.add(db_review)
+    increment_ebook_stats(db, ebook_id, reviews=1, rating=review.rating)
     db.commit()
     db.refresh(db_review)
+    response_cache.invalidate_ebook(ebook_id)
     return db_review
 
-def get_ebook_reviews(db: Session, ebook_id: int, skip: int = 0, limit: int = 100):
-    """Mengambil semua ulasan untuk sebuah eBook."""
-    return db.query(models.Review).filter(models.Review.ebook_id == ebook_id).offset(skip).limit(limit).all()
+def get_review(db: Session, ebook_id: int, review_id: int):
+    return db.query(models.Review).filter(
+        models.Review.id == review_id, models.Review.ebook_id == ebook_id
+    ).first()
+
+def delete_ebook_review(db: Session, review: models.Review):
+    """Menghapus ulasan dan mengurangi ringkasan rating eBook-nya."""
+    ebook_id = review.ebook_id
+    db.delete(review)
+    db.flush()
+    increment_ebook_stats(db, ebook_id, reviews=-1, rating=review.rating)
+    db.commit()
+    response_cache.invalidate_ebook(ebook_id)
+
+# Urutan daftar ulasan; semuanya dilayani indeks (ebook_id, id) dan
+# (ebook_id, rating, id) pada tabel reviews. "oldest" memakai tag cursor
+# "reviews" agar cursor lama tetap berlaku.
+REVIEW_SORT_KEYS = {
+    "oldest": [(models.Review.id, False, False)],
+    "newest": [(models.Review.id, True, False)],
+    "highest": [(models.Review.rating, True, False), (models.Review.id, True, False)],
+    "lowest": [(models.Review.rating, False, False), (models.Review.id, False, False)],
+}
+REVIEW_CURSOR_TAGS = {"oldest": "reviews"}
+
+def _review_cursor_tag(sort: str) -> str:
+    return REVIEW_CURSOR_TAGS.get(sort, f"reviews-{sort}")
+
+def get_ebook_reviews(
+    db: Session,
+    ebook_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: str = "oldest",
+):
+    """Mengambil ulasan untuk sebuah eBook beserta penulisnya dalam satu query."""
+    keys = REVIEW_SORT_KEYS[sort]
+    query = (
+        with_profile(db.query(models.Review), "review")
+        .filter(models.Review.ebook_id == ebook_id)
+        .order_by(*pagination.order_clauses(keys))
+    )
+    if cursor:
+        values = pagination.decode_cursor(cursor, _review_cursor_tag(sort), len(keys))
+        query = query.filter(pagination.after_condition(keys, values))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def get_ebook_reviews_page(
+    db: Session, ebook_id: int, limit: int = 100, cursor: Optional[str] = None, sort: str = "oldest"
+):
+    """Satu halaman ulasan beserta cursor halaman berikutnya."""
+    reviews = get_ebook_reviews(db, ebook_id=ebook_id, limit=limit + 1, cursor=cursor, sort=sort)
+    if len(reviews) <= limit:
+        return reviews, None
+    reviews = reviews[:limit]
+    last = reviews[-1]
+    values = [getattr(last, column.key) for column, _, _ in REVIEW_SORT_KEYS[sort]]
+    return reviews, pagination.encode_cursor(_review_cursor_tag(sort), values)
 
 # Fungsi untuk panel monitoring (admin)
 def get_latest_users(db: Session, limit: int = 5):
@@ -243,4 +1064,4 @@ def get_latest_users(db: Session, limit: int = 5):
 
 def get_latest_ebooks(db: Session, limit: int = 5):
     """Mengambil eBook yang paling baru diupload."""
-    return db.query(models.Ebook).order_by(models.Ebook.id.desc()).limit(limit).all()
\ No newline at end of file
+    return with_profile(db.query(models.Ebook), "ebook").order_by(models.Ebook.id.desc()).limit(limit).all()
\ No newline at end of file
@@ -1,14 +1,57 @@
 # app/database.py
+import logging
 import os
-from sqlalchemy import create_engine
+import time
+from contextlib import contextmanager
+from sqlalchemy import UniqueConstraint, create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Replika baca opsional; tanpa nilai ini semua query memakai primary
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+# Pengaturan connection pool (ukuran pool tidak berlaku untuk SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Koneksi yang dibuka saat worker start (lihat warm_up_pool); 0 = tanpa warm-up
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", min(DB_POOL_SIZE, 2)))
+# Setelah gagal dihubungi, replika dilewati selama sekian detik
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", 30))
+
+# Jalur request async (SQLAlchemy asyncio) untuk endpoint baca yang paling
+# sering dipanggil; lihat app/routers/catalog_async.py
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "false").lower() in ("1", "true", "yes")
+# Driver async per dialek; URL async diturunkan dari DATABASE_URL
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite", "mysql": "aiomysql"}
 
-engine = create_engine(DATABASE_URL)
+def engine_options(url: str) -> dict:
+    """Argumen create_engine untuk pool koneksi sesuai pengaturan di atas."""
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return options
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+# Sama dengan engine primary jika replika tidak dikonfigurasi
+read_engine = (
+    create_engine(DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL))
+    if DATABASE_REPLICA_URL else engine
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -17,4 +60,223 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+_replica_down_until = 0.0
+
+def _replica_available() -> bool:
+    return DATABASE_REPLICA_URL is not None and time.monotonic() >= _replica_down_until
+
+def _mark_replica_down(exc: Exception):
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + DB_REPLICA_RETRY_SECONDS
+    logger.warning("Replika database tidak bisa dihubungi, memakai primary: %s", exc)
+
+def _replica_connection():
+    """Koneksi ke replika, atau None jika replika tidak ada atau sedang tidak bisa dihubungi."""
+    if not _replica_available():
+        return None
+    try:
+        return read_engine.connect()
+    except DBAPIError as exc:
+        _mark_replica_down(exc)
+        return None
+
+def get_read_db():
+    """
+    Sesi untuk handler GET yang boleh membaca data sedikit tertinggal
+    (katalog, detail, ulasan, statistik). Memakai replika jika dikonfigurasi
+    dan bisa dihubungi, selain itu primary. Tulisan dan pembacaan yang harus
+    melihat tulisan sendiri (favorit, riwayat, profil) tetap memakai get_db.
+    """
+    connection = _replica_connection()
+    if connection is None:
+        yield from get_db()
+        return
+    db = SessionLocal(bind=connection)
+    try:
+        yield db
+    finally:
+        db.close()
+        connection.close()
+
+def async_url(url: str) -> str:
+    """URL database dengan driver async, misalnya postgresql+asyncpg://..."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Tidak ada driver async untuk dialek '{backend}'.")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+_async_engines = {}
+
+def get_async_engine(read: bool = False):
+    """
+    AsyncEngine untuk primary (atau replika jika ``read``), dibuat saat pertama
+    kali dipakai sehingga driver async hanya dibutuhkan jika USE_ASYNC_DB aktif.
+    """
+    url = DATABASE_REPLICA_URL if read and DATABASE_REPLICA_URL else DATABASE_URL
+    async_engine = _async_engines.get(url)
+    if async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        async_engine = _async_engines[url] = create_async_engine(async_url(url), **engine_options(url))
+    return async_engine
+
+def primary_engine(bind):
+    """
+    Engine primary untuk sebuah bind. Replika dan engine async dipetakan ke
+    engine primary (dipakai untuk struktur yang hanya disiapkan di primary).
+    """
+    bind_engine = getattr(bind, "engine", bind)
+    if bind_engine is read_engine:
+        return engine
+    if any(bind_engine is async_engine.sync_engine for async_engine in _async_engines.values()):
+        return engine
+    return bind_engine
+
+async def get_async_db():
+    """Varian async dari get_db (AsyncSession ke primary)."""
+    from sqlalchemy.ext.asyncio import AsyncSession
+    async with AsyncSession(get_async_engine(), autoflush=False, expire_on_commit=False) as db:
+        yield db
+
+async def get_async_read_db():
+    """Varian async dari get_read_db: replika jika bisa dihubungi, selain itu primary."""
+    from sqlalchemy.ext.asyncio import AsyncSession
+    connection = None
+    if _replica_available():
+        try:
+            connection = await get_async_engine(read=True).connect()
+        except DBAPIError as exc:
+            _mark_replica_down(exc)
+    if connection is None:
+        async for db in get_async_db():
+            yield db
+        return
+    try:
+        async with AsyncSession(bind=connection, autoflush=False, expire_on_commit=False) as db:
+            yield db
+    finally:
+        await connection.close()
+
+def warm_up_pool(bind=engine, connections: int = DB_POOL_WARMUP) -> int:
+    """
+    Membuka ``connections`` koneksi sekaligus lalu mengembalikannya ke pool,
+    agar request pertama tidak membayar handshake koneksi. Mengembalikan
+    jumlah koneksi yang berhasil dibuka.
+    """
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = bind.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+def warm_up_read_pool(connections: int = DB_POOL_WARMUP) -> int:
+    """warm_up_pool untuk replika; replika yang tidak bisa dihubungi dilewati."""
+    if not _replica_available():
+        return 0
+    try:
+        return warm_up_pool(read_engine, connections)
+    except DBAPIError as exc:
+        _mark_replica_down(exc)
+        return 0
+
+async def warm_up_async_pool(connections: int = DB_POOL_WARMUP) -> int:
+    """Varian warm_up_pool untuk engine async primary."""
+    async_engine = get_async_engine()
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = await async_engine.connect()
+            opened.append(connection)
+            await connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            await connection.close()
+    return len(opened)
+
+def ping(bind=engine) -> None:
+    """Query paling ringan ke database; melempar exception jika gagal."""
+    with bind.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+def add_missing_columns(bind=engine) -> list:
+    """
+    Menambahkan kolom baru di model ke tabel yang sudah ada (create_all hanya
+    membuat tabel baru). Hanya untuk kolom nullable atau yang punya
+    server_default; mengembalikan daftar "tabel.kolom" yang ditambahkan.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(bind.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                connection.execute(text(ddl))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+def add_missing_indexes(bind=engine) -> list:
+    """
+    Membuat Index dan UniqueConstraint model yang belum ada di tabel lama
+    (create_all hanya membuatnya untuk tabel baru). UniqueConstraint dibuat
+    sebagai unique index dengan nama yang sama, setelah baris duplikat dihapus
+    (id terkecil dipertahankan). Mengembalikan daftar nama yang dibuat.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {item["name"] for item in inspector.get_unique_constraints(table.name)}
+            existing.update(item["name"] for item in inspector.get_indexes(table.name))
+            for index in table.indexes:
+                if index.name and index.name not in existing:
+                    index.create(connection, checkfirst=True)
+                    added.append(index.name)
+            for constraint in table.constraints:
+                if not isinstance(constraint, UniqueConstraint) or not constraint.name or constraint.name in existing:
+                    continue
+                columns = ", ".join(column.name for column in constraint.columns)
+                if "id" in table.c:
+                    connection.execute(text(
+                        f"DELETE FROM {table.name} WHERE id NOT IN "
+                        f"(SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM {table.name} GROUP BY {columns}) AS keep)"
+                    ))
+                connection.execute(text(f"CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({columns})"))
+                added.append(constraint.name)
+    return added
+
+@contextmanager
+def count_queries(bind=engine):
+    """
+    Mencatat semua statement SQL yang dieksekusi pada ``bind`` di dalam blok.
+    Menghasilkan list statement; len() dari list itu adalah jumlah query.
+    """
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", _record)
\ No newline at end of file
@@ -0,0 +1,373 @@
+# app/file_responses.py
+"""
+Pengiriman file dengan dukungan HTTP caching dan byte range.
+
+- ETag kuat dan Last-Modified dari metadata file
+- 304 Not Modified untuk If-None-Match / If-Modified-Since
+- Range tunggal (206 + Content-Range) dan multi-range (multipart/byteranges)
+- If-Range, sehingga unduhan yang terputus bisa dilanjutkan dengan aman
+- Isi file dibaca secara async per chunk (anyio), tanpa menahan satu thread
+  selama transfer berlangsung
+
+Dipakai oleh endpoint /ebooks/{id}/read dan /ebooks/{id}/download agar
+PDF viewer (PDF.js) bisa mengambil halaman secara bertahap.
+
+Dengan FILE_DELIVERY_MODE selain ``stream``, endpoint hanya melakukan
+autentikasi, lookup metadata, dan log aktivitas; isi file dikirim pihak lain
+(lihat deliver):
+
+- ``x-accel``: header X-Accel-Redirect ke location internal nginx, mis.
+  ``location /_protected/ { internal; alias /srv/perpus/uploads/; }``
+- ``x-sendfile``: header X-Sendfile berisi path absolut (Apache, lighttpd)
+- ``signed``: redirect 307 ke URL berumur pendek yang ditandatangani HMAC dan
+  diverifikasi handler ringan app/signed_files.py (tanpa database)
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, List, Mapping, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+import anyio
+from fastapi import Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+
+from . import storage
+
+CHUNK_SIZE = 64 * 1024
+# Permintaan dengan terlalu banyak range dilayani penuh (200) untuk mencegah penyalahgunaan
+MAX_RANGES = 16
+
+DELIVERY_MODES = ("stream", "x-accel", "x-sendfile", "signed")
+FILE_DELIVERY_MODE = os.getenv("FILE_DELIVERY_MODE", "stream").lower()
+# Prefix location internal nginx yang memetakan ke UPLOAD_DIRECTORY
+X_ACCEL_PREFIX = os.getenv("X_ACCEL_PREFIX", "/_protected/")
+# Awal URL bertanda tangan: path di app ini (handler dipasang di sana) atau URL
+# absolut ke proses/host terpisah yang menjalankan app.signed_files:app
+SIGNED_URL_BASE = os.getenv("SIGNED_URL_BASE", "/files/")
+SIGNED_URL_TTL = int(os.getenv("SIGNED_URL_TTL", 300))
+# Kunci HMAC; tanpa nilai ini diturunkan dari SECRET_KEY
+SIGNED_URL_KEY = os.getenv("SIGNED_URL_KEY")
+# Cara handler URL bertanda tangan mengirim file: stream, x-accel, atau x-sendfile
+SIGNED_FILES_BACKEND = os.getenv("SIGNED_FILES_BACKEND", "stream").lower()
+
+if FILE_DELIVERY_MODE not in DELIVERY_MODES:
+    raise ValueError(f"FILE_DELIVERY_MODE harus salah satu dari {', '.join(DELIVERY_MODES)}.")
+if SIGNED_FILES_BACKEND not in DELIVERY_MODES or SIGNED_FILES_BACKEND == "signed":
+    raise ValueError("SIGNED_FILES_BACKEND harus stream, x-accel, atau x-sendfile.")
+
+
+def file_etag(stat: os.stat_result, path: str) -> str:
+    """
+    ETag kuat. Blob content-addressed memakai hash isinya (nama file); file
+    lain memakai path, ukuran, dan mtime (nanodetik).
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    if storage.is_content_address(name):
+        return f'"{name}"'
+    digest = hashlib.sha1(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if weak and candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _not_modified_since(header: Optional[str], mtime: float) -> bool:
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(mtime) <= since
+
+
+def parse_range(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Mengurai header Range menjadi daftar (awal, akhir) inklusif yang sudah
+    digabung. Mengembalikan None jika header tidak valid (abaikan Range) dan
+    list kosong jika tidak ada range yang bisa dipenuhi (416).
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs:
+        return None
+    ranges = []
+    for spec in specs.split(","):
+        start_text, dash, end_text = spec.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if start_text == "":
+                # Suffix range: N byte terakhir
+                length = int(end_text)
+                if length <= 0:
+                    continue
+                start, end = max(0, size - length), size - 1
+            else:
+                start = int(start_text)
+                if end_text:
+                    end = int(end_text)
+                    if end < start:
+                        return None
+                    end = min(end, size - 1)
+                else:
+                    end = size - 1
+        except ValueError:
+            return None
+        if start < size and start >= 0:
+            ranges.append((start, end))
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+async def _read_range(path: str, start: int, end: int) -> AsyncIterator[bytes]:
+    async with await anyio.open_file(path, "rb") as handle:
+        await handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _content_disposition(disposition: str, filename: Optional[str]) -> str:
+    if not filename:
+        return disposition
+    quoted = quote(filename, safe="")
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+
+def file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    filename: Optional[str] = None,
+    disposition: str = "attachment",
+    cache_control: str = "no-cache",
+) -> Response:
+    """Membangun respons file yang menghormati header kondisional dan Range."""
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = file_etag(stat, path)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": cache_control,
+        "Content-Disposition": _content_disposition(disposition, filename),
+    }
+
+    # 1. Permintaan kondisional -> 304 jika salinan klien masih berlaku
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, etag, weak=True):
+            return Response(status_code=304, headers=headers)
+    elif _not_modified_since(request.headers.get("if-modified-since"), stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    # 2. Range hanya dipakai jika If-Range (bila ada) masih cocok dengan versi file
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range:
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            range_header = range_header if _etag_matches(if_range, etag, weak=False) else None
+        elif not _not_modified_since(if_range, stat.st_mtime):
+            range_header = None
+
+    ranges = parse_range(range_header, size) if range_header else None
+    if ranges is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            _read_range(path, 0, size - 1), media_type=media_type, headers=headers
+        )
+
+    if not ranges:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            _read_range(path, start, end), status_code=206, media_type=media_type, headers=headers
+        )
+
+    # 3. Multi-range: multipart/byteranges dengan panjang yang dihitung di muka
+    boundary = secrets.token_hex(16)
+    part_headers = [
+        (
+            f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode()
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode()
+    length = sum(len(part) for part in part_headers) + len(closing)
+    length += sum(end - start + 1 for start, end in ranges) + 2 * (len(ranges) - 1)
+
+    async def _multipart() -> AsyncIterator[bytes]:
+        for index, ((start, end), part) in enumerate(zip(ranges, part_headers)):
+            if index:
+                yield b"\r\n"
+            yield part
+            async for chunk in _read_range(path, start, end):
+                yield chunk
+        yield closing
+
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        _multipart(),
+        status_code=206,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers=headers,
+    )
+
+
+# --- Pengiriman oleh server web / URL bertanda tangan ---
+
+class InvalidSignature(ValueError):
+    """URL bertanda tangan rusak, dipalsukan, atau sudah kedaluwarsa."""
+
+
+def _upload_relative_path(path: str) -> str:
+    """Path file relatif terhadap UPLOAD_DIRECTORY (dengan '/'); hanya file di dalamnya yang boleh dikirim."""
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(storage.UPLOAD_DIRECTORY))
+    if relative == os.curdir or relative.startswith(os.pardir):
+        raise ValueError(f"File {path} berada di luar {storage.UPLOAD_DIRECTORY}.")
+    return relative.replace(os.sep, "/")
+
+
+def _signing_key() -> bytes:
+    if SIGNED_URL_KEY:
+        return SIGNED_URL_KEY.encode()
+    secret = os.getenv("SECRET_KEY")
+    if not secret:
+        raise RuntimeError("SIGNED_URL_KEY atau SECRET_KEY harus diisi untuk URL bertanda tangan.")
+    return hmac.new(secret.encode(), b"perpus-signed-file-url", hashlib.sha256).digest()
+
+
+def _signature(relative: str, expires: int, disposition: str, filename: str) -> str:
+    message = f"{relative}\n{expires}\n{disposition}\n{filename}".encode()
+    digest = hmac.new(_signing_key(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def sign_file_url(path: str, disposition: str = "attachment", filename: Optional[str] = None) -> str:
+    """
+    URL bertanda tangan untuk ``path`` yang berlaku SIGNED_URL_TTL detik.
+    Masa berlaku dibulatkan ke atas per menit, sehingga permintaan berulang
+    (mis. range dari PDF.js) mendapat URL yang sama dan bisa di-cache browser.
+    """
+    relative = _upload_relative_path(path)
+    expires = -(-(int(time.time()) + SIGNED_URL_TTL) // 60) * 60
+    params = {"e": expires, "d": disposition}
+    if filename:
+        params["n"] = filename
+    params["s"] = _signature(relative, expires, disposition, filename or "")
+    return f"{SIGNED_URL_BASE.rstrip('/')}/{quote(relative)}?{urlencode(params)}"
+
+
+def verify_signed_file(relative: str, params: Mapping[str, str]) -> Tuple[str, str, Optional[str], int]:
+    """
+    Memverifikasi URL dari sign_file_url. Mengembalikan (path, disposition,
+    filename, detik tersisa) atau melempar InvalidSignature.
+    """
+    try:
+        expires = int(params["e"])
+        disposition = params["d"]
+        signature = params["s"]
+    except (KeyError, ValueError):
+        raise InvalidSignature("URL file tidak valid.")
+    filename = params.get("n") or None
+    if not hmac.compare_digest(signature, _signature(relative, expires, disposition, filename or "")):
+        raise InvalidSignature("Tanda tangan URL file tidak valid.")
+    remaining = expires - int(time.time())
+    if remaining <= 0:
+        raise InvalidSignature("URL file sudah kedaluwarsa.")
+    path = os.path.join(storage.UPLOAD_DIRECTORY, *relative.split("/"))
+    # Pertahanan berlapis: tanda tangan yang sah tetap tidak boleh keluar dari uploads/
+    _upload_relative_path(path)
+    return path, disposition, filename, remaining
+
+
+def _offload_response(
+    path: str, media_type: str, filename: Optional[str], disposition: str, cache_control: str, mode: str
+) -> Response:
+    headers = {
+        "Content-Disposition": _content_disposition(disposition, filename),
+        "Cache-Control": cache_control,
+    }
+    if mode == "x-accel":
+        headers["X-Accel-Redirect"] = X_ACCEL_PREFIX.rstrip("/") + "/" + quote(_upload_relative_path(path))
+    else:
+        headers["X-Sendfile"] = os.path.abspath(path)
+    return Response(media_type=media_type, headers=headers)
+
+
+def deliver(
+    request: Request,
+    path: str,
+    media_type: str,
+    filename: Optional[str] = None,
+    disposition: str = "attachment",
+    cache_control: str = "no-cache",
+    mode: str = FILE_DELIVERY_MODE,
+) -> Response:
+    """
+    Respons file sesuai ``mode``: dikirim sendiri (file_response), diserahkan
+    ke server web di depan (x-accel / x-sendfile, yang juga menangani Range
+    dan header kondisional), atau redirect ke URL bertanda tangan (signed).
+    """
+    if mode == "stream":
+        return file_response(request, path, media_type, filename, disposition, cache_control)
+    if mode == "signed":
+        return RedirectResponse(
+            sign_file_url(path, disposition, filename), status_code=307, headers={"Cache-Control": "no-store"}
+        )
+    return _offload_response(path, media_type, filename, disposition, cache_control, mode)
+
+
+def _is_offloaded(response: Response) -> bool:
+    return response.status_code == 307 or "x-accel-redirect" in response.headers or "x-sendfile" in response.headers
+
+
+def is_new_transfer(request: Request, response: Response) -> bool:
+    """
+    True jika respons memulai transfer dari awal file: bukan 304, bukan
+    lanjutan unduhan (range yang tidak dimulai dari byte 0). Untuk respons
+    yang diserahkan ke pihak lain, dinilai dari header Range permintaan.
+    """
+    if _is_offloaded(response):
+        range_header = request.headers.get("range", "").replace(" ", "").lower()
+        return not range_header or range_header.startswith("bytes=0-")
+    if response.status_code == 200:
+        return True
+    if response.status_code == 206:
+        return response.headers.get("content-range", "").startswith("bytes 0-")
+    return False
@@ -0,0 +1,70 @@
+# app/health.py
+"""
+Status start worker untuk probe liveness (/healthz) dan readiness (/readyz).
+
+Setiap fase cold start (impor modul, migrasi skema, warm-up pool koneksi,
+layanan latar belakang) diukur dan dilaporkan di log ``app.health``, di body
+/readyz, dan sebagai gauge ``startup_<fase>_seconds`` di /metrics. Worker baru
+dianggap siap setelah seluruh lifespan startup selesai; saat shutdown dimulai
+worker langsung ditandai tidak siap agar load balancer berhenti mengirim request.
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from fastapi.concurrency import run_in_threadpool
+
+from .database import ping
+
+logger = logging.getLogger(__name__)
+
+# Batas waktu cek database di /readyz (detik)
+READINESS_TIMEOUT = 2.0
+
+
+class StartupTracker:
+    def __init__(self):
+        self.ready = False
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.phases.values())
+
+    def mark_ready(self):
+        self.ready = True
+        details = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases.items())
+        logger.info("Worker siap dalam %.0f ms (%s)", self.total_seconds * 1000, details)
+
+    def mark_stopping(self):
+        self.ready = False
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "seconds": round(self.total_seconds, 4),
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+        }
+
+
+startup = StartupTracker()
+
+
+async def check_database() -> bool:
+    """True jika primary menjawab SELECT 1 dalam READINESS_TIMEOUT detik."""
+    try:
+        await asyncio.wait_for(run_in_threadpool(ping), READINESS_TIMEOUT)
+    except Exception as exc:
+        logger.warning("Cek readiness database gagal: %s", exc)
+        return False
+    return True
@@ -1,16 +1,54 @@
 # app/main.py
+import os
+import time
+
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .database import engine, Base
-from .routers import auth, users, ebooks, admin, reviews
+from .database import engine, USE_ASYNC_DB, warm_up_async_pool, warm_up_pool, warm_up_read_pool
+from .routers import auth, users, ebooks, admin, reviews, health as health_router, metrics as metrics_router
+from . import content_index, file_responses, health, metrics, migrations, partitions, search, pagination, recommendations, security, storage, thumbnails
+from .activity_buffer import activity_buffer
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.staticfiles import StaticFiles
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Skema disiapkan oleh `python -m app.manage migrate`; SCHEMA_AUTO_MIGRATE=true hanya untuk pengembangan
+    startup = health.startup
+    metrics.instrument_engines()
+    with startup.phase("schema"):
+        if migrations.SCHEMA_AUTO_MIGRATE:
+            migrations.migrate(engine)
+        # Hanya memilih backend indeks (tanpa DDL); strukturnya dari migrations.migrate
+        search.select_backend(engine)
+        content_index.select_backend(engine)
+        # Cek katalog murah; partisi activity_log bulan mendatang dibuat hanya jika belum ada
+        partitions.ensure_partitions(engine)
+        os.makedirs(storage.UPLOAD_DIRECTORY, exist_ok=True)
+    with startup.phase("warmup"):
+        warm_up_pool()
+        warm_up_read_pool()
+        if USE_ASYNC_DB:
+            await warm_up_async_pool()
+    with startup.phase("services"):
+        activity_buffer.start()
+        recommendations.start()
+    startup.mark_ready()
+    yield
+    startup.mark_stopping()
+    # Kuras antrean log aktivitas sebelum proses berhenti
+    activity_buffer.stop()
+    security.password_hasher.shutdown()
+    thumbnails.shutdown()
+    content_index.shutdown()
+    recommendations.shutdown()
 
 app = FastAPI(
     title="Perpustakaan eBook API",
     description="API untuk platform perpustakaan eBook gratis.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -23,16 +61,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        pagination.NEXT_CURSOR_HEADER,
+        "ETag", "Last-Modified", "Accept-Ranges", "Content-Range", "Content-Disposition",
+    ],
 )
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Dipasang paling akhir agar menjadi lapisan terluar dan mengukur seluruh request
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Direktori uploads dibuat di lifespan, sebelum request pertama
+app.mount(
+    "/uploads", storage.UploadStaticFiles(directory=storage.UPLOAD_DIRECTORY, check_dir=False), name="uploads"
+)
+
+if file_responses.FILE_DELIVERY_MODE == "signed" and file_responses.SIGNED_URL_BASE.startswith("/"):
+    # Verifikasi URL file bertanda tangan; tanpa dependency database maupun auth
+    from . import signed_files
+    app.mount(file_responses.SIGNED_URL_BASE.rstrip("/"), signed_files.app, name="signed-files")
+
+if USE_ASYNC_DB:
+    # Didaftarkan lebih dulu agar menggantikan rute baca sync dengan path yang sama
+    from .routers import catalog_async
+    app.include_router(catalog_async.router)
 
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(ebooks.router)
 app.include_router(admin.router)
 app.include_router(reviews.router)
+app.include_router(metrics_router.router)
+app.include_router(health_router.router)
 
 @app.get("/", tags=["Root"])
 def read_root():
-    return {"message": "Selamat datang di API Perpustakaan eBook!"}
\ No newline at end of file
+    return {"message": "Selamat datang di API Perpustakaan eBook!"}
+
+health.startup.phases["import"] = time.perf_counter() - _import_started
\ No newline at end of file
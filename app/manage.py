@@ -0,0 +1,280 @@
+# app/manage.py
+"""
+Perintah administrasi yang dijalankan di luar server, misalnya untuk backfill.
+
+Contoh:
+    python -m app.manage migrate
+    python -m app.manage rebuild-search-index
+    python -m app.manage rebuild-ebook-stats
+    python -m app.manage rebuild-activity-rollups
+    python -m app.manage partition-activity-log
+    python -m app.manage ensure-partitions
+    python -m app.manage archive-activity --retention-months 12
+    python -m app.manage activity-report --start 2024-01-01 --end 2025-01-01
+    python -m app.manage set-role admin@example.com admin
+    python -m app.manage gc-blobs --min-age-hours 1
+    python -m app.manage generate-thumbnails
+    python -m app.manage import-ebooks /data/koleksi --batch-size 200
+    python -m app.manage extract-content
+    python -m app.manage rebuild-recommendations
+"""
+import argparse
+from datetime import datetime, timezone
+
+from .database import SessionLocal, engine
+from . import bulk_import, content_index, search, crud, migrations, models, partitions, recommendations, thumbnails
+
+
+def migrate_schema(args):
+    """
+    Menyiapkan skema database sekali per deploy, sebelum worker dinyalakan
+    (server tidak melakukannya sendiri kecuali SCHEMA_AUTO_MIGRATE=true).
+    """
+    result = migrations.migrate(engine)
+    print(
+        f"Skema siap dalam {result['seconds']:.2f} detik; "
+        f"kolom baru: {result['columns'] or '-'}, indeks baru: {result['indexes'] or '-'}."
+    )
+
+
+def rebuild_search_index(args):
+    """Membangun ulang indeks pencarian eBook dari isi tabel ebooks."""
+    db = SessionLocal()
+    try:
+        search.rebuild_index(db)
+        db.commit()
+        print(f"Indeks pencarian ({search.get_backend(db).name}) selesai dibangun ulang.")
+    finally:
+        db.close()
+
+
+def rebuild_ebook_stats(args):
+    """Menghitung ulang agregat unduhan dan rating per eBook (tabel ebook_stats)."""
+    db = SessionLocal()
+    try:
+        total = crud.rebuild_ebook_stats(db)
+        print(f"Statistik {total} eBook selesai dihitung ulang.")
+    finally:
+        db.close()
+
+
+def rebuild_activity_rollups(args):
+    """Menghitung ulang rollup aktivitas dashboard dan user_stats dari activity_log."""
+    db = SessionLocal()
+    try:
+        total = crud.rebuild_activity_rollups(db)
+        print(f"Rollup dari {total} log aktivitas selesai dihitung ulang.")
+    finally:
+        db.close()
+
+
+def partition_activity_log(args):
+    """Mengubah activity_log menjadi tabel partisi bulanan (PostgreSQL)."""
+    if engine.dialect.name != "postgresql":
+        print(f"Dialek {engine.dialect.name}: partisi diemulasikan, tidak ada migrasi.")
+        return
+    if partitions.migrate_to_partitioned(engine):
+        print("activity_log sekarang dipartisi per bulan.")
+    checked = partitions.ensure_partitions(engine)
+    print(f"{checked} partisi bulan berjalan dan mendatang sudah tersedia.")
+
+
+def ensure_activity_partitions(args):
+    """
+    Membuat partisi activity_log bulan berjalan dan mendatang yang belum ada.
+    Ringan (tanpa migrasi skema), cocok dijadwalkan harian lewat cron.
+    """
+    checked = partitions.ensure_partitions(engine)
+    print(f"{checked} partisi bulan berjalan dan mendatang sudah dicek.")
+
+
+def archive_activity(args):
+    """Memindahkan log aktivitas yang melewati masa retensi ke file arsip."""
+    archived = partitions.apply_retention(engine, retention_months=args.retention_months)
+    for path, count in archived:
+        print(f"{count:8} log -> {path}")
+    print(f"{sum(count for _, count in archived)} log aktivitas diarsipkan.")
+
+
+def activity_report(args):
+    """Jumlah aktivitas per bulan dan action, dari arsip dan tabel aktif."""
+    end = args.end or datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        report = partitions.activity_report(db, args.start, end)
+    finally:
+        db.close()
+    for (month, action), count in report.items():
+        print(f"{month}  {action:12} {count}")
+
+
+def collect_orphan_blobs(args):
+    """
+    Menghapus blob upload yang tidak direferensikan oleh tabel stored_files,
+    termasuk blob eBook yang sudah dihapus. Jadwalkan berkala (mis. cron per jam).
+    """
+    db = SessionLocal()
+    try:
+        removed = crud.collect_orphan_blobs(db, min_age_seconds=args.min_age_hours * 3600)
+        print(f"{removed} blob yatim dihapus.")
+    finally:
+        db.close()
+
+
+def generate_thumbnails(args):
+    """Membuat thumbnail yang belum ada untuk semua cover eBook (backfill)."""
+    if not thumbnails.available():
+        raise SystemExit("Pillow belum terpasang; thumbnail tidak bisa dibuat.")
+    db = SessionLocal()
+    try:
+        covers = [
+            path for (path,) in db.query(models.Ebook.cover_image_path)
+            .filter(models.Ebook.cover_image_path.isnot(None))
+            .distinct()
+        ]
+    finally:
+        db.close()
+
+    futures = [thumbnails.schedule(path) for path in covers]
+    failed = 0
+    for future in futures:
+        if future.exception() is not None:
+            failed += 1
+    thumbnails.shutdown()
+    print(f"Thumbnail untuk {len(covers) - failed} cover selesai dibuat ({failed} gagal).")
+
+
+def extract_content(args):
+    """Mengekstrak teks PDF yang belum ada di indeks isi (backfill)."""
+    if not content_index.available():
+        raise SystemExit("pypdf belum terpasang; teks PDF tidak bisa diekstrak.")
+    db = SessionLocal()
+    try:
+        paths = [path for (path,) in db.query(models.Ebook.file_path).distinct()]
+    finally:
+        db.close()
+
+    futures = [content_index.schedule(path, force=args.force) for path in paths]
+    failed = 0
+    for future in futures:
+        if future.exception() is not None:
+            failed += 1
+    content_index.shutdown()
+    print(f"Teks dari {len(paths) - failed} PDF sudah ter-index ({failed} gagal).")
+
+
+def rebuild_recommendations(args):
+    """Membangun ulang model co-download dan menyimpan snapshot untuk server."""
+    stats = recommendations.rebuild(args.snapshot)
+    saved = f"snapshot {args.snapshot}" if stats["snapshot"] else "tanpa snapshot (NumPy belum terpasang)"
+    print(
+        f"Model rekomendasi: {stats['with_neighbours']} dari {stats['ebooks']} eBook punya tetangga, "
+        f"{stats['seconds']} detik, {saved}."
+    )
+
+
+def import_ebooks(args):
+    """Mengimpor eBook dari direktori atau manifest CSV/JSON (bisa dilanjutkan)."""
+    def progress(report):
+        print(f"... {report.summary()}", flush=True)
+
+    report = bulk_import.import_ebooks(
+        args.source,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+        progress=progress,
+    )
+    # Tunggu thumbnail dan ekstraksi teks yang dijadwalkan selama impor
+    thumbnails.shutdown()
+    content_index.shutdown()
+    print(f"Impor selesai: {report.summary()}.")
+
+
+def set_role(args):
+    """Mengubah role seorang user (misalnya menjadikannya admin)."""
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_email(db, email=args.email)
+        if user is None:
+            raise SystemExit(f"User {args.email} tidak ditemukan.")
+        crud.update_user_role(db, user, args.role)
+        print(f"Role {user.email} sekarang '{user.role}'.")
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser(
+        "migrate", help="Membuat tabel, kolom, dan indeks yang belum ada."
+    ).set_defaults(func=migrate_schema, migrate=False)
+    subparsers.add_parser(
+        "ensure-partitions", help="Membuat partisi activity_log bulan mendatang yang belum ada."
+    ).set_defaults(func=ensure_activity_partitions, migrate=False)
+
+    subparsers.add_parser(
+        "rebuild-search-index", help="Membangun ulang indeks pencarian eBook."
+    ).set_defaults(func=rebuild_search_index)
+    subparsers.add_parser(
+        "rebuild-ebook-stats", help="Menghitung ulang tabel agregat ebook_stats."
+    ).set_defaults(func=rebuild_ebook_stats)
+    subparsers.add_parser(
+        "rebuild-activity-rollups", help="Menghitung ulang rollup aktivitas untuk dashboard admin."
+    ).set_defaults(func=rebuild_activity_rollups)
+    subparsers.add_parser(
+        "partition-activity-log", help="Mengubah activity_log menjadi tabel partisi bulanan."
+    ).set_defaults(func=partition_activity_log)
+    archive_parser = subparsers.add_parser(
+        "archive-activity", help="Memindahkan log aktivitas lama ke arsip terkompresi."
+    )
+    archive_parser.add_argument("--retention-months", type=int, default=None)
+    archive_parser.set_defaults(func=archive_activity)
+    report_parser = subparsers.add_parser(
+        "activity-report", help="Laporan aktivitas per bulan, termasuk yang sudah diarsipkan."
+    )
+    report_parser.add_argument("--start", type=datetime.fromisoformat, required=True)
+    report_parser.add_argument("--end", type=datetime.fromisoformat, default=None)
+    report_parser.set_defaults(func=activity_report)
+    gc_parser = subparsers.add_parser(
+        "gc-blobs", help="Menghapus blob upload yang tidak dipakai eBook mana pun."
+    )
+    gc_parser.add_argument("--min-age-hours", type=float, default=1.0)
+    gc_parser.set_defaults(func=collect_orphan_blobs)
+    subparsers.add_parser(
+        "generate-thumbnails", help="Membuat thumbnail cover yang belum ada (backfill)."
+    ).set_defaults(func=generate_thumbnails)
+    extract_parser = subparsers.add_parser(
+        "extract-content", help="Mengekstrak teks PDF untuk pencarian isi (backfill)."
+    )
+    extract_parser.add_argument("--force", action="store_true", help="Ekstrak ulang semua PDF.")
+    extract_parser.set_defaults(func=extract_content)
+    recommendations_parser = subparsers.add_parser(
+        "rebuild-recommendations", help="Membangun ulang model rekomendasi co-download dari activity_log."
+    )
+    recommendations_parser.add_argument("--snapshot", default=recommendations.RECOMMENDATIONS_SNAPSHOT)
+    recommendations_parser.set_defaults(func=rebuild_recommendations)
+    import_parser = subparsers.add_parser(
+        "import-ebooks", help="Mengimpor banyak eBook dari direktori atau manifest CSV/JSON."
+    )
+    import_parser.add_argument("source")
+    import_parser.add_argument("--batch-size", type=int, default=bulk_import.IMPORT_BATCH_SIZE)
+    import_parser.add_argument("--workers", type=int, default=bulk_import.IMPORT_WORKERS)
+    import_parser.add_argument("--checkpoint", default=None, help="Path file checkpoint (default otomatis).")
+    import_parser.set_defaults(func=import_ebooks)
+    set_role_parser = subparsers.add_parser("set-role", help="Mengubah role seorang user.")
+    set_role_parser.add_argument("email")
+    set_role_parser.add_argument("role", choices=["user", "admin"])
+    set_role_parser.set_defaults(func=set_role)
+
+    args = parser.parse_args(argv)
+    # Perintah lain bekerja dengan skema terbaru; migrate dan ensure-partitions tidak
+    if getattr(args, "migrate", True):
+        migrations.migrate(engine)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
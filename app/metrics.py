@@ -0,0 +1,323 @@
+# app/metrics.py
+"""
+Instrumentasi aplikasi dalam format teks Prometheus (endpoint /metrics).
+
+Yang dicatat:
+
+- per rute (template path, mis. ``/ebooks/{ebook_id}``): jumlah request per
+  status, histogram latensi, byte body respons (termasuk file dari /read dan
+  /download), serta jumlah dan durasi query database per request,
+- jumlah request yang sedang diproses (in-flight) per method,
+- histogram durasi semua query SQL, dan log ``app.metrics.slow_query`` untuk
+  query yang lebih lama dari SLOW_QUERY_SECONDS beserta rute asalnya,
+- penghitung yang sudah ada di modul lain: buffer activity_log, cache respons
+  katalog, cache token, admission control hash password, dan durasi cold
+  start worker (app/health.py).
+
+Middleware-nya ASGI murni (tanpa BaseHTTPMiddleware) dan query dihitung lewat
+event engine SQLAlchemy, dengan state per request di sebuah contextvar, jadi
+biaya di jalur request hanya beberapa penjumlahan di bawah lock.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_query_logger = logging.getLogger(__name__ + ".slow_query")
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Jika diisi, /metrics hanya bisa diambil dengan header "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", 0.5))
+SLOW_QUERY_MAX_CHARS = 1000
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+# Label rute untuk request yang tidak cocok dengan rute mana pun (mis. 404),
+# agar path acak tidak menambah jumlah seri tanpa batas
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def add(self, labels: Tuple[str, ...] = (), amount: float = 1):
+        self.inc(labels, amount)
+
+
+class Histogram:
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # Per label: [jumlah per bucket (non-kumulatif) + bucket +Inf, total nilai, jumlah observasi]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(state[0]), state[1], state[2])) for labels, state in self._values.items())
+        lines = []
+        for labels, (counts, total, observations) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_label = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {observations}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+        # Fungsi yang menghasilkan (nama, tipe, dokumentasi, nilai) saat /metrics diambil
+        self.collectors: List[Callable[[], Iterable[Tuple[str, str, str, float]]]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            for name, type_name, documentation, value in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "Jumlah request HTTP per method, rute, dan status.", ("method", "route", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Latensi request HTTP per rute.", ("method", "route")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Request HTTP yang sedang diproses.", ("method",)
+))
+http_response_body_bytes_total = registry.register(Counter(
+    "http_response_body_bytes_total", "Byte body respons yang dikirim per rute (termasuk file).", ("method", "route")
+))
+http_request_db_queries = registry.register(Histogram(
+    "http_request_db_queries", "Jumlah query database per request.", ("method", "route"), buckets=QUERY_COUNT_BUCKETS
+))
+http_request_db_seconds = registry.register(Histogram(
+    "http_request_db_seconds", "Total durasi query database per request.", ("method", "route")
+))
+db_query_duration_seconds = registry.register(Histogram(
+    "db_query_duration_seconds", "Durasi setiap query SQL.", buckets=QUERY_LATENCY_BUCKETS
+))
+db_slow_queries_total = registry.register(Counter(
+    "db_slow_queries_total", "Query yang melewati SLOW_QUERY_SECONDS, per rute asal.", ("route",)
+))
+
+
+# --- State per request ---
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "query_seconds")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        # Router Starlette menaruh objek rute yang cocok di scope sebelum endpoint dipanggil
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("metrics_request", default=None)
+
+
+# --- Instrumentasi SQLAlchemy ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    db_query_duration_seconds.observe(elapsed)
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += elapsed
+    if elapsed >= SLOW_QUERY_SECONDS:
+        route = stats.route if stats is not None else "-"
+        db_slow_queries_total.inc((route,))
+        slow_query_logger.warning(
+            "Query lambat %.3f detik (rute %s): %s", elapsed, route, statement[:SLOW_QUERY_MAX_CHARS]
+        )
+
+
+_instrumented = False
+_instrument_lock = threading.Lock()
+
+
+def instrument_engines():
+    """Memasang event di kelas Engine, sehingga berlaku untuk primary, replika, dan engine async."""
+    global _instrumented
+    with _instrument_lock:
+        if _instrumented or not METRICS_ENABLED:
+            return
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _instrumented = True
+
+
+# --- Middleware ---
+
+class MetricsMiddleware:
+    """Middleware ASGI murni yang mencatat metrik setiap request HTTP."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = RequestStats(scope)
+        token = _current_request.set(stats)
+        status_code = 500
+        body_bytes = 0
+
+        async def send_with_metrics(message):
+            nonlocal status_code, body_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                body_bytes += len(message.get("body", b""))
+            await send(message)
+
+        http_requests_in_flight.add((method,), 1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.add((method,), -1)
+            labels = (method, stats.route)
+            http_requests_total.inc(labels + (str(status_code),))
+            http_request_duration_seconds.observe(elapsed, labels)
+            http_request_db_queries.observe(stats.queries, labels)
+            http_request_db_seconds.observe(stats.query_seconds, labels)
+            if body_bytes:
+                http_response_body_bytes_total.inc(labels, body_bytes)
+            _current_request.reset(token)
+
+
+# --- Penghitung dari modul lain ---
+
+def _application_samples():
+    from . import health, recommendations, response_cache, security
+    from .activity_buffer import activity_buffer
+
+    yield ("activity_buffer_enqueued_total", "counter", "Event aktivitas yang masuk antrean.", activity_buffer.enqueued)
+    yield ("activity_buffer_flushed_total", "counter", "Event aktivitas yang ditulis ke database.", activity_buffer.flushed)
+    yield ("activity_buffer_overflowed_total", "counter", "Event yang ditulis langsung karena antrean penuh.", activity_buffer.overflowed)
+    yield ("activity_buffer_dropped_total", "counter", "Event yang gagal ditulis.", activity_buffer.dropped)
+    yield ("activity_buffer_pending", "gauge", "Event yang masih menunggu di antrean.", activity_buffer.pending)
+
+    cache = response_cache.catalog_cache
+    yield ("response_cache_hits_total", "counter", "Cache hit respons katalog (lokal dan bersama).", cache.hits)
+    yield ("response_cache_shared_hits_total", "counter", "Cache hit dari tier bersama.", cache.shared_hits)
+    yield ("response_cache_misses_total", "counter", "Cache miss respons katalog.", cache.misses)
+    yield ("response_cache_invalidations_total", "counter", "Invalidasi namespace cache katalog.", cache.invalidations)
+    yield ("response_cache_entries", "gauge", "Entri di cache respons lokal.", len(cache._entries))
+
+    model = recommendations.model
+    yield ("recommendations_loaded", "gauge", "1 jika model co-download sudah dimuat.", int(model.loaded))
+    yield ("recommendations_ebooks", "gauge", "eBook yang punya tetangga di model co-download.", len(model.neighbours))
+    yield ("recommendations_updates_total", "counter", "Unduhan baru yang diterapkan secara inkremental.", model.updates)
+
+    yield ("startup_ready", "gauge", "1 jika worker sudah selesai start dan belum shutdown.", int(health.startup.ready))
+    yield ("startup_seconds", "gauge", "Durasi cold start worker (semua fase).", health.startup.total_seconds)
+    for phase, seconds in health.startup.phases.items():
+        yield (f"startup_{phase}_seconds", "gauge", f"Durasi fase start '{phase}'.", seconds)
+
+    yield ("auth_token_cache_hits_total", "counter", "Token yang dilayani dari cache.", security.token_cache.hits)
+    yield ("auth_token_cache_misses_total", "counter", "Token yang harus diverifikasi ulang.", security.token_cache.misses)
+    yield ("password_hash_rejected_total", "counter", "Login/registrasi yang ditolak 503 karena antrean hash penuh.", security.password_hasher.rejected)
+
+
+registry.collectors.append(_application_samples)
+
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,65 @@
+# app/migrations.py
+"""
+Menyiapkan struktur database: tabel baru, kolom dan indeks yang belum ada
+(beserta backfill kolom turunan), indeks pencarian dan indeks isi, serta
+partisi activity_log. Worker sendiri hanya memilih backend indeks
+(search.select_backend) dan mengecek partisi bulan mendatang.
+
+Dijalankan sekali per deploy dengan ``python -m app.manage migrate``, sebelum
+worker baru dinyalakan. Worker tidak pernah menjalankannya sendiri kecuali
+SCHEMA_AUTO_MIGRATE=true (opt-in untuk pengembangan lokal, mati secara
+default agar start worker bebas introspeksi dan DDL). Di PostgreSQL langkah ini dijaga advisory lock, jadi proses yang start bersamaan
+menunggu giliran alih-alih balapan DDL.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+from . import content_index, crud, partitions, search
+from .database import Base, add_missing_columns, add_missing_indexes, primary_engine
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_AUTO_MIGRATE = os.getenv("SCHEMA_AUTO_MIGRATE", "false").lower() in ("1", "true", "yes")
+# Kunci pg_advisory_lock untuk migrasi; nilai bebas asal tidak dipakai fitur lain
+MIGRATION_LOCK_KEY = int(os.getenv("MIGRATION_LOCK_KEY", 74201))
+
+
+@contextmanager
+def _migration_lock(engine):
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            connection.commit()
+
+
+def migrate(bind) -> dict:
+    """
+    Membawa skema database ke keadaan model saat ini. Aman dipanggil berulang
+    kali; mengembalikan kolom dan indeks yang ditambahkan beserta durasinya.
+    """
+    engine = primary_engine(bind)
+    started = time.perf_counter()
+    with _migration_lock(engine):
+        Base.metadata.create_all(bind=engine)
+        columns = add_missing_columns(engine)
+        crud.backfill_new_columns(engine, columns)
+        stats = crud.fill_missing_ebook_stats(engine)
+        indexes = add_missing_indexes(engine)
+        search.ensure_index(engine)
+        content_index.ensure_index(engine)
+        partitions.ensure_partitions(engine)
+    result = {"columns": columns, "indexes": indexes, "ebook_stats": stats, "seconds": time.perf_counter() - started}
+    if columns or indexes or stats:
+        logger.info("Migrasi skema: kolom %s, indeks %s, baris ebook_stats baru %d", columns, indexes, stats)
+    return result
@@ -1,10 +1,21 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, func, TIMESTAMP, Enum, Text, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, func, TIMESTAMP, Enum, Text, ForeignKey, Float, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
+from . import thumbnails
 
 user_role_enum = Enum('user', 'admin', name='user_role', create_type=False)
 
+RATING_VALUES = (1, 2, 3, 4, 5)
+
+def rating_summary(review_count, rating_avg, histogram) -> dict:
+    """Bentuk ringkasan rating yang dikirim ke klien (lihat schemas.RatingSummary)."""
+    return {
+        "count": review_count,
+        "average": round(rating_avg, 2),
+        "histogram": {str(value): count for value, count in zip(RATING_VALUES, histogram)},
+    }
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -26,8 +37,105 @@ class Ebook(Base):
     publication_year = Column(Integer)
     file_path = Column(String(255), nullable=False)
     cover_image_path = Column(String(255))
+    page_count = Column(Integer)
+    # Ukuran thumbnail cover yang sudah dibuat, dipisah koma (mis. "sm,md,lg");
+    # diisi oleh thumbnails.schedule agar serialisasi tidak perlu stat ke disk
+    thumbnail_sizes = Column(String(50))
     categories = relationship("Category", secondary="ebook_categories", back_populates="ebooks")
     reviews = relationship("Review", back_populates="ebook", cascade="all, delete-orphan")
+    stats = relationship("EbookStats", back_populates="ebook", uselist=False, cascade="all, delete-orphan")
+
+    @property
+    def cover_thumbnails(self):
+        """Path varian thumbnail cover yang sudah dibuat, per ukuran (sm/md/lg)."""
+        return thumbnails.thumbnail_urls(self.cover_image_path, self.thumbnail_sizes)
+
+    @property
+    def rating(self):
+        """Ringkasan rating dari ebook_stats; None untuk eBook yang belum punya baris agregat."""
+        return self.stats.rating_summary if self.stats is not None else None
+
+class EbookStats(Base):
+    # Agregat per eBook yang diperbarui secara inkremental (lihat crud.increment_ebook_stats)
+    __tablename__ = "ebook_stats"
+    ebook_id = Column(Integer, ForeignKey("ebooks.id", ondelete="CASCADE"), primary_key=True)
+    download_count = Column(Integer, nullable=False, default=0)
+    review_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_avg = Column(Float, nullable=False, default=0.0)
+    # Histogram rating: jumlah ulasan per nilai bintang
+    rating_1 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_2 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_3 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_4 = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_5 = Column(Integer, nullable=False, default=0, server_default="0")
+    ebook = relationship("Ebook", back_populates="stats")
+
+    @property
+    def rating_summary(self):
+        histogram = [getattr(self, f"rating_{value}") or 0 for value in RATING_VALUES]
+        return rating_summary(self.review_count or 0, self.rating_avg or 0.0, histogram)
+    __table_args__ = (
+        Index("ix_ebook_stats_popular", "download_count", "ebook_id"),
+        Index("ix_ebook_stats_rating", "rating_avg", "ebook_id"),
+    )
+
+class UserStats(Base):
+    # Total aktivitas sepanjang waktu per user (lihat crud.record_activity_rollups)
+    __tablename__ = "user_stats"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    activity_count = Column(Integer, nullable=False, default=0)
+    __table_args__ = (
+        Index("ix_user_stats_active", "activity_count", "user_id"),
+    )
+
+class EbookActivityRollup(Base):
+    # Jumlah aktivitas per eBook per bucket waktu (period 'hour' atau 'day', UTC).
+    # Tanpa foreign key: rollup tetap utuh walau eBook atau log-nya dihapus.
+    __tablename__ = "ebook_activity_rollups"
+    period = Column(String(8), primary_key=True)
+    bucket_start = Column(TIMESTAMP(timezone=True), primary_key=True)
+    ebook_id = Column(Integer, primary_key=True)
+    action = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class UserActivityRollup(Base):
+    # Jumlah aktivitas per user per bucket waktu (period 'hour' atau 'day', UTC)
+    __tablename__ = "user_activity_rollups"
+    period = Column(String(8), primary_key=True)
+    bucket_start = Column(TIMESTAMP(timezone=True), primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class StoredFile(Base):
+    # Blob content-addressed di uploads/blobs beserta jumlah eBook yang memakainya
+    __tablename__ = "stored_files"
+    path = Column(String(255), primary_key=True)
+    sha256 = Column(String(64), nullable=False, index=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+class DocumentText(Base):
+    # Status ekstraksi teks per isi PDF (sha256), lihat app/content_index.py
+    __tablename__ = "document_texts"
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String(255), nullable=False, index=True)
+    status = Column(String(20), nullable=False)
+    extractor_version = Column(Integer, nullable=False, default=0)
+    page_count = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    extracted_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+class DocumentPage(Base):
+    # Teks per halaman, dikompresi zlib; text_hash untuk re-index inkremental
+    __tablename__ = "document_pages"
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), nullable=False)
+    page_number = Column(Integer, nullable=False)
+    text_hash = Column(String(40), nullable=False)
+    text_zlib = Column(LargeBinary, nullable=False)
+    __table_args__ = (UniqueConstraint("sha256", "page_number", name="uq_document_pages_page"),)
 
 class Category(Base):
     __tablename__ = "categories"
@@ -47,8 +155,12 @@ class Favorite(Base):
     ebook_id = Column(Integer, ForeignKey("ebooks.id"), nullable=False)
     user = relationship("User", back_populates="favorites")
     ebook = relationship("Ebook")
+    # Satu entri per (user, eBook); crud.add_favorites memakai ON CONFLICT DO NOTHING
+    __table_args__ = (UniqueConstraint("user_id", "ebook_id", name="uq_favorites_user_ebook"),)
 
 class ActivityLog(Base):
+    # Di PostgreSQL tabel ini dipartisi per bulan berdasarkan timestamp
+    # (lihat app/partitions.py); log lama dipindahkan ke arsip terkompresi.
     __tablename__ = "activity_log"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -57,6 +169,14 @@ class ActivityLog(Base):
     timestamp = Column(TIMESTAMP(timezone=True), server_default=func.now())
     user = relationship("User", back_populates="activity_logs")
     ebook = relationship("Ebook")
+    __table_args__ = (
+        # Riwayat per user (terbaru dulu)
+        Index("ix_activity_log_user_time", "user_id", "timestamp", "id"),
+        # Agregat unduhan per eBook
+        Index("ix_activity_log_ebook_action", "ebook_id", "action"),
+        # Retensi dan laporan per rentang waktu
+        Index("ix_activity_log_timestamp", "timestamp"),
+    )
 
 class Review(Base):
     __tablename__ = "reviews"
@@ -67,4 +187,9 @@ class Review(Base):
     ebook_id = Column(Integer, ForeignKey("ebooks.id"), nullable=False)
     timestamp = Column(TIMESTAMP(timezone=True), server_default=func.now())
     user = relationship("User", back_populates="reviews")   
-    ebook = relationship("Ebook", back_populates="reviews")
\ No newline at end of file
+    ebook = relationship("Ebook", back_populates="reviews")
+    __table_args__ = (
+        # Daftar ulasan per eBook: terlama/terbaru (id) dan tertinggi/terendah (rating)
+        Index("ix_reviews_ebook_id", "ebook_id", "id"),
+        Index("ix_reviews_ebook_rating", "ebook_id", "rating", "id"),
+    )
\ No newline at end of file
@@ -0,0 +1,80 @@
+# app/pagination.py
+"""
+Utilitas pagination berbasis cursor (keyset).
+
+Cursor adalah string opaque (base64 dari JSON) yang menyimpan mode urutan
+beserta nilai kunci urutan dari baris terakhir di halaman sebelumnya.
+Halaman berikutnya diambil dengan predikat "lebih jauh dari kunci ini",
+sehingga biayanya tidak bergantung pada kedalaman halaman.
+"""
+import base64
+import binascii
+import json
+from typing import Any, List, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import ColumnElement
+
+# Header respons yang membawa cursor halaman berikutnya
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Spesifikasi kunci urutan: (kolom, urutan menurun?, boleh NULL?)
+SortKey = Tuple[Any, bool, bool]
+
+
+class InvalidCursor(ValueError):
+    """Cursor tidak bisa dibaca atau tidak cocok dengan mode urutan."""
+
+
+def encode_cursor(sort: str, values: Sequence[Any]) -> str:
+    payload = json.dumps({"s": sort, "k": list(values)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, size: int) -> List[Any]:
+    """
+    Membaca cursor dan memastikan cursor dibuat untuk mode urutan ``sort``
+    dengan ``size`` nilai kunci.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload["k"]
+        cursor_sort = payload["s"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidCursor("Cursor tidak valid.")
+    if cursor_sort != sort or not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Cursor tidak cocok dengan mode urutan.")
+    # Semua kunci urutan yang dipakai bersifat numerik
+    if any(isinstance(value, bool) or not isinstance(value, (int, float, type(None))) for value in values):
+        raise InvalidCursor("Cursor tidak valid.")
+    return values
+
+
+def order_clauses(keys: Sequence[SortKey]) -> List[ColumnElement]:
+    """Membuat klausa ORDER BY dari spesifikasi kunci; NULL selalu di akhir."""
+    clauses = []
+    for column, descending, nullable in keys:
+        clause = column.desc() if descending else column.asc()
+        clauses.append(clause.nullslast() if nullable else clause)
+    return clauses
+
+
+def after_condition(keys: Sequence[SortKey], values: Sequence[Any]) -> ColumnElement:
+    """
+    Membuat predikat keyset "baris sesudah ``values``" untuk urutan ``keys``,
+    konsisten dengan ``order_clauses`` (termasuk NULL di akhir).
+    """
+    (column, descending, nullable), value = keys[0], values[0]
+    rest_keys, rest_values = keys[1:], values[1:]
+
+    if value is None:
+        # Cursor sudah berada di blok NULL: hanya sisa blok NULL yang tersisa
+        return and_(column.is_(None), after_condition(rest_keys, rest_values))
+
+    conditions = [column < value if descending else column > value]
+    if nullable:
+        conditions.append(column.is_(None))
+    if rest_keys:
+        conditions.append(and_(column == value, after_condition(rest_keys, rest_values)))
+    return or_(*conditions)
@@ -0,0 +1,333 @@
+# app/partitions.py
+"""
+Partisi bulanan dan retensi tabel activity_log.
+
+- PostgreSQL: activity_log diubah menjadi tabel partisi native
+  (``PARTITION BY RANGE (timestamp)``) dengan satu partisi per bulan
+  ``activity_log_pYYYYMM`` ditambah partisi DEFAULT. Partisi bulan-bulan ke
+  depan dibuat otomatis saat worker start, juga tanpa SCHEMA_AUTO_MIGRATE:
+  ensure_partitions hanya membaca katalog dan menjalankan DDL jika ada
+  bulan yang belum punya partisi. Untuk worker yang berjalan berbulan-bulan
+  tanpa restart, jadwalkan ``python -m app.manage ensure-partitions``.
+- Dialek lain: partisi diemulasikan. Tabelnya tetap satu, tetapi retensi dan
+  laporan bekerja per rentang bulan memakai indeks ix_activity_log_timestamp.
+
+Retensi memindahkan log yang lebih tua dari ``ACTIVITY_RETENTION_MONTHS``
+ke file arsip JSON Lines terkompresi gzip di ``ACTIVITY_ARCHIVE_DIRECTORY``,
+satu file per bulan: ``YYYY-MM-<id pertama>-<id terakhir>.jsonl.gz``. Nama
+file ditentukan oleh isinya, sehingga retensi yang terhenti di tengah jalan
+aman diulang. Arsip tetap bisa dibaca untuk laporan (iter_archived_activity,
+activity_report).
+
+Migrasi ke tabel partisi dijalankan sekali saat maintenance:
+    python -m app.manage partition-activity-log
+"""
+import glob
+import gzip
+import json
+import logging
+import os
+import re
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.exc import DBAPIError
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_RETENTION_MONTHS = int(os.getenv("ACTIVITY_RETENTION_MONTHS", 12))
+ACTIVITY_ARCHIVE_DIRECTORY = os.getenv("ACTIVITY_ARCHIVE_DIRECTORY", os.path.join("archive", "activity_log"))
+# Jumlah partisi bulan mendatang yang disiapkan di muka (PostgreSQL)
+PARTITION_MONTHS_AHEAD = 3
+
+TABLE_NAME = models.ActivityLog.__tablename__
+COLUMNS = ("id", "user_id", "ebook_id", "action", "timestamp")
+PARTITION_PATTERN = re.compile(rf"^{TABLE_NAME}_p(\d{{4}})(\d{{2}})$")
+ARCHIVE_PATTERN = re.compile(r"^(\d{4})-(\d{2})-(\d+)-(\d+)\.jsonl\.gz$")
+
+
+# --- Utilitas bulan ---------------------------------------------------------
+
+def _as_utc(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def month_start(moment: datetime) -> datetime:
+    return _as_utc(moment).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def iter_months(start: datetime, end: datetime) -> Iterator[datetime]:
+    """Awal setiap bulan dari bulan ``start`` sampai sebelum ``end``."""
+    month = month_start(start)
+    while month < end:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{TABLE_NAME}_p{month:%Y%m}"
+
+
+def retention_cutoff(retention_months: Optional[int] = None, now: Optional[datetime] = None) -> datetime:
+    """Log dengan timestamp sebelum batas ini dipindahkan ke arsip."""
+    months = ACTIVITY_RETENTION_MONTHS if retention_months is None else retention_months
+    return add_months(month_start(now or datetime.now(timezone.utc)), -months)
+
+
+# --- Partisi native PostgreSQL ----------------------------------------------
+
+def is_partitioned(connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+    ), {"name": TABLE_NAME}).first() is not None
+
+
+def list_partitions(connection) -> List[Tuple[str, datetime]]:
+    """Partisi bulanan yang ada, sebagai (nama tabel, awal bulan)."""
+    rows = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :name AND pg_table_is_visible(p.oid)"
+    ), {"name": TABLE_NAME})
+    partitions = []
+    for (name,) in rows:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+            partitions.append((name, month))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def _create_partition(connection, month: datetime):
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {TABLE_NAME} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+
+
+def migrate_to_partitioned(engine) -> bool:
+    """
+    Mengubah activity_log biasa menjadi tabel partisi bulanan (PostgreSQL).
+    Seluruh data disalin dalam satu transaksi, jadi tulisan ke log tertahan
+    selama migrasi. Mengembalikan False jika tidak ada yang perlu dilakukan.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.begin() as connection:
+        if is_partitioned(connection):
+            return False
+        legacy = f"{TABLE_NAME}_legacy"
+        sequence = connection.execute(
+            text("SELECT pg_get_serial_sequence(:name, 'id')"), {"name": TABLE_NAME}
+        ).scalar()
+        connection.execute(text(f"ALTER TABLE {TABLE_NAME} RENAME TO {legacy}"))
+        connection.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {TABLE_NAME}_pkey TO {legacy}_pkey"))
+        for index in models.ActivityLog.__table__.indexes:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+        # Kunci partisi wajib menjadi bagian primary key
+        connection.execute(text(
+            f"CREATE TABLE {TABLE_NAME} ("
+            f" id INTEGER NOT NULL DEFAULT nextval('{sequence}'::regclass),"
+            " user_id INTEGER NOT NULL REFERENCES users (id),"
+            " ebook_id INTEGER NOT NULL REFERENCES ebooks (id),"
+            " action VARCHAR(20) NOT NULL,"
+            ' "timestamp" TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),'
+            ' PRIMARY KEY (id, "timestamp")'
+            ') PARTITION BY RANGE ("timestamp")'
+        ))
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE_NAME}.id"))
+        connection.execute(text(f"CREATE TABLE {TABLE_NAME}_default PARTITION OF {TABLE_NAME} DEFAULT"))
+
+        oldest = connection.execute(text(f'SELECT min("timestamp") FROM {legacy}')).scalar()
+        now = datetime.now(timezone.utc)
+        for month in iter_months(oldest or now, add_months(month_start(now), PARTITION_MONTHS_AHEAD + 1)):
+            _create_partition(connection, month)
+        for index in models.ActivityLog.__table__.indexes:
+            index.create(connection)
+
+        connection.execute(text(
+            f'INSERT INTO {TABLE_NAME} (id, user_id, ebook_id, action, "timestamp") '
+            f'SELECT id, user_id, ebook_id, action, COALESCE("timestamp", now()) FROM {legacy}'
+        ))
+        connection.execute(text(f"DROP TABLE {legacy}"))
+    return True
+
+
+def ensure_partitions(engine, months_ahead: int = PARTITION_MONTHS_AHEAD) -> int:
+    """
+    Menyiapkan partisi bulan ini dan ``months_ahead`` bulan berikutnya jika
+    activity_log sudah dipartisi. Aman dipanggil berulang kali; mengembalikan
+    jumlah partisi yang dicek.
+    """
+    if engine.dialect.name != "postgresql":
+        return 0
+    current = month_start(datetime.now(timezone.utc))
+    months = [add_months(current, offset) for offset in range(months_ahead + 1)]
+    with engine.connect() as connection:
+        if not is_partitioned(connection):
+            return 0
+        existing = {month for _, month in list_partitions(connection)}
+    for month in months:
+        if month in existing:
+            continue
+        try:
+            with engine.begin() as connection:
+                _create_partition(connection, month)
+        except DBAPIError as exc:
+            # Misalnya partisi DEFAULT sudah berisi baris untuk bulan tersebut
+            logger.warning("Partisi %s tidak bisa dibuat: %s", partition_name(month), exc)
+    return len(months)
+
+
+# --- Arsip ------------------------------------------------------------------
+
+def _serialize(row: Dict) -> str:
+    row = dict(row)
+    row["timestamp"] = _as_utc(row["timestamp"]).isoformat()
+    return json.dumps(row, separators=(",", ":"))
+
+
+def _write_archive(month: datetime, rows) -> Optional[Tuple[str, int, int]]:
+    """
+    Menulis baris satu bulan ke file arsip gzip. Mengembalikan (path, jumlah
+    baris, id terakhir), atau None jika tidak ada baris.
+    """
+    os.makedirs(ACTIVITY_ARCHIVE_DIRECTORY, exist_ok=True)
+    temp_path = os.path.join(ACTIVITY_ARCHIVE_DIRECTORY, f".{month:%Y-%m}.{os.getpid()}.part")
+    count, first_id, last_id = 0, None, None
+    with gzip.open(temp_path, "wt", encoding="utf-8") as handle:
+        for row in rows:
+            handle.write(_serialize(row._asdict()) + "\n")
+            count += 1
+            first_id = row.id if first_id is None else min(first_id, row.id)
+            last_id = row.id if last_id is None else max(last_id, row.id)
+    if count == 0:
+        os.remove(temp_path)
+        return None
+    path = os.path.join(ACTIVITY_ARCHIVE_DIRECTORY, f"{month:%Y-%m}-{first_id}-{last_id}.jsonl.gz")
+    os.replace(temp_path, path)
+    return path, count, last_id
+
+
+def _source(table_name: str):
+    """Tabel activity_log atau salah satu partisinya, dengan tipe kolom dari model."""
+    columns = models.ActivityLog.__table__.c
+    return table(table_name, *(column(name, columns[name].type) for name in COLUMNS))
+
+
+def _archive_partitions(engine, cutoff: datetime) -> List[Tuple[str, int]]:
+    """Mengarsipkan lalu melepas dan menghapus partisi PostgreSQL yang kedaluwarsa."""
+    archived = []
+    with engine.connect() as connection:
+        if not is_partitioned(connection):
+            return archived
+        expired = [(name, month) for name, month in list_partitions(connection) if add_months(month, 1) <= cutoff]
+    for name, month in expired:
+        source = _source(name)
+        with engine.connect() as connection:
+            rows = connection.execution_options(stream_results=True, yield_per=5000).execute(
+                select(*source.c).order_by(source.c.id)
+            )
+            result = _write_archive(month, rows)
+        with engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {TABLE_NAME} DETACH PARTITION {name}"))
+            connection.execute(text(f"DROP TABLE {name}"))
+        if result:
+            archived.append((result[0], result[1]))
+    return archived
+
+
+def _archive_ranges(engine, cutoff: datetime) -> List[Tuple[str, int]]:
+    """Partisi emulasi: mengarsipkan dan menghapus log per rentang bulan."""
+    archived = []
+    source = _source(TABLE_NAME)
+    with engine.connect() as connection:
+        oldest = connection.execute(
+            select(func.min(source.c.timestamp)).where(source.c.timestamp < cutoff)
+        ).scalar()
+    if oldest is None:
+        return archived
+    for month in iter_months(oldest, cutoff):
+        bounds = (source.c.timestamp >= month, source.c.timestamp < add_months(month, 1))
+        with engine.connect() as connection:
+            rows = connection.execution_options(stream_results=True, yield_per=5000).execute(
+                select(*source.c).where(*bounds).order_by(source.c.id)
+            )
+            result = _write_archive(month, rows)
+        if result is None:
+            continue
+        path, count, last_id = result
+        with engine.begin() as connection:
+            connection.execute(source.delete().where(*bounds, source.c.id <= last_id))
+        archived.append((path, count))
+    return archived
+
+
+def apply_retention(engine, retention_months: Optional[int] = None) -> List[Tuple[str, int]]:
+    """
+    Memindahkan log aktivitas yang lebih tua dari masa retensi ke arsip.
+    Mengembalikan daftar (file arsip, jumlah baris).
+    """
+    cutoff = retention_cutoff(retention_months)
+    archived = _archive_partitions(engine, cutoff)
+    # Sisa baris lama (tabel biasa atau partisi DEFAULT)
+    archived.extend(_archive_ranges(engine, cutoff))
+    return archived
+
+
+def iter_archived_activity(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[Dict]:
+    """Membaca log aktivitas dari arsip untuk rentang [start, end)."""
+    start = _as_utc(start) if start is not None else None
+    end = _as_utc(end) if end is not None else None
+    for path in sorted(glob.glob(os.path.join(ACTIVITY_ARCHIVE_DIRECTORY, "*.jsonl.gz"))):
+        match = ARCHIVE_PATTERN.match(os.path.basename(path))
+        if not match:
+            continue
+        month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+        if (end is not None and month >= end) or (start is not None and add_months(month, 1) <= start):
+            continue
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            for line in handle:
+                row = json.loads(line)
+                row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+                if start is not None and row["timestamp"] < start:
+                    continue
+                if end is not None and row["timestamp"] >= end:
+                    continue
+                yield row
+
+
+def activity_report(db, start: datetime, end: datetime) -> Dict[Tuple[str, str], int]:
+    """
+    Jumlah aktivitas per (bulan, action) untuk rentang [start, end), dari arsip
+    dan tabel aktif sekaligus.
+    """
+    counts: Counter = Counter()
+    for row in iter_archived_activity(start, end):
+        counts[(f"{row['timestamp']:%Y-%m}", row["action"])] += 1
+    log = models.ActivityLog
+    for month in iter_months(start, end):
+        lower, upper = max(month, _as_utc(start)), min(add_months(month, 1), _as_utc(end))
+        rows = (
+            db.query(log.action, func.count())
+            .filter(log.timestamp >= lower, log.timestamp < upper)
+            .group_by(log.action)
+        )
+        for action, count in rows:
+            counts[(f"{month:%Y-%m}", action)] += count
+    return dict(sorted(counts.items()))
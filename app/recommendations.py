@@ -0,0 +1,438 @@
+# app/recommendations.py
+"""
+Rekomendasi "pembaca yang mengunduh buku ini juga mengunduh", dihitung dari
+baris download di activity_log.
+
+Model disimpan di memori per proses: jumlah pengunduh unik per eBook (n_i) dan,
+per eBook, paling banyak ``RELATED_CANDIDATES`` tetangga beserta jumlah
+pengunduh bersama (co_ij). Skor tetangga adalah kemiripan kosinus
+co_ij / sqrt(n_i * n_j), dihitung saat lookup dari kandidat yang sedikit itu,
+sehingga GET /ebooks/{id}/related tidak menyentuh database untuk bagian ini.
+
+Pembangunan ulang penuh (``rebuild``):
+
+- pasangan unik (user, eBook) di-stream dari database per chunk,
+- dengan NumPy/SciPy (opsional): matriks jarang user x eBook X, lalu X^T X
+  dihitung per blok eBook yang ukurannya dibatasi ``RECOMMENDATIONS_MEMORY_MB``,
+  dan hanya kandidat teratas tiap baris yang disimpan. Selain blok itu, memori
+  sekitar 40 byte per pasangan unik (10 juta pasangan: kurang dari 1 GB, ~9 detik),
+- tanpa NumPy/SciPy: penghitungan per user dengan dict (cukup untuk katalog kecil).
+
+User dengan riwayat sangat panjang dibatasi ``RELATED_USER_HISTORY_CAP`` eBook
+agar tidak mendominasi (dan agar jumlah pasangan tidak meledak).
+
+Pembaruan inkremental: crud.create_activity_logs_bulk memanggil
+``collect_history`` sebelum menulis batch dan ``apply_downloads`` setelah
+COMMIT. Hanya ``python -m app.manage rebuild-recommendations`` yang membangun
+model; hasilnya disimpan sebagai snapshot .npz (butuh NumPy). Worker tidak
+pernah rebuild sendiri: tanpa snapshot model kosong (related() mengembalikan
+list kosong), dan snapshot baru atau yang lebih baru dimuat setiap
+``RECOMMENDATIONS_RELOAD_INTERVAL`` detik. Jalankan perintah itu setelah deploy
+pertama lalu berkala (mis. cron harian). Unduhan yang tercatat selama rebuild
+berjalan baru masuk pada rebuild berikutnya. Log yang sudah diarsipkan (app/partitions.py) tidak ikut dihitung.
+"""
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+from array import array
+from itertools import groupby
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATIONS_ENABLED = os.getenv("RECOMMENDATIONS_ENABLED", "true").lower() in ("1", "true", "yes")
+RELATED_CANDIDATES = int(os.getenv("RELATED_CANDIDATES", 50))
+RELATED_MIN_CO_DOWNLOADS = int(os.getenv("RELATED_MIN_CO_DOWNLOADS", 2))
+RELATED_USER_HISTORY_CAP = int(os.getenv("RELATED_USER_HISTORY_CAP", 500))
+RECOMMENDATIONS_MEMORY_MB = int(os.getenv("RECOMMENDATIONS_MEMORY_MB", 256))
+# Jangan di bawah storage.UPLOAD_DIRECTORY: direktori itu disajikan publik di /uploads
+RECOMMENDATIONS_SNAPSHOT = os.getenv("RECOMMENDATIONS_SNAPSHOT", os.path.join("data", "recommendations.npz"))
+RECOMMENDATIONS_RELOAD_INTERVAL = float(os.getenv("RECOMMENDATIONS_RELOAD_INTERVAL", 300))
+REBUILD_FETCH_SIZE = 100_000
+# Perkiraan byte per entri hasil X^T X (indeks, data, dan salinan sementara SciPy)
+_BYTES_PER_PRODUCT_ENTRY = 24
+
+Neighbours = Dict[int, Tuple[array, array]]
+
+
+def _numpy():
+    try:
+        import numpy
+        from scipy import sparse
+    except ImportError:
+        return None
+    return numpy, sparse
+
+
+class CoDownloadModel:
+    """Model co-download di memori; aman dipakai dari banyak thread."""
+
+    def __init__(self, candidates: int = RELATED_CANDIDATES, min_co_downloads: int = RELATED_MIN_CO_DOWNLOADS):
+        self.candidates = candidates
+        self.min_co_downloads = min_co_downloads
+        self.counts: Dict[int, int] = {}
+        self.neighbours: Neighbours = {}
+        self.loaded = False
+        self.loaded_at: Optional[float] = None
+        self.source_mtime: Optional[float] = None
+        self.updates = 0
+        self._lock = threading.Lock()
+
+    def replace(self, counts: Dict[int, int], neighbours: Neighbours, source_mtime: Optional[float] = None):
+        with self._lock:
+            self.counts = counts
+            self.neighbours = neighbours
+            self.loaded = True
+            self.loaded_at = time.time()
+            self.source_mtime = source_mtime
+
+    def clear(self):
+        with self._lock:
+            self.counts, self.neighbours = {}, {}
+            self.loaded = False
+            self.loaded_at = self.source_mtime = None
+
+    def _score(self, count_i: int, ebook_id: int, co: int) -> float:
+        return co / math.sqrt(count_i * max(self.counts.get(ebook_id, 1), 1))
+
+    def related(self, ebook_id: int, limit: int = 10) -> List[Tuple[int, float]]:
+        """Tetangga teratas ``ebook_id`` sebagai (ebook_id, skor), skor menurun."""
+        with self._lock:
+            entry = self.neighbours.get(ebook_id)
+            if entry is None:
+                return []
+            count_i = max(self.counts.get(ebook_id, 1), 1)
+            scored = [
+                (self._score(count_i, other, co), other)
+                for other, co in zip(*entry)
+                if co >= self.min_co_downloads
+            ]
+        top = heapq.nlargest(limit, scored)
+        return [(other, round(score, 6)) for score, other in top]
+
+    def _bump(self, ebook_id: int, other: int):
+        entry = self.neighbours.get(ebook_id)
+        if entry is None:
+            entry = self.neighbours[ebook_id] = (array("i"), array("i"))
+        ids, co = entry
+        try:
+            co[ids.index(other)] += 1
+            return
+        except ValueError:
+            pass
+        ids.append(other)
+        co.append(1)
+        if len(ids) > self.candidates:
+            # Buang kandidat dengan skor terendah; rebuild berikutnya mengoreksi perkiraan ini
+            count_i = max(self.counts.get(ebook_id, 1), 1)
+            weakest = min(range(len(ids)), key=lambda index: self._score(count_i, ids[index], co[index]))
+            del ids[weakest]
+            del co[weakest]
+
+    def apply_downloads(self, history: Dict[int, Set[int]], pairs: List[Tuple[int, int]]):
+        """
+        Menambahkan unduhan baru (user_id, ebook_id). ``history`` berisi eBook
+        yang sudah pernah diunduh tiap user sebelum batch ini, dan ikut diperbarui.
+        """
+        with self._lock:
+            if not self.loaded:
+                return
+            for user_id, ebook_id in pairs:
+                seen = history.setdefault(user_id, set())
+                if ebook_id in seen:
+                    continue
+                self.counts[ebook_id] = self.counts.get(ebook_id, 0) + 1
+                if len(seen) < RELATED_USER_HISTORY_CAP:
+                    for other in seen:
+                        self._bump(ebook_id, other)
+                        self._bump(other, ebook_id)
+                seen.add(ebook_id)
+                self.updates += 1
+
+
+model = CoDownloadModel()
+
+
+# --- Pembangunan ulang ---
+
+def _download_pairs(db: Session):
+    """Pasangan unik (user_id, ebook_id) dari log download, urut per user, per chunk."""
+    statement = (
+        select(models.ActivityLog.user_id, models.ActivityLog.ebook_id)
+        .where(models.ActivityLog.action == "download")
+        .distinct()
+        .order_by(models.ActivityLog.user_id)
+        .execution_options(yield_per=REBUILD_FETCH_SIZE)
+    )
+    for chunk in db.execute(statement).partitions():
+        yield chunk
+
+
+def _top_candidates(items: List[Tuple[int, int]], count_i: int, counts: Dict[int, int], limit: int) -> Tuple[array, array]:
+    top = heapq.nlargest(limit, items, key=lambda item: item[1] / math.sqrt(count_i * counts[item[0]]))
+    return array("i", (other for other, _ in top)), array("i", (co for _, co in top))
+
+
+def _build_python(db: Session, candidates: int) -> Tuple[Dict[int, int], Neighbours]:
+    counts: Dict[int, int] = {}
+    co_counts: Dict[int, Dict[int, int]] = {}
+    rows = (row for chunk in _download_pairs(db) for row in chunk)
+    for _, group in groupby(rows, key=lambda row: row[0]):
+        ebook_ids = [ebook_id for _, ebook_id in group][:RELATED_USER_HISTORY_CAP]
+        for ebook_id in ebook_ids:
+            counts[ebook_id] = counts.get(ebook_id, 0) + 1
+        for ebook_id in ebook_ids:
+            row = co_counts.setdefault(ebook_id, {})
+            for other in ebook_ids:
+                if other != ebook_id:
+                    row[other] = row.get(other, 0) + 1
+    neighbours = {
+        ebook_id: _top_candidates(list(row.items()), counts[ebook_id], counts, candidates)
+        for ebook_id, row in co_counts.items()
+        if row
+    }
+    return counts, neighbours
+
+
+def _build_numpy(db: Session, candidates: int, memory_mb: int) -> Tuple[Dict[int, int], Neighbours]:
+    np, sparse = _numpy()
+    user_chunks, ebook_chunks = [], []
+    for chunk in _download_pairs(db):
+        pairs = np.array(chunk, dtype=np.int64).reshape(-1, 2)
+        user_chunks.append(pairs[:, 0].astype(np.int32))
+        ebook_chunks.append(pairs[:, 1].astype(np.int32))
+    if not user_chunks:
+        return {}, {}
+    users = np.concatenate(user_chunks)
+    ebooks = np.concatenate(ebook_chunks)
+    del user_chunks, ebook_chunks
+
+    # Pasangan sudah urut per user: batasi jumlah eBook per user
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    lengths = np.diff(np.r_[starts, users.size])
+    rank = np.arange(users.size) - np.repeat(starts, lengths)
+    keep = rank < RELATED_USER_HISTORY_CAP
+    users, ebooks = users[keep], ebooks[keep]
+
+    ebook_ids, columns = np.unique(ebooks, return_inverse=True)
+    columns = columns.astype(np.int32)
+    del ebooks
+    _, rows = np.unique(users, return_inverse=True)
+    rows = rows.astype(np.int32)
+    del users
+    matrix = sparse.csr_matrix(
+        (np.ones(rows.size, dtype=np.float32), (rows, columns)),
+        shape=(int(rows.max()) + 1, ebook_ids.size),
+    )
+    del rows, columns
+    by_ebook = matrix.T.tocsr()
+    counts = np.asarray(matrix.sum(axis=0)).ravel()
+
+    # Batas atas entri per baris X^T X, untuk membagi eBook ke blok yang muat di anggaran memori
+    history_lengths = np.asarray(matrix.sum(axis=1)).ravel()
+    bounds = np.minimum(by_ebook @ history_lengths, ebook_ids.size)
+    budget = max(1, memory_mb * 1024 * 1024 // _BYTES_PER_PRODUCT_ENTRY)
+
+    count_map = dict(zip(ebook_ids.tolist(), counts.astype(np.int64).tolist()))
+    neighbours: Neighbours = {}
+    start = 0
+    while start < ebook_ids.size:
+        end = start + 1
+        total = bounds[start]
+        while end < ebook_ids.size and total + bounds[end] <= budget:
+            total += bounds[end]
+            end += 1
+        product = (by_ebook[start:end] @ matrix).tocsr()
+        for offset in range(end - start):
+            row = start + offset
+            lo, hi = product.indptr[offset], product.indptr[offset + 1]
+            others = product.indices[lo:hi]
+            co = product.data[lo:hi]
+            mask = others != row
+            others, co = others[mask], co[mask]
+            if others.size == 0:
+                continue
+            scores = co / np.sqrt(counts[row] * counts[others])
+            if others.size > candidates:
+                best = np.argpartition(-scores, candidates - 1)[:candidates]
+                others, co, scores = others[best], co[best], scores[best]
+            order = np.argsort(-scores, kind="stable")
+            neighbours[int(ebook_ids[row])] = (
+                array("i", ebook_ids[others[order]].tolist()),
+                array("i", co[order].astype(np.int64).tolist()),
+            )
+        del product
+        start = end
+    return count_map, neighbours
+
+
+def build(db: Session, candidates: int = RELATED_CANDIDATES, memory_mb: int = RECOMMENDATIONS_MEMORY_MB):
+    """Menghitung (counts, neighbours) dari seluruh log download."""
+    if _numpy() is not None:
+        return _build_numpy(db, candidates, memory_mb)
+    return _build_python(db, candidates)
+
+
+# --- Snapshot ---
+
+def save_snapshot(path: str, counts: Dict[int, int], neighbours: Neighbours) -> bool:
+    """Menyimpan model ke .npz (ditulis ke file sementara lalu di-rename). False tanpa NumPy."""
+    if _numpy() is None:
+        return False
+    np, _ = _numpy()
+    ebook_ids = sorted(neighbours)
+    lengths = [len(neighbours[ebook_id][0]) for ebook_id in ebook_ids]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(
+        temporary,
+        count_ids=np.array(list(counts), dtype=np.int32),
+        count_values=np.array(list(counts.values()), dtype=np.int32),
+        ebook_ids=np.array(ebook_ids, dtype=np.int32),
+        indptr=np.r_[0, np.cumsum(lengths, dtype=np.int64)],
+        neighbour_ids=np.array([other for ebook_id in ebook_ids for other in neighbours[ebook_id][0]], dtype=np.int32),
+        neighbour_co=np.array([co for ebook_id in ebook_ids for co in neighbours[ebook_id][1]], dtype=np.int32),
+    )
+    os.replace(temporary, path)
+    return True
+
+
+def load_snapshot(path: str) -> Optional[Tuple[Dict[int, int], Neighbours]]:
+    if _numpy() is None or not os.path.exists(path):
+        return None
+    np, _ = _numpy()
+    with np.load(path) as data:
+        counts = dict(zip(data["count_ids"].tolist(), data["count_values"].tolist()))
+        indptr = data["indptr"]
+        neighbour_ids, neighbour_co = data["neighbour_ids"], data["neighbour_co"]
+        neighbours = {
+            ebook_id: (
+                array("i", neighbour_ids[indptr[index]:indptr[index + 1]].tolist()),
+                array("i", neighbour_co[indptr[index]:indptr[index + 1]].tolist()),
+            )
+            for index, ebook_id in enumerate(data["ebook_ids"].tolist())
+        }
+    return counts, neighbours
+
+
+def rebuild(snapshot_path: Optional[str] = RECOMMENDATIONS_SNAPSHOT) -> Dict[str, float]:
+    """Membangun ulang model dari database, memasangnya, dan menyimpan snapshot."""
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        counts, neighbours = build(db)
+    finally:
+        db.close()
+    saved = bool(snapshot_path) and save_snapshot(snapshot_path, counts, neighbours)
+    model.replace(counts, neighbours, os.path.getmtime(snapshot_path) if saved else None)
+    return {
+        "ebooks": len(counts),
+        "with_neighbours": len(neighbours),
+        "seconds": round(time.perf_counter() - start, 2),
+        "snapshot": saved,
+    }
+
+
+# --- Pembaruan inkremental ---
+
+def collect_history(db: Session, events: List[dict]) -> Optional[Dict[int, Set[int]]]:
+    """
+    Dipanggil sebelum batch event ditulis: eBook yang sudah pernah diunduh
+    oleh user di batch ini (satu query). None jika model belum dimuat.
+    """
+    if not model.loaded:
+        return None
+    user_ids = {event["user_id"] for event in events if event["action"] == "download"}
+    if not user_ids:
+        return None
+    history: Dict[int, Set[int]] = {user_id: set() for user_id in user_ids}
+    rows = db.execute(
+        select(models.ActivityLog.user_id, models.ActivityLog.ebook_id)
+        .where(models.ActivityLog.action == "download", models.ActivityLog.user_id.in_(user_ids))
+        .distinct()
+    )
+    for user_id, ebook_id in rows:
+        history[user_id].add(ebook_id)
+    return history
+
+
+def apply_downloads(history: Optional[Dict[int, Set[int]]], events: List[dict]):
+    """
+    Dipanggil setelah batch event di-COMMIT. Kesalahan hanya dicatat: batch
+    sudah tersimpan, jadi pemanggil tidak boleh menganggapnya gagal dan
+    menulisnya ulang. Model dikoreksi oleh rebuild berikutnya.
+    """
+    if history is None:
+        return
+    try:
+        model.apply_downloads(
+            history, [(event["user_id"], event["ebook_id"]) for event in events if event["action"] == "download"]
+        )
+    except Exception:
+        logger.exception("Gagal memperbarui model rekomendasi untuk %d event", len(events))
+
+
+def related(ebook_id: int, limit: int = 10) -> List[Tuple[int, float]]:
+    return model.related(ebook_id, limit)
+
+
+# --- Siklus hidup di server ---
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def _refresh():
+    # mtime dibaca sebelum memuat: snapshot yang diganti di tengah jalan tetap dimuat ulang nanti
+    source_mtime = os.path.getmtime(RECOMMENDATIONS_SNAPSHOT)
+    snapshot = load_snapshot(RECOMMENDATIONS_SNAPSHOT)
+    if snapshot is not None:
+        model.replace(*snapshot, source_mtime=source_mtime)
+
+
+def _run():
+    try:
+        if os.path.exists(RECOMMENDATIONS_SNAPSHOT):
+            _refresh()
+        else:
+            logger.info(
+                "Snapshot rekomendasi %s belum ada; jalankan `python -m app.manage rebuild-recommendations`.",
+                RECOMMENDATIONS_SNAPSHOT,
+            )
+    except Exception:
+        logger.exception("Gagal memuat model rekomendasi")
+    while not _stop.wait(RECOMMENDATIONS_RELOAD_INTERVAL):
+        try:
+            if os.path.exists(RECOMMENDATIONS_SNAPSHOT) and (
+                model.source_mtime is None or os.path.getmtime(RECOMMENDATIONS_SNAPSHOT) > model.source_mtime
+            ):
+                _refresh()
+        except Exception:
+            logger.exception("Gagal memuat ulang snapshot rekomendasi")
+
+
+def start():
+    """Memuat snapshot di thread latar belakang; sampai dimuat, related() mengembalikan list kosong."""
+    global _thread
+    if not RECOMMENDATIONS_ENABLED or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="recommendations", daemon=True)
+    _thread.start()
+
+
+def shutdown():
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=5)
+        _thread = None
@@ -0,0 +1,409 @@
+# app/response_cache.py
+"""
+Cache respons untuk endpoint katalog publik (GET /ebooks/ dan GET /ebooks/{id}).
+
+Yang disimpan adalah body JSON yang sudah diserialisasi beserta ETag dan
+header tambahannya, dengan kunci dari parameter query yang sudah
+dinormalisasi. Cache hit tidak menyentuh database maupun Pydantic.
+
+Dua tingkat cache:
+
+- LRU di dalam proses (selalu aktif jika cache aktif),
+- tier bersama lewat ``RESPONSE_CACHE_SHARED_URL``: ``redis://...`` atau
+  ``memory://`` (pengganti lokal, satu proses, untuk pengujian).
+
+Tanpa tier bersama, invalidasi hanya berlaku di proses yang melakukannya,
+sehingga worker lain akan terus menyajikan data lama. Karena itu cache hanya
+aktif jika tier bersama dikonfigurasi, atau jika server dinyatakan berjalan
+dengan satu worker lewat ``RESPONSE_CACHE_SINGLE_WORKER=true``.
+
+Invalidasi memakai nomor versi per namespace: ``ebooks:list`` untuk semua
+halaman katalog dan ``ebooks:<id>`` untuk detail satu eBook. Versi dinaikkan
+oleh crud.create_ebook, update_ebook, delete_ebook, serta saat ulasan dibuat
+atau dihapus (ringkasan rating ikut dalam respons), sehingga entri lama
+tidak pernah terbaca lagi dan habis sendiri oleh LRU/TTL. Jika tier bersama
+aktif, versi disimpan di sana agar invalidasi berlaku di semua worker.
+
+Entri dibangun dari primary (get_catalog_db), bukan replika: data replika
+yang tertinggal tepat setelah invalidasi akan tersimpan di bawah versi baru
+selama RESPONSE_CACHE_TTL.
+
+Urutan sort popular ikut berubah karena unduhan tanpa invalidasi; urutan
+tersebut bisa tertinggal paling lama RESPONSE_CACHE_TTL detik.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+from .database import get_async_db, get_async_read_db, get_db, get_read_db
+from .search import TOKEN_PATTERN
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 60))
+RESPONSE_CACHE_SHARED_URL = os.getenv("RESPONSE_CACHE_SHARED_URL")
+# Cache lokal saja tanpa tier bersama; hanya benar jika server berjalan dengan satu worker
+RESPONSE_CACHE_SINGLE_WORKER = os.getenv("RESPONSE_CACHE_SINGLE_WORKER", "false").lower() in ("1", "true", "yes")
+# Klien selalu memvalidasi ulang memakai ETag (304 jika tidak berubah)
+CATALOG_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+LIST_NAMESPACE = "ebooks:list"
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+    def dumps(self) -> bytes:
+        return json.dumps({"b": self.body.decode(), "e": self.etag, "h": self.headers}).encode()
+
+    @classmethod
+    def loads(cls, raw: bytes) -> "CachedResponse":
+        data = json.loads(raw)
+        return cls(body=data["b"].encode(), etag=data["e"], headers=data["h"])
+
+
+class MemorySharedCache:
+    """Pengganti lokal untuk tier bersama; antarmukanya sama dengan RedisSharedCache."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._data.get(key, (b"0", None))[0]) + 1
+            self._data[key] = (str(value).encode(), None)
+            return value
+
+
+class RedisSharedCache:
+    """Tier bersama di Redis (paket ``redis`` opsional)."""
+
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self._client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+
+def shared_backend_from_url(url: Optional[str]):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemorySharedCache()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSharedCache(url)
+    raise ValueError(f"RESPONSE_CACHE_SHARED_URL tidak dikenal: {url}")
+
+
+def normalize_search(term: Optional[str]) -> Optional[str]:
+    """Bentuk kata kunci pencarian untuk kunci cache (huruf kecil, token saja)."""
+    if term is None:
+        return None
+    return " ".join(TOKEN_PATTERN.findall(term.lower()))
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def serialize(schema, value) -> bytes:
+    """Serialisasi objek ORM ke JSON sesuai skema respons (seperti response_model)."""
+    adapter = _adapter(schema)
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+def _load_orjson():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+_orjson = _load_orjson()
+
+
+def dumps(value) -> bytes:
+    """
+    Encoder JSON cepat untuk data yang sudah berbentuk dict/list (tanpa validasi
+    skema): orjson jika terpasang, selain itu encoder Rust bawaan pydantic_core.
+    """
+    if _orjson is not None:
+        return _orjson.dumps(value)
+    return to_json(value)
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_SIZE,
+        ttl: float = RESPONSE_CACHE_TTL,
+        shared=None,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Penghitung untuk observasi (hit ratio dan latensi)
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    # --- Versi namespace dan kunci ---
+
+    def _version(self, namespace: str) -> int:
+        if self.shared is not None:
+            value = self.shared.get(f"version:{namespace}")
+            return int(value) if value else 0
+        return self._versions.get(namespace, 0)
+
+    def _key(self, namespace: str, params: Dict[str, Any]) -> str:
+        payload = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.sha1(payload.encode()).hexdigest()
+        return f"{namespace}:{self._version(namespace)}:{digest}"
+
+    def invalidate(self, *namespaces: str):
+        """Menaikkan versi namespace; entri lama tidak akan terbaca lagi."""
+        for namespace in namespaces:
+            if self.shared is not None:
+                self.shared.incr(f"version:{namespace}")
+            else:
+                with self._lock:
+                    self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            with self._lock:
+                self.invalidations += 1
+
+    # --- Penyimpanan dua tingkat ---
+
+    def _get(self, key: str) -> Optional[CachedResponse]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                expires_at, entry = item
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    return entry
+                del self._entries[key]
+        if self.shared is None:
+            return None
+        raw = self.shared.get(f"response:{key}")
+        if raw is None:
+            return None
+        entry = CachedResponse.loads(raw)
+        self._put_local(key, entry)
+        with self._lock:
+            self.shared_hits += 1
+        return entry
+
+    def _put_local(self, key: str, entry: CachedResponse):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _put(self, key: str, entry: CachedResponse):
+        self._put_local(key, entry)
+        if self.shared is not None:
+            self.shared.set(f"response:{key}", entry.dumps(), ttl=self.ttl)
+
+    def _count(self, hit: bool, seconds: float):
+        # Dipanggil dari banyak thread threadpool sekaligus
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.hit_seconds += seconds
+            else:
+                self.misses += 1
+                self.miss_seconds += seconds
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    # --- Integrasi dengan handler ---
+
+    @staticmethod
+    def respond(request: Request, entry: CachedResponse) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": CATALOG_CACHE_CONTROL, **entry.headers}
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def _lookup(self, namespace: str, params: Dict[str, Any]) -> Tuple[Optional[str], Optional[CachedResponse]]:
+        if not self.enabled:
+            return None, None
+        key = self._key(namespace, params)
+        return key, self._get(key)
+
+    def _store(self, key: Optional[str], body: bytes, headers: Dict[str, str]) -> CachedResponse:
+        entry = CachedResponse(body=body, etag=_etag(body), headers=headers)
+        if key is not None:
+            self._put(key, entry)
+        return entry
+
+    def serve(
+        self,
+        request: Request,
+        namespace: str,
+        params: Dict[str, Any],
+        build: Callable[[], Tuple[bytes, Dict[str, str]]],
+    ) -> Response:
+        """
+        Mengembalikan respons dari cache, atau memanggil ``build`` (body JSON
+        dan header tambahan) lalu menyimpannya. Exception dari ``build``
+        (mis. HTTPException 404) diteruskan tanpa disimpan.
+        """
+        start = time.perf_counter()
+        key, entry = self._lookup(namespace, params)
+        if entry is not None:
+            response = self.respond(request, entry)
+            self._count(True, time.perf_counter() - start)
+            return response
+        entry = self._store(key, *build())
+        self._count(False, time.perf_counter() - start)
+        return self.respond(request, entry)
+
+    async def serve_async(
+        self,
+        request: Request,
+        namespace: str,
+        params: Dict[str, Any],
+        build: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]],
+    ) -> Response:
+        """Varian serve() untuk handler async; ``build`` berupa coroutine function."""
+        start = time.perf_counter()
+        key, entry = self._lookup(namespace, params)
+        if entry is not None:
+            response = self.respond(request, entry)
+            self._count(True, time.perf_counter() - start)
+            return response
+        entry = self._store(key, *(await build()))
+        self._count(False, time.perf_counter() - start)
+        return self.respond(request, entry)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries, hits, shared_hits, misses = len(self._entries), self.hits, self.shared_hits, self.misses
+            invalidations, hit_seconds, miss_seconds = self.invalidations, self.hit_seconds, self.miss_seconds
+        lookups = hits + misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "hits": hits,
+            "shared_hits": shared_hits,
+            "misses": misses,
+            "invalidations": invalidations,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "avg_hit_ms": hit_seconds * 1000 / hits if hits else 0.0,
+            "avg_miss_ms": miss_seconds * 1000 / misses if misses else 0.0,
+        }
+
+
+def detail_namespace(ebook_id: int) -> str:
+    return f"ebooks:{ebook_id}"
+
+
+def _catalog_cache() -> ResponseCache:
+    shared = shared_backend_from_url(RESPONSE_CACHE_SHARED_URL)
+    enabled = RESPONSE_CACHE_ENABLED and (shared is not None or RESPONSE_CACHE_SINGLE_WORKER)
+    if RESPONSE_CACHE_ENABLED and not enabled:
+        logger.info(
+            "Cache respons katalog mati: atur RESPONSE_CACHE_SHARED_URL, atau "
+            "RESPONSE_CACHE_SINGLE_WORKER=true jika server hanya berjalan dengan satu worker."
+        )
+    return ResponseCache(shared=shared, enabled=enabled)
+
+
+# Instance yang dipakai aplikasi
+catalog_cache = _catalog_cache()
+
+
+def get_catalog_db():
+    """
+    Sesi untuk endpoint katalog yang di-cache: primary selama cache aktif
+    (entri tidak boleh menyimpan data replika yang tertinggal), selain itu
+    sama dengan get_read_db. Sesi baru membuka koneksi saat query pertama,
+    jadi cache hit tidak memakai koneksi.
+    """
+    if catalog_cache.enabled:
+        yield from get_db()
+    else:
+        yield from get_read_db()
+
+
+async def get_async_catalog_db():
+    """Varian async dari get_catalog_db."""
+    source = get_async_db() if catalog_cache.enabled else get_async_read_db()
+    try:
+        yield await source.__anext__()
+    finally:
+        await source.aclose()
+
+
+def invalidate_ebook(ebook_id: Optional[int] = None):
+    """Dipanggil setelah eBook atau ulasannya berubah: katalog dan (jika ada) detailnya."""
+    namespaces = [LIST_NAMESPACE]
+    if ebook_id is not None:
+        namespaces.append(detail_namespace(ebook_id))
+    catalog_cache.invalidate(*namespaces)
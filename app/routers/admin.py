@@ -1,10 +1,11 @@
 # app/routers/admin.py
 
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
-from .. import crud, schemas, security, models
-from ..database import get_db
+from typing import Dict, List, Optional
+from .. import bulk_import, crud, schemas, security, models, response_cache
+from ..database import get_read_db
 
 router = APIRouter(
     prefix="/admin",
@@ -12,23 +13,35 @@ router = APIRouter(
     dependencies=[Depends(security.get_current_admin_user)]
 )
 
+def stats_range(
+    start: Optional[datetime] = Query(None, description="Awal rentang waktu (inklusif)"),
+    end: Optional[datetime] = Query(None, description="Akhir rentang waktu (eksklusif)"),
+):
+    """Rentang waktu opsional untuk statistik; tanpa rentang berarti sepanjang waktu."""
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end harus setelah start")
+    return start, end
+
 @router.get("/stats/most-downloaded", response_model=List[schemas.EbookStat])
-def get_stats_most_downloaded(db: Session = Depends(get_db)):
+def get_stats_most_downloaded(time_range: tuple = Depends(stats_range), db: Session = Depends(get_read_db)):
     """
     Endpoint untuk mendapatkan statistik buku yang paling banyak diunduh.
     HANYA BISA DIAKSES OLEH ADMIN.
     """
-    return crud.get_most_downloaded_ebooks(db, limit=5)
+    start, end = time_range
+    return crud.get_most_downloaded_ebooks(db, limit=5, start=start, end=end)
 
 @router.get("/stats/summary", response_model=schemas.DashboardSummary)
-def get_stats_summary(db: Session = Depends(get_db)):
+def get_stats_summary(time_range: tuple = Depends(stats_range), db: Session = Depends(get_read_db)):
     """
     Endpoint untuk mendapatkan ringkasan statistik dashboard admin.
+    Data diambil dari tabel rollup, bukan dari seluruh activity_log.
     HANYA BISA DIAKSES OLEH ADMIN.
     """
+    start, end = time_range
     total_users = crud.get_total_users_count(db)
-    top_users = crud.get_most_active_users(db, limit=5)
-    top_ebooks = crud.get_most_downloaded_ebooks(db, limit=5)
+    top_users = crud.get_most_active_users(db, limit=5, start=start, end=end)
+    top_ebooks = crud.get_most_downloaded_ebooks(db, limit=5, start=start, end=end)
     
     return {
         "total_users": total_users,
@@ -38,7 +51,7 @@ def get_stats_summary(db: Session = Depends(get_db)):
 
 # Endpoint untuk panel monitoring (admin)
 @router.get("/monitoring/latest", response_model=schemas.MonitoringPanel)
-def get_monitoring_panel(db: Session = Depends(get_db)):
+def get_monitoring_panel(db: Session = Depends(get_read_db)):
     """
     Endpoint untuk mendapatkan data monitoring terbaru (user & ebook).
     HANYA BISA DIAKSES OLEH ADMIN.
@@ -50,3 +63,37 @@ def get_monitoring_panel(db: Session = Depends(get_db)):
         "latest_users": latest_users,
         "latest_ebooks": latest_ebooks
     }
+
+@router.get("/monitoring/cache", response_model=Dict[str, float])
+def get_cache_stats():
+    """
+    Statistik cache respons katalog (hit ratio dan latensi rata-rata).
+    HANYA BISA DIAKSES OLEH ADMIN.
+    """
+    return response_cache.catalog_cache.stats()
+
+# Endpoint untuk impor katalog massal (admin)
+@router.post("/imports", response_model=schemas.BulkImportStatus, status_code=status.HTTP_202_ACCEPTED)
+def start_bulk_import(request: schemas.BulkImportRequest):
+    """
+    Memulai impor eBook di latar belakang dari direktori atau manifest
+    CSV/JSON di dalam IMPORT_ROOT server. Impor yang terhenti bisa dimulai
+    ulang dengan sumber yang sama dan akan melanjutkan dari checkpoint.
+    HANYA BISA DIAKSES OLEH ADMIN.
+    """
+    try:
+        source = bulk_import.resolve_source(request.source)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    report = bulk_import.start_job(source, batch_size=request.batch_size)
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Masih ada impor yang berjalan")
+    return report.as_dict()
+
+@router.get("/imports/current", response_model=schemas.BulkImportStatus)
+def get_bulk_import_status():
+    """Progres dan throughput impor terakhir. HANYA BISA DIAKSES OLEH ADMIN."""
+    report = bulk_import.current_job()
+    if report is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Belum ada impor")
+    return report.as_dict()
@@ -34,16 +34,24 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     user = crud.get_user_by_email(db, email=form_data.username)
 
     # 2. Jika user tidak ada ATAU password salah, kirim error
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = (
+        security.verify_and_update_password(form_data.password, user.hashed_password)
+        if user else (False, None)
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email atau password salah",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Hash lama (cost berbeda dari konfigurasi) diganti secara transparan
+    if new_hash:
+        crud.update_user_password_hash(db, user, new_hash)
+
     # 3. Jika berhasil, buat token JWT
     access_token = security.create_access_token(
-        data={"sub": user.email, "role": user.role}
+        data={"sub": user.email, "uid": user.id, "role": user.role}
     )
     
     # 4. Kembalikan token ke pengguna
@@ -0,0 +1,142 @@
+# app/routers/catalog_async.py
+"""
+Varian async dari endpoint baca yang paling sering dipanggil (katalog,
+detail, ulasan, baca online, unduh), memakai AsyncSession.
+
+Hanya dipasang jika USE_ASYNC_DB aktif. Router ini didaftarkan sebelum
+router sync sehingga rute dengan path yang sama dilayani dari sini; kontrak
+request/response identik dengan versi sync di ebooks.py dan reviews.py.
+"""
+import os
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import async_crud, crud, file_responses, models, pagination, response_cache, schemas, security
+from ..activity_buffer import record_activity_async
+from ..database import get_async_db, get_async_read_db
+
+# Dokumentasi OpenAPI tetap diambil dari rute sync yang setara
+router = APIRouter(tags=["Ebooks"], include_in_schema=False)
+
+
+async def _get_ebook_or_404(db: AsyncSession, ebook_id: int):
+    db_ebook = await async_crud.get_ebook(db, ebook_id=ebook_id)
+    if db_ebook is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ebook not found")
+    return db_ebook
+
+
+def _existing_file(db_ebook) -> str:
+    file_path = db_ebook.file_path
+    if not file_path or not os.path.exists(file_path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found on server")
+    return file_path
+
+
+@router.get("/ebooks/", response_model=List[schemas.Ebook])
+async def read_ebooks(
+    request: Request,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=100),
+    search: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(response_cache.get_async_catalog_db),
+):
+    try:
+        selected = crud.parse_ebook_fields(fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    async def build():
+        try:
+            if selected:
+                rows, next_cursor = await async_crud.get_ebook_rows(
+                    db, selected, skip=skip, limit=limit, search=search, sort_by=sort_by, cursor=cursor
+                )
+                body = response_cache.dumps(rows)
+            else:
+                ebooks, next_cursor = await async_crud.get_ebooks_page(
+                    db, skip=skip, limit=limit, search=search, sort_by=sort_by, cursor=cursor
+                )
+                body = response_cache.serialize(List[schemas.Ebook], ebooks)
+        except pagination.InvalidCursor as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+        headers = {pagination.NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+        return body, headers
+
+    params = {
+        "skip": skip, "limit": limit, "search": response_cache.normalize_search(search),
+        "sort_by": sort_by, "cursor": cursor, "fields": ",".join(selected) if selected else None,
+    }
+    return await response_cache.catalog_cache.serve_async(request, response_cache.LIST_NAMESPACE, params, build)
+
+
+@router.get("/ebooks/batch", response_model=List[schemas.Ebook])
+async def read_ebooks_batch(ids: List[str] = Query(...), db: AsyncSession = Depends(get_async_read_db)):
+    try:
+        ebook_ids = crud.parse_ebook_ids(ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    return await async_crud.get_ebooks_by_ids(db, ebook_ids)
+
+
+@router.get("/ebooks/{ebook_id}", response_model=schemas.Ebook)
+async def read_ebook_detail(
+    ebook_id: int, request: Request, db: AsyncSession = Depends(response_cache.get_async_catalog_db)
+):
+    async def build():
+        db_ebook = await _get_ebook_or_404(db, ebook_id)
+        return response_cache.serialize(schemas.Ebook, db_ebook), {}
+
+    namespace = response_cache.detail_namespace(ebook_id)
+    return await response_cache.catalog_cache.serve_async(request, namespace, {}, build)
+
+
+@router.get("/ebooks/{ebook_id}/reviews/", response_model=List[schemas.Review])
+async def read_reviews_for_ebook(
+    ebook_id: int,
+    response: Response,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: Literal["oldest", "newest", "highest", "lowest"] = "oldest",
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    await _get_ebook_or_404(db, ebook_id)
+    try:
+        reviews, next_cursor = await async_crud.get_ebook_reviews_page(
+            db, ebook_id=ebook_id, limit=limit, cursor=cursor, sort=sort
+        )
+    except pagination.InvalidCursor as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return reviews
+
+
+@router.get("/ebooks/{ebook_id}/download")
+async def download_ebook(
+    ebook_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(security.get_current_user),
+):
+    db_ebook = await _get_ebook_or_404(db, ebook_id)
+    file_path = _existing_file(db_ebook)
+    file_name = f"{db_ebook.title}{os.path.splitext(file_path)[1] or '.pdf'}"
+    response = file_responses.deliver(
+        request, file_path, media_type="application/pdf", filename=file_name, cache_control="private, no-cache"
+    )
+    if file_responses.is_new_transfer(request, response):
+        await record_activity_async(db, user_id=current_user.id, ebook_id=ebook_id, action="download")
+    return response
+
+
+@router.get("/ebooks/{ebook_id}/read")
+async def read_ebook_online(ebook_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    db_ebook = await _get_ebook_or_404(db, ebook_id)
+    file_path = _existing_file(db_ebook)
+    return file_responses.deliver(request, file_path, media_type="application/pdf", disposition="inline")
@@ -1,11 +1,12 @@
 # app/routers/ebooks.py
 
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from .. import crud, schemas, security, models
-from ..database import get_db
+from .. import content_index, crud, schemas, security, models, pagination, file_responses, recommendations, response_cache, storage, thumbnails
+from ..database import get_db, get_read_db
+from ..activity_buffer import record_activity
 import os
 
 router = APIRouter(
@@ -15,22 +16,54 @@ router = APIRouter(
 
 @router.get("/", response_model=List[schemas.Ebook])
 def read_ebooks(
+    request: Request,
     skip: int = 0, 
-    limit: int = 100, 
+    limit: int = Query(100, ge=1, le=100), 
     search: Optional[str] = None, 
     sort_by: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(response_cache.get_catalog_db)
 ):
     """
     Endpoint publik untuk melihat semua eBook.
     Bisa difilter dengan query parameter 'search'.
     Bisa diurutkan dengan query 'sort_by' (newest, popular, rating).
+    Halaman berikutnya diambil dengan 'cursor' dari header X-Next-Cursor.
+    'fields' memilih kolom yang dikirim: 'summary' (schemas.EbookSummary) atau
+    daftar field dipisah koma; tanpa 'fields' respons berbentuk schemas.Ebook.
+    Respons di-cache (lihat app/response_cache.py).
     """
-    ebooks = crud.get_ebooks(db, skip=skip, limit=limit, search=search, sort_by=sort_by) 
-    return ebooks
+    try:
+        selected = crud.parse_ebook_fields(fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    def build():
+        try:
+            if selected:
+                rows, next_cursor = crud.get_ebook_rows(
+                    db, selected, skip=skip, limit=limit, search=search, sort_by=sort_by, cursor=cursor
+                )
+                body = response_cache.dumps(rows)
+            else:
+                ebooks, next_cursor = crud.get_ebooks_page(
+                    db, skip=skip, limit=limit, search=search, sort_by=sort_by, cursor=cursor
+                )
+                body = response_cache.serialize(List[schemas.Ebook], ebooks)
+        except pagination.InvalidCursor as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+        headers = {pagination.NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+        return body, headers
+
+    params = {
+        "skip": skip, "limit": limit, "search": response_cache.normalize_search(search),
+        "sort_by": sort_by, "cursor": cursor, "fields": ",".join(selected) if selected else None,
+    }
+    return response_cache.catalog_cache.serve(request, response_cache.LIST_NAMESPACE, params, build)
 
 @router.post("/", response_model=schemas.Ebook, status_code=201)
-def create_new_ebook(
+async def create_new_ebook(
     title: str = Form(...),
     author: str = Form(...),
     description: Optional[str] = Form(None),
@@ -50,16 +83,86 @@ def create_new_ebook(
         description=description, 
         publication_year=publication_year
     )
-    return crud.create_ebook(db=db, ebook=ebook_data, pdf_file=pdf_file, cover_image=cover_image)
+    # File disimpan secara streaming (content-addressed) tanpa menahan satu thread
+    pdf_blob = await storage.save_upload(pdf_file)
+    cover_blob = await storage.save_upload(cover_image)
+    db_ebook = await run_in_threadpool(
+        crud.create_ebook, db=db, ebook=ebook_data, pdf_blob=pdf_blob, cover_blob=cover_blob
+    )
+    # Thumbnail cover dibuat di latar belakang, di luar jalur request.
+    # Setelah selesai, thumbnails.schedule mencatatnya dan membuang cache
+    # katalog agar cover_thumbnails ikut muncul.
+    thumbnails.schedule(db_ebook.cover_image_path)
+    # Ekstraksi teks untuk pencarian isi juga berjalan di latar belakang
+    content_index.schedule(db_ebook.file_path)
+    return db_ebook
+
+@router.get("/search/content", response_model=List[schemas.ContentHit])
+def search_ebook_content(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Endpoint publik untuk mencari eBook berdasarkan isi teksnya.
+    Hasil per halaman, lengkap dengan nomor halaman dan potongan teks.
+    eBook yang teksnya belum selesai diekstrak belum ikut muncul.
+    """
+    return content_index.search_content(db, q, limit=limit)
+
+@router.get("/batch", response_model=List[schemas.Ebook])
+def read_ebooks_batch(
+    ids: List[str] = Query(...),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Endpoint publik untuk mengambil banyak eBook sekaligus dalam satu query,
+    mis. /ebooks/batch?ids=3,1,7. Urutan hasil mengikuti 'ids';
+    id yang tidak ditemukan dilewati.
+    """
+    try:
+        ebook_ids = crud.parse_ebook_ids(ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    return crud.get_ebooks_by_ids(db, ebook_ids)
+
 @router.get("/{ebook_id}", response_model=schemas.Ebook)
-def read_ebook_detail(ebook_id: int, db: Session = Depends(get_db)):
+def read_ebook_detail(ebook_id: int, request: Request, db: Session = Depends(response_cache.get_catalog_db)):
     """
     Endpoint publik untuk melihat detail satu eBook berdasarkan ID.
+    Respons di-cache (lihat app/response_cache.py).
     """
-    db_ebook = crud.get_ebook(db, ebook_id=ebook_id)
-    if db_ebook is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ebook not found")
-    return db_ebook
+    def build():
+        db_ebook = crud.get_ebook(db, ebook_id=ebook_id)
+        if db_ebook is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ebook not found")
+        return response_cache.serialize(schemas.Ebook, db_ebook), {}
+
+    namespace = response_cache.detail_namespace(ebook_id)
+    return response_cache.catalog_cache.serve(request, namespace, {}, build)
+
+@router.get("/{ebook_id}/related", response_model=List[schemas.RelatedEbook])
+def read_related_ebooks(
+    ebook_id: int,
+    request: Request,
+    limit: int = Query(10, ge=1, le=recommendations.RELATED_CANDIDATES),
+    db: Session = Depends(response_cache.get_catalog_db),
+):
+    """
+    Endpoint publik: "pembaca yang mengunduh buku ini juga mengunduh".
+    Tetangga diambil dari model co-download di memori (app/recommendations.py),
+    lalu dilengkapi data ringkas eBook dalam satu query. Respons di-cache.
+    """
+    def build():
+        neighbours = recommendations.related(ebook_id, limit)
+        if not neighbours and not crud.ebook_exists(db, ebook_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ebook not found")
+        scores = dict(neighbours)
+        rows = crud.get_ebook_rows_by_ids(db, crud.EBOOK_FIELD_PRESETS["summary"], list(scores))
+        return response_cache.dumps([dict(row, score=scores[row["id"]]) for row in rows]), {}
+
+    namespace = response_cache.detail_namespace(ebook_id)
+    return response_cache.catalog_cache.serve(request, namespace, {"related": limit}, build)
 
 @router.put("/{ebook_id}", response_model=schemas.Ebook)
 def update_existing_ebook(
@@ -98,6 +201,7 @@ def delete_existing_ebook(
 @router.get("/{ebook_id}/download")
 def download_ebook(
     ebook_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(security.get_current_user)
 ):
@@ -114,19 +218,26 @@ def download_ebook(
     file_path = db_ebook.file_path
     if not file_path or not os.path.exists(file_path):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found on server")
-    # Simpan log aktivitas unduh
-    crud.create_activity_log(db, user_id=current_user.id, ebook_id=ebook_id, action="download")
+    # 3. Nama file untuk pengguna diambil dari judul (nama di disk berupa hash)
+    file_name = f"{db_ebook.title}{os.path.splitext(file_path)[1] or '.pdf'}"
 
-    # 3. Dapatkan nama file asli untuk diberikan kepada pengguna
-    file_name = os.path.basename(file_path)
+    # 4. Siapkan respons (mendukung 304 dan Range untuk melanjutkan unduhan);
+    #    dengan FILE_DELIVERY_MODE lain isi file dikirim oleh nginx / URL bertanda tangan
+    response = file_responses.deliver(
+        request, file_path, media_type='application/pdf', filename=file_name, cache_control="private, no-cache"
+    )
 
-    # 4. Kirim file sebagai respons
-    return FileResponse(path=file_path, media_type='application/pdf', filename=file_name)
+    # Simpan log aktivitas unduh (write-behind, tidak menunggu COMMIT).
+    # Lanjutan unduhan yang terputus dan respons 304 tidak dihitung ulang.
+    if file_responses.is_new_transfer(request, response):
+        record_activity(db, user_id=current_user.id, ebook_id=ebook_id, action="download")
+    return response
 
 # Endpoint untuk membaca eBook secara online di browser
 @router.get("/{ebook_id}/read")
 def read_ebook_online(
     ebook_id: int,
+    request: Request,
     db: Session = Depends(get_db)
     # DEPENDENCY current_user DIHAPUS DARI SINI
 ):
@@ -141,7 +252,8 @@ def read_ebook_online(
     if not file_path or not os.path.exists(file_path):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found on server")
 
-    return FileResponse(path=file_path, media_type='application/pdf', content_disposition_type="inline")
+    # PDF viewer di browser memakai Range untuk mengambil halaman secara bertahap
+    return file_responses.deliver(request, file_path, media_type='application/pdf', disposition="inline")
 
 
 # Endpoint untuk menambahkan eBook ke favorit
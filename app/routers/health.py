@@ -0,0 +1,28 @@
+# app/routers/health.py
+
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from .. import health
+
+router = APIRouter(tags=["Monitoring"])
+
+@router.get("/healthz", include_in_schema=False)
+async def read_liveness():
+    """
+    Probe liveness: proses hidup dan event loop masih melayani request. Tanpa
+    akses database, dan async agar tidak ikut antre di threadpool yang penuh.
+    """
+    return {"status": "ok"}
+
+@router.get("/readyz", include_in_schema=False)
+async def read_readiness():
+    """
+    Probe readiness: 200 jika startup worker sudah selesai dan primary database
+    bisa dihubungi, selain itu 503. Body berisi durasi cold start per fase.
+    """
+    report = health.startup.report()
+    ready = health.startup.ready and await health.check_database()
+    report["status"] = "ready" if ready else "not ready"
+    return JSONResponse(
+        report, status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
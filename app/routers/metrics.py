@@ -0,0 +1,23 @@
+# app/routers/metrics.py
+
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from .. import metrics
+
+router = APIRouter(tags=["Monitoring"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics(authorization: Optional[str] = Header(None)):
+    """
+    Metrik aplikasi dalam format teks Prometheus (lihat app/metrics.py).
+    Jika METRICS_TOKEN diisi, scraper harus mengirim header Bearer token tersebut.
+    """
+    if metrics.METRICS_TOKEN:
+        expected = f"Bearer {metrics.METRICS_TOKEN}"
+        if authorization is None or not hmac.compare_digest(authorization, expected):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token metrics tidak valid")
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,10 +1,10 @@
 # app/routers/reviews.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
-from .. import crud, schemas, security, models
-from ..database import get_db
+from typing import List, Literal, Optional
+from .. import crud, schemas, security, models, pagination
+from ..database import get_db, get_read_db
 
 router = APIRouter(
     prefix="/ebooks/{ebook_id}/reviews",
@@ -33,12 +33,46 @@ def create_review_for_ebook(
     return db_review
 
 @router.get("/", response_model=List[schemas.Review])
-def read_reviews_for_ebook(ebook_id: int, db: Session = Depends(get_db)):
+def read_reviews_for_ebook(
+    ebook_id: int,
+    response: Response,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    sort: Literal["oldest", "newest", "highest", "lowest"] = "oldest",
+    db: Session = Depends(get_read_db)
+):
     """
-    Endpoint publik untuk melihat semua ulasan dari sebuah eBook.
+    Endpoint publik untuk melihat ulasan dari sebuah eBook.
+    Halaman berikutnya diambil dengan 'cursor' dari header X-Next-Cursor.
     """
-    db_ebook = crud.get_ebook(db, ebook_id=ebook_id)
-    if not db_ebook:
+    if not crud.ebook_exists(db, ebook_id):
         raise HTTPException(status_code=404, detail="Ebook not found")
-        
-    return crud.get_ebook_reviews(db, ebook_id=ebook_id)
\ No newline at end of file
+
+    try:
+        reviews, next_cursor = crud.get_ebook_reviews_page(
+            db, ebook_id=ebook_id, limit=limit, cursor=cursor, sort=sort
+        )
+    except pagination.InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return reviews
+
+@router.delete("/{review_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_review_for_ebook(
+    ebook_id: int,
+    review_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(security.get_current_user)
+):
+    """
+    Menghapus ulasan. Hanya penulis ulasan atau admin yang boleh menghapus.
+    """
+    db_review = crud.get_review(db, ebook_id=ebook_id, review_id=review_id)
+    if not db_review:
+        raise HTTPException(status_code=404, detail="Review not found")
+    if db_review.user_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not allowed to delete this review")
+
+    crud.delete_ebook_review(db, db_review)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
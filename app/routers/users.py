@@ -1,9 +1,9 @@
 # app/routers/users.py
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from .. import schemas, security, models, crud
-from typing import List
+from .. import schemas, security, models, crud, pagination
+from typing import List, Optional
 from ..database import get_db
 
 router = APIRouter(
@@ -30,14 +30,56 @@ def read_user_favorites(
     """
     return crud.get_user_favorites(db, user_id=current_user.id)
 
+@router.post("/me/favorites", response_model=schemas.FavoriteBatchResult)
+def add_user_favorites(
+    batch: schemas.FavoriteBatch,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(security.get_current_user)
+):
+    """
+    Menambahkan banyak buku ke favorit sekaligus (satu query, satu transaksi).
+    Buku yang sudah menjadi favorit atau tidak ada dilewati.
+    """
+    ebook_ids = list(dict.fromkeys(batch.ebook_ids))
+    added = crud.add_favorites(db, user_id=current_user.id, ebook_ids=ebook_ids)
+    return schemas.FavoriteBatchResult(requested=len(ebook_ids), changed=added)
+
+@router.delete("/me/favorites", response_model=schemas.FavoriteBatchResult)
+def remove_user_favorites(
+    ids: List[str] = Query(...),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(security.get_current_user)
+):
+    """
+    Menghapus banyak buku dari favorit sekaligus, mis. ?ids=3,1,7.
+    """
+    try:
+        ebook_ids = crud.parse_ebook_ids(ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    removed = crud.remove_favorites(db, user_id=current_user.id, ebook_ids=ebook_ids)
+    return schemas.FavoriteBatchResult(requested=len(ebook_ids), changed=removed)
+
 # Endpoint untuk mendapatkan riwayat aktivitas pengguna yang sedang login
 @router.get("/me/history", response_model=List[schemas.ActivityLog])
 def read_user_activity_history(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(security.get_current_user)
 ):
     """
     Endpoint untuk mendapatkan riwayat aktivitas (download, dll.) 
-    dari pengguna yang sedang login.
+    dari pengguna yang sedang login, dari yang terbaru.
+    Halaman berikutnya diambil dengan 'cursor' dari header X-Next-Cursor.
     """
-    return crud.get_user_activity_logs(db, user_id=current_user.id)
+    try:
+        logs, next_cursor = crud.get_user_activity_logs_page(
+            db, user_id=current_user.id, limit=limit, cursor=cursor
+        )
+    except pagination.InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return logs
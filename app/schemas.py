@@ -1,6 +1,6 @@
 # app/schemas.py
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 class UserCreate(BaseModel):
@@ -21,20 +21,54 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
+    role: Optional[str] = None
+    issued_at: Optional[float] = None
+    expires_at: Optional[float] = None
 
 class Category(BaseModel):
     id: int
     name: str
     class Config: from_attributes = True
 
+class RatingSummary(BaseModel):
+    # Dari agregat ebook_stats; histogram: bintang ("1".."5") -> jumlah ulasan
+    count: int
+    average: float
+    histogram: Dict[str, int]
+
 class Ebook(BaseModel):
     id: int
     title: str
     author: Optional[str] = None
     description: Optional[str] = None
     publication_year: Optional[int] = None
+    page_count: Optional[int] = None
     cover_image_path: Optional[str] = None
+    cover_thumbnails: Dict[str, str] = {}
     categories: List[Category] = []
+    rating: Optional[RatingSummary] = None
+    class Config: from_attributes = True
+
+class EbookSummary(BaseModel):
+    # Bentuk ringkas untuk kartu katalog (GET /ebooks/?fields=summary), tanpa deskripsi
+    id: int
+    title: str
+    author: Optional[str] = None
+    publication_year: Optional[int] = None
+    cover_image_path: Optional[str] = None
+    cover_thumbnails: Dict[str, str] = {}
+    rating: Optional[RatingSummary] = None
+    class Config: from_attributes = True
+
+class RelatedEbook(EbookSummary):
+    # Kemiripan kosinus co-download (0..1), lihat app/recommendations.py
+    score: float
+
+class ContentHit(BaseModel):
+    ebook: Ebook
+    page_number: int
+    snippet: str
     class Config: from_attributes = True
 
 class EbookCreate(BaseModel):
@@ -49,6 +83,14 @@ class EbookUpdate(BaseModel):
     description: Optional[str] = None
     publication_year: Optional[int] = None
     
+class FavoriteBatch(BaseModel):
+    # Batas sama dengan crud.BATCH_MAX_IDS
+    ebook_ids: List[int] = Field(..., min_length=1, max_length=500)
+
+class FavoriteBatchResult(BaseModel):
+    requested: int
+    changed: int
+
 class ActivityLog(BaseModel):
     id: int
     action: str
@@ -84,4 +126,20 @@ class ReviewCreate(BaseModel):
 
 class MonitoringPanel(BaseModel):
     latest_users: List[UserResponse]
-    latest_ebooks: List[Ebook]
\ No newline at end of file
+    latest_ebooks: List[Ebook]
+
+class BulkImportRequest(BaseModel):
+    source: str
+    batch_size: Optional[int] = Field(None, ge=1, le=1000)
+
+class BulkImportStatus(BaseModel):
+    source: Optional[str] = None
+    running: bool
+    imported: int
+    skipped: int
+    failed: int
+    bytes_copied: int
+    elapsed_seconds: float
+    files_per_second: float
+    megabytes_per_second: float
+    error: Optional[str] = None
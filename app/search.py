@@ -0,0 +1,394 @@
+# app/search.py
+"""
+Subsistem pencarian eBook berbasis indeks teks.
+
+Indeks dibangun dari kolom title, author, dan description. Backend dipilih
+berdasarkan dialek database yang dipakai:
+
+- PostgreSQL: indeks GIN atas ekspresi tsvector berbobot (konfigurasi 'simple').
+- SQLite: tabel virtual FTS5 ``ebooks_fts`` dengan peringkat bm25.
+- Lainnya (atau SQLite tanpa FTS5): inverted index di dalam proses.
+
+Setiap token dicocokkan sebagai prefiks, sehingga pencarian per ketikan
+("pyth" -> "python") tetap memakai indeks.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, case, false, func, literal_column, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Query, Session
+
+from . import database, models
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Bobot relevansi per kolom: judul paling penting, lalu penulis, lalu deskripsi
+FIELD_WEIGHTS = {"title": 3.0, "author": 2.0, "description": 1.0}
+
+# Batas jumlah kandidat yang dikembalikan inverted index di dalam proses
+MAX_MEMORY_CANDIDATES = 1000
+
+
+def normalize(value: Optional[str]) -> str:
+    """Mengubah teks menjadi huruf kecil tanpa tanda diakritik."""
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """Memecah teks yang sudah dinormalisasi menjadi daftar token."""
+    return TOKEN_PATTERN.findall(normalize(value))
+
+
+class InvertedIndex:
+    """
+    Inverted index sederhana di memori: token -> {id dokumen: bobot}.
+    Kosakata disimpan terurut agar pencarian prefiks cukup memakai bisect.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._documents: Dict[int, set] = {}
+        self._vocabulary: List[str] = []
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._vocabulary = []
+
+    def add(self, doc_id: int, fields: Dict[str, Optional[str]], weights: Dict[str, float]):
+        """Menambahkan (atau mengganti) satu dokumen ke indeks."""
+        scores: Dict[str, float] = defaultdict(float)
+        for field, value in fields.items():
+            for token in tokenize(value):
+                scores[token] += weights.get(field, 1.0)
+        with self._lock:
+            self._remove_locked(doc_id)
+            for token, score in scores.items():
+                postings = self._postings[token]
+                if not postings:
+                    bisect.insort(self._vocabulary, token)
+                postings[doc_id] = score
+            self._documents[doc_id] = set(scores)
+
+    def remove(self, doc_id: int):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: int):
+        for token in self._documents.pop(doc_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[token]
+                position = bisect.bisect_left(self._vocabulary, token)
+                if position < len(self._vocabulary) and self._vocabulary[position] == token:
+                    del self._vocabulary[position]
+
+    def _match_prefix(self, prefix: str) -> Dict[int, float]:
+        matches: Dict[int, float] = {}
+        position = bisect.bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            for doc_id, score in self._postings[self._vocabulary[position]].items():
+                if score > matches.get(doc_id, 0.0):
+                    matches[doc_id] = score
+            position += 1
+        return matches
+
+    def search(self, term: str, limit: int = MAX_MEMORY_CANDIDATES) -> List[Tuple[int, float]]:
+        """
+        Mencari dokumen yang memuat semua token (sebagai prefiks).
+        Mengembalikan pasangan (id, skor) terurut dari yang paling relevan.
+        """
+        tokens = tokenize(term)
+        if not tokens:
+            return []
+        with self._lock:
+            # Token terpanjang biasanya paling selektif, jadi diproses lebih dulu
+            results: Optional[Dict[int, float]] = None
+            for token in sorted(set(tokens), key=len, reverse=True):
+                matches = self._match_prefix(token)
+                if results is None:
+                    results = matches
+                else:
+                    results = {
+                        doc_id: score + matches[doc_id]
+                        for doc_id, score in results.items()
+                        if doc_id in matches
+                    }
+                if not results:
+                    return []
+        ranked = sorted(results.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+class PostgresSearchBackend:
+    """Pencarian memakai tsvector berbobot dan indeks GIN ekspresi."""
+
+    name = "postgresql"
+    index_name = "ix_ebooks_search"
+    # Ekspresi ini harus identik dengan definisi indeks agar planner memakainya
+    document_sql = (
+        "setweight(to_tsvector('simple', coalesce(ebooks.title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(ebooks.author, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(ebooks.description, '')), 'C')"
+    )
+
+    def ensure(self, connection):
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {self.index_name} ON ebooks "
+            f"USING gin (({self.document_sql.replace('ebooks.', '')}))"
+        ))
+
+    def apply(self, db: Session, query: Query, term: str, order: bool) -> Query:
+        tokens = TOKEN_PATTERN.findall(term.lower())
+        if not tokens:
+            return query
+        document = literal_column(self.document_sql)
+        ts_query = func.to_tsquery(
+            literal_column("'simple'"), " & ".join(f"{token}:*" for token in tokens)
+        )
+        query = query.filter(document.op("@@")(ts_query))
+        if order:
+            query = query.order_by(func.ts_rank(document, ts_query).desc())
+        return query
+
+    def upsert(self, db: Session, ebook: models.Ebook):
+        # Indeks ekspresi dipelihara otomatis oleh PostgreSQL
+        pass
+
+    def delete(self, db: Session, ebook_id: int):
+        pass
+
+    def rebuild(self, db: Session):
+        db.execute(text(f"REINDEX INDEX {self.index_name}"))
+
+
+class SqliteFtsSearchBackend:
+    """Pencarian memakai tabel virtual FTS5 yang disinkronkan oleh crud."""
+
+    name = "sqlite-fts5"
+    table_name = "ebooks_fts"
+
+    def ensure(self, connection) -> bool:
+        """Membuat tabel FTS5; mengembalikan True jika tabel baru dibuat."""
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": self.table_name},
+        ).first()
+        if exists:
+            return False
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE {self.table_name} USING fts5("
+            "title, author, description, tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+        return True
+
+    def apply(self, db: Session, query: Query, term: str, order: bool) -> Query:
+        tokens = tokenize(term)
+        if not tokens:
+            return query
+        match = " ".join(f'"{token}"*' for token in tokens)
+        weights = ", ".join(str(weight) for weight in FIELD_WEIGHTS.values())
+        hits = (
+            text(
+                f"SELECT rowid AS ebook_id, bm25({self.table_name}, {weights}) AS rank "
+                f"FROM {self.table_name} WHERE {self.table_name} MATCH :match"
+            )
+            .bindparams(match=match)
+            .columns(ebook_id=Integer, rank=Float)
+            .subquery("search_hits")
+        )
+        query = query.join(hits, hits.c.ebook_id == models.Ebook.id)
+        if order:
+            # bm25 bernilai negatif; semakin kecil semakin relevan
+            query = query.order_by(hits.c.rank.asc())
+        return query
+
+    def upsert(self, db: Session, ebook: models.Ebook):
+        self.delete(db, ebook.id)
+        db.execute(
+            text(
+                f"INSERT INTO {self.table_name} (rowid, title, author, description) "
+                "VALUES (:id, :title, :author, :description)"
+            ),
+            {
+                "id": ebook.id,
+                "title": ebook.title,
+                "author": ebook.author,
+                "description": ebook.description,
+            },
+        )
+
+    def delete(self, db: Session, ebook_id: int):
+        db.execute(text(f"DELETE FROM {self.table_name} WHERE rowid = :id"), {"id": ebook_id})
+
+    def rebuild(self, db: Session):
+        db.execute(text(f"DELETE FROM {self.table_name}"))
+        db.execute(text(
+            f"INSERT INTO {self.table_name} (rowid, title, author, description) "
+            "SELECT id, title, author, description FROM ebooks"
+        ))
+
+
+class MemorySearchBackend:
+    """
+    Fallback inverted index di dalam proses. Indeks dimuat dari database saat
+    pencarian pertama, lalu diperbarui oleh crud. Setiap proses worker memiliki
+    salinan sendiri.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self.index = InvertedIndex()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def _ensure_loaded(self, db: Session):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self.rebuild(db)
+
+    def apply(self, db: Session, query: Query, term: str, order: bool) -> Query:
+        if not tokenize(term):
+            return query
+        self._ensure_loaded(db)
+        ids = [ebook_id for ebook_id, _ in self.index.search(term)]
+        if not ids:
+            return query.filter(false())
+        query = query.filter(models.Ebook.id.in_(ids))
+        if order:
+            positions = {ebook_id: position for position, ebook_id in enumerate(ids)}
+            query = query.order_by(case(positions, value=models.Ebook.id))
+        return query
+
+    def upsert(self, db: Session, ebook: models.Ebook):
+        if self._loaded:
+            self.index.add(ebook.id, _ebook_fields(ebook), FIELD_WEIGHTS)
+
+    def delete(self, db: Session, ebook_id: int):
+        self.index.remove(ebook_id)
+
+    def rebuild(self, db: Session):
+        self.index.clear()
+        rows = db.query(
+            models.Ebook.id, models.Ebook.title, models.Ebook.author, models.Ebook.description
+        ).yield_per(1000)
+        for row in rows:
+            self.index.add(row.id, _ebook_fields(row), FIELD_WEIGHTS)
+        self._loaded = True
+
+
+def _ebook_fields(ebook) -> Dict[str, Optional[str]]:
+    return {field: getattr(ebook, field) for field in FIELD_WEIGHTS}
+
+
+_backends: Dict[object, object] = {}
+_backends_lock = threading.Lock()
+
+
+def ensure_index(engine):
+    """
+    Menyiapkan struktur indeks untuk engine tertentu dan memilih backend-nya.
+    Aman dipanggil berulang kali.
+    """
+    with _backends_lock:
+        backend = _backends.get(engine)
+        if backend is not None:
+            return backend
+
+        dialect = engine.dialect.name
+        if dialect == "postgresql":
+            backend = PostgresSearchBackend()
+            with engine.begin() as connection:
+                backend.ensure(connection)
+        elif dialect == "sqlite":
+            backend = SqliteFtsSearchBackend()
+            try:
+                with engine.begin() as connection:
+                    if backend.ensure(connection):
+                        # Tabel baru: isi dari data eBook yang sudah ada
+                        connection.execute(text(
+                            f"INSERT INTO {backend.table_name} (rowid, title, author, description) "
+                            "SELECT id, title, author, description FROM ebooks"
+                        ))
+            except OperationalError:
+                # SQLite dikompilasi tanpa FTS5
+                backend = MemorySearchBackend()
+        else:
+            backend = MemorySearchBackend()
+
+        _backends[engine] = backend
+        return backend
+
+
+def _has_table(engine, name: str) -> bool:
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": name}
+        ).first() is not None
+
+
+def select_backend(engine):
+    """
+    Memilih backend pencarian untuk engine tanpa DDL; dipakai saat worker start
+    dan per request. Strukturnya disiapkan ensure_index lewat
+    migrations.migrate. Hanya SQLite yang belum punya tabel FTS masih dibuat
+    di sini (SQLite hanya dipakai untuk pengembangan).
+    """
+    with _backends_lock:
+        backend = _backends.get(engine)
+        if backend is not None:
+            return backend
+        dialect = engine.dialect.name
+        if dialect == "postgresql":
+            backend = _backends[engine] = PostgresSearchBackend()
+            return backend
+        if dialect == "sqlite" and _has_table(engine, SqliteFtsSearchBackend.table_name):
+            backend = _backends[engine] = SqliteFtsSearchBackend()
+            return backend
+    return ensure_index(engine)
+
+def get_backend(db: Session):
+    """Mengambil backend pencarian untuk engine yang dipakai sesi ini."""
+    # Replika dan engine async memakai indeks yang sama dengan primary; DDL hanya di primary
+    engine = database.primary_engine(db.get_bind())
+    return _backends.get(engine) or select_backend(engine)
+
+
+def apply_search(db: Session, query: Query, term: str, order: bool = True) -> Query:
+    """
+    Menyaring query eBook dengan kata kunci pencarian.
+    Jika ``order`` bernilai True, hasil diurutkan berdasarkan relevansi.
+    """
+    return get_backend(db).apply(db, query, term, order)
+
+
+def index_ebook(db: Session, ebook: models.Ebook):
+    """Memasukkan atau memperbarui satu eBook di indeks pencarian."""
+    get_backend(db).upsert(db, ebook)
+
+
+def remove_ebook(db: Session, ebook_id: int):
+    """Menghapus satu eBook dari indeks pencarian."""
+    get_backend(db).delete(db, ebook_id)
+
+
+def rebuild_index(db: Session):
+    """Membangun ulang seluruh indeks pencarian dari tabel ebooks."""
+    get_backend(db).rebuild(db)
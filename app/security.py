@@ -1,8 +1,11 @@
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from dotenv import load_dotenv
+from functools import lru_cache
+from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
@@ -11,68 +14,243 @@ from pydantic import ValidationError
 from . import schemas, crud, models
 from .database import get_db
 
-load_dotenv()
+# Konfigurasi untuk hashing password menggunakan bcrypt.
+# Hash dengan cost berbeda dari BCRYPT_ROUNDS ditandai perlu di-hash ulang.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
 
-# Konfigurasi untuk hashing password menggunakan bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib dan jose diimpor saat pertama dipakai, bukan saat worker start:
+# hashing berjalan di process pool, dan token yang sudah di-cache tidak
+# pernah perlu di-decode ulang.
+@lru_cache(maxsize=None)
+def _password_context():
+    from passlib.context import CryptContext
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+        bcrypt__max_rounds=BCRYPT_ROUNDS,
+    )
+
+# Hashing dijalankan di process pool terpisah agar bcrypt tidak menghabiskan
+# thread pool request. Jumlah pekerjaan yang boleh antre dibatasi; sisanya
+# langsung ditolak dengan 503 + Retry-After.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", PASSWORD_HASH_WORKERS * 4))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 2))
+
+def _hash_password(password: str) -> str:
+    return _password_context().hash(password)
+
+def _verify_and_update_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return _password_context().verify_and_update(password, hashed_password)
+
+class PasswordHasher:
+    """Process pool berukuran tetap dengan batas antrean (admission control)."""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_limit: int = PASSWORD_HASH_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._slots = threading.BoundedSemaphore(max(1, queue_limit))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Dibuat saat pertama dipakai, setelah aplikasi selesai diinisialisasi
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server sedang sibuk, silakan coba lagi.",
+                headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+            )
+        try:
+            if self.workers <= 0:
+                return func(*args)
+            return self._get_executor().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+password_hasher = PasswordHasher()
 
 def verify_password(plain_password, hashed_password):
     """Memverifikasi password polos dengan password yang sudah di-hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    verified, _ = verify_and_update_password(plain_password, hashed_password)
+    return verified
+
+def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Memverifikasi password; jika valid tetapi hash-nya memakai cost lama,
+    ikut mengembalikan hash baru yang harus disimpan.
+    """
+    return password_hasher.run(_verify_and_update_password, plain_password, hashed_password)
 
 def get_password_hash(password):
     """Menghasilkan hash dari password."""
-    return pwd_context.hash(password)
+    return password_hasher.run(_hash_password, password)
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
 def create_access_token(data: dict):
+    from jose import jwt
     to_encode = data.copy()
-    # Menambahkan waktu kedaluwarsa token
-    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # Menambahkan waktu terbit dan kedaluwarsa token
+    now = datetime.now(timezone.utc)
+    expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"iat": now, "exp": expire})
     # Membuat token JWT
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 60))
+
+class TokenCache:
     """
-    Dependency "Penjaga Keamanan".
-    Memeriksa token JWT, dan mengembalikan data user jika valid.
+    Cache LRU berbatas untuk token yang sudah diverifikasi -> snapshot user.
+    Entri berlaku sampai TTL habis atau token kedaluwarsa, mana yang lebih dulu.
+    Cache ini per proses: invalidasi hanya berlaku di proses yang memanggilnya,
+    proses lain mengikuti setelah TTL habis.
     """
-    credentials_exception = HTTPException(
+
+    def __init__(self, max_size: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._tokens_by_user: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[schemas.UserResponse]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    self._discard(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, user: schemas.UserResponse, token_expires_at: float):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._discard(token)
+            self._entries[token] = (user, min(time.time() + self.ttl, token_expires_at))
+            self._tokens_by_user.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        """Membuang semua entri milik user di proses ini."""
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._discard(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _discard(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[0].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[0].id]
+
+token_cache = TokenCache()
+
+def invalidate_user(user_id: int):
+    """Dipanggil setiap kali role atau akun user berubah."""
+    token_cache.invalidate_user(user_id)
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_access_token(token: str) -> schemas.TokenData:
+    """Memverifikasi tanda tangan dan masa berlaku token, lalu mengembalikan klaimnya."""
+    from jose import JWTError, jwt
     try:
-        # 1. Decode token
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
-        # 2. Validasi isi token dengan skema
-        token_data = schemas.TokenData(email=email)
+            raise _credentials_exception()
+        return schemas.TokenData(
+            email=email,
+            user_id=payload.get("uid"),
+            role=payload.get("role"),
+            issued_at=payload.get("iat"),
+            expires_at=payload.get("exp"),
+        )
     except (JWTError, ValidationError):
         # Jika token tidak valid atau isinya salah
-        raise credentials_exception
-    
-    # 3. Ambil data user dari database
-    user = crud.get_user_by_email(db, email=token_data.email)
-    if user is None:
-        raise credentials_exception
-    
-    # 4. Jika semua valid, kembalikan data user
-    return user
-
-def get_current_admin_user(current_user: models.User = Depends(get_current_user)):
+        raise _credentials_exception()
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """
+    Dependency "Penjaga Keamanan".
+    Memeriksa token JWT, dan mengembalikan snapshot data user jika valid.
+    Token yang sudah pernah diverifikasi dilayani dari cache tanpa decode
+    maupun query database.
+    """
+    # 1. Jalur cepat: token sudah terverifikasi sebelumnya
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
+    # 2. Decode dan validasi token
+    token_data = decode_access_token(token)
+
+    # 3. Ambil data user dari database (token lama tanpa klaim uid memakai email)
+    if token_data.user_id is not None:
+        user = db.get(models.User, token_data.user_id)
+    else:
+        user = crud.get_user_by_email(db, email=token_data.email)
+    if user is None or user.email != token_data.email:
+        raise _credentials_exception()
+
+    # 4. Simpan snapshot ke cache lalu kembalikan
+    snapshot = schemas.UserResponse.model_validate(user)
+    token_cache.put(token, snapshot, token_data.expires_at or 0)
+    return snapshot
+
+def get_current_admin_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     """
     Dependency yang memeriksa apakah pengguna saat ini adalah admin.
+    Role diambil dari snapshot user milik get_current_user (cache berumur
+    AUTH_CACHE_TTL, dimuat ulang dari database saat miss), bukan dari klaim
+    role di token: perubahan role atau penghapusan user lewat proses lain
+    (mis. manage set-role) berlaku paling lama AUTH_CACHE_TTL detik kemudian.
     """
+    current_user = get_current_user(token=token, db=db)
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
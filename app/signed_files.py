@@ -0,0 +1,69 @@
+# app/signed_files.py
+"""
+Handler ringan untuk URL file bertanda tangan (FILE_DELIVERY_MODE=signed).
+
+Tidak memakai database, autentikasi, maupun middleware aplikasi: hanya
+memverifikasi HMAC dan masa berlaku URL (file_responses.verify_signed_file),
+lalu mengirim file dengan Range dan ETag, atau menyerahkannya ke server web
+jika SIGNED_FILES_BACKEND=x-accel / x-sendfile.
+
+Jika SIGNED_URL_BASE berupa path (default ``/files/``), handler ini dipasang
+di app utama. Untuk memisahkan lalu lintas file dari worker API, arahkan
+SIGNED_URL_BASE ke host lain yang menjalankan:
+    uvicorn app.signed_files:app --port 8001
+Frontend mengunduh file lewat XHR, jadi host terpisah perlu
+SIGNED_FILES_CORS_ORIGINS (daftar origin dipisah koma).
+"""
+import mimetypes
+import os
+
+from dotenv import load_dotenv
+
+# Dijalankan sendiri, modul ini tidak melewati app.database yang memuat .env
+load_dotenv()
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware import Middleware  # noqa: E402
+from starlette.middleware.cors import CORSMiddleware  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import PlainTextResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from . import file_responses  # noqa: E402
+
+SIGNED_FILES_CORS_ORIGINS = [
+    origin.strip() for origin in os.getenv("SIGNED_FILES_CORS_ORIGINS", "").split(",") if origin.strip()
+]
+
+
+async def serve_signed_file(request: Request):
+    try:
+        path, disposition, filename, remaining = file_responses.verify_signed_file(
+            request.path_params["path"], request.query_params
+        )
+    except (file_responses.InvalidSignature, ValueError) as exc:
+        return PlainTextResponse(str(exc), status_code=403)
+    if not os.path.isfile(path):
+        return PlainTextResponse("File not found on server", status_code=404)
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    # Boleh di-cache browser selama URL masih berlaku
+    return file_responses.deliver(
+        request, path, media_type, filename, disposition,
+        cache_control=f"private, max-age={remaining}", mode=file_responses.SIGNED_FILES_BACKEND,
+    )
+
+
+middleware = []
+if SIGNED_FILES_CORS_ORIGINS:
+    middleware.append(Middleware(
+        CORSMiddleware,
+        allow_origins=SIGNED_FILES_CORS_ORIGINS,
+        allow_methods=["GET", "HEAD"],
+        allow_headers=["Range", "If-Range", "If-None-Match"],
+        expose_headers=["ETag", "Last-Modified", "Accept-Ranges", "Content-Range", "Content-Disposition"],
+    ))
+
+app = Starlette(
+    routes=[Route("/{path:path}", serve_signed_file, methods=["GET", "HEAD"])],
+    middleware=middleware,
+)
@@ -0,0 +1,178 @@
+# app/storage.py
+"""
+Penyimpanan file upload berbasis alamat konten (content-addressed).
+
+File disimpan dengan nama hash SHA-256 isinya di bawah direktori bertingkat
+``uploads/blobs/ab/cd/<hash>.<ext>``, sehingga:
+
+- dua file berbeda dengan nama yang sama tidak saling menimpa,
+- file yang sama yang di-upload berulang kali hanya disimpan sekali.
+
+Jumlah referensi setiap blob dicatat di tabel ``stored_files`` (lihat
+crud.acquire_stored_file / crud.release_stored_file); blob yang tidak lagi
+dipakai eBook mana pun dihapus dari disk oleh ``python -m app.manage gc-blobs``
+setelah masa tenggang (--min-age-hours).
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+from typing import BinaryIO, NamedTuple, Optional
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.staticfiles import StaticFiles
+
+UPLOAD_DIRECTORY = "uploads"
+BLOB_DIRECTORY = os.path.join(UPLOAD_DIRECTORY, "blobs")
+# Upload yang belum selesai ditulis di luar direktori yang disajikan di /uploads,
+# tetapi bersebelahan dengannya agar os.replace ke blob tetap atomik (filesystem sama)
+TEMP_DIRECTORY = f"{UPLOAD_DIRECTORY}-tmp"
+CHUNK_SIZE = 1024 * 1024
+
+# File content-addressed tidak pernah berubah isi, jadi boleh di-cache selamanya
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+CONTENT_ADDRESS_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+EXTENSION_PATTERN = re.compile(r"^\.[A-Za-z0-9]{1,10}$")
+
+
+class StoredBlob(NamedTuple):
+    sha256: str
+    path: str
+    size: int
+
+
+def blob_path(sha256: str, extension: str) -> str:
+    """Path blob untuk hash tertentu: uploads/blobs/ab/cd/<hash><ext>."""
+    return os.path.join(BLOB_DIRECTORY, sha256[:2], sha256[2:4], f"{sha256}{extension}")
+
+
+def is_content_address(name: str) -> bool:
+    return bool(CONTENT_ADDRESS_PATTERN.match(name))
+
+
+def is_blob_path(path: Optional[str]) -> bool:
+    """True jika path dikelola oleh penyimpanan ini (bukan file lama di uploads/)."""
+    if not path:
+        return False
+    return os.path.normpath(path).startswith(os.path.normpath(BLOB_DIRECTORY) + os.sep)
+
+
+def _extension(filename: Optional[str]) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if EXTENSION_PATTERN.match(extension) else ""
+
+
+def _open_temp() -> BinaryIO:
+    os.makedirs(TEMP_DIRECTORY, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=TEMP_DIRECTORY, suffix=".part")
+    os.close(fd)
+    # Dibuka ulang lewat path agar handle.name berisi path file sementara
+    return open(path, "wb")
+
+
+def _write_chunk(handle: BinaryIO, hasher, chunk: bytes):
+    hasher.update(chunk)
+    handle.write(chunk)
+
+
+def _commit_temp(handle: BinaryIO, hasher, size: int, extension: str) -> StoredBlob:
+    """Menutup file sementara lalu memindahkannya ke path blob final."""
+    handle.close()
+    sha256 = hasher.hexdigest()
+    path = blob_path(sha256, extension)
+    try:
+        # Isi yang sama sudah tersimpan: segarkan mtime dulu agar garbage
+        # collector (crud.collect_orphan_blobs) tidak menghapusnya sebelum
+        # referensinya tercatat, baru salinan baru dibuang
+        os.utime(path)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(handle.name, path)
+    else:
+        os.remove(handle.name)
+    return StoredBlob(sha256=sha256, path=path, size=size)
+
+
+def _discard_temp(handle: BinaryIO):
+    handle.close()
+    if os.path.exists(handle.name):
+        os.remove(handle.name)
+
+
+async def save_upload(upload: UploadFile) -> StoredBlob:
+    """
+    Menyimpan UploadFile secara streaming per chunk sambil menghitung hash.
+    Event loop hanya menunggu pembacaan; hashing dan penulisan ke disk
+    dijalankan per chunk di thread pool, sehingga tidak ada thread yang
+    tertahan selama seluruh upload.
+    """
+    hasher = hashlib.sha256()
+    handle = await run_in_threadpool(_open_temp)
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            await run_in_threadpool(_write_chunk, handle, hasher, chunk)
+        return await run_in_threadpool(_commit_temp, handle, hasher, size, _extension(upload.filename))
+    except BaseException:
+        await run_in_threadpool(_discard_temp, handle)
+        raise
+
+
+def save_file(source: BinaryIO, filename: Optional[str]) -> StoredBlob:
+    """Versi sinkron dari save_upload untuk file yang sudah ada di disk."""
+    hasher = hashlib.sha256()
+    handle = _open_temp()
+    size = 0
+    try:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            _write_chunk(handle, hasher, chunk)
+        return _commit_temp(handle, hasher, size, _extension(filename))
+    except BaseException:
+        _discard_temp(handle)
+        raise
+
+
+def remove_blob(path: str):
+    """Menghapus blob dari disk (dipanggil setelah referensi terakhir dilepas)."""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def iter_blob_paths():
+    """Menelusuri semua blob yang ada di disk."""
+    for directory, _, files in os.walk(BLOB_DIRECTORY):
+        for name in files:
+            yield os.path.join(directory, name)
+
+
+def is_stale(path: str, min_age_seconds: float) -> bool:
+    try:
+        return time.time() - os.path.getmtime(path) >= min_age_seconds
+    except FileNotFoundError:
+        return False
+
+
+class UploadStaticFiles(StaticFiles):
+    """
+    StaticFiles untuk /uploads yang menambahkan Cache-Control immutable pada
+    file content-addressed (blob dan thumbnail). File lama tetap memakai
+    validasi biasa (ETag/Last-Modified).
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        name = os.path.basename(str(full_path)).split(".")[0].split("-")[0]
+        if is_content_address(name):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
@@ -0,0 +1,164 @@
+# app/thumbnails.py
+"""
+Pipeline thumbnail cover eBook.
+
+Setiap cover dibuatkan beberapa ukuran dalam format WebP di
+``uploads/thumbs/ab/<kunci>-<ukuran>.webp``. Kunci diambil dari hash isi
+cover (blob content-addressed), sehingga nama file tidak pernah berubah isi
+dan aman di-cache selamanya oleh browser.
+
+Pembuatan thumbnail berjalan di process pool terpisah, tidak di jalur
+request. Setelah selesai, ukuran yang tersedia dicatat di kolom
+ebooks.thumbnail_sizes, sehingga respons katalog menyusun URL thumbnail tanpa
+memeriksa disk. Pillow adalah dependensi opsional; tanpa Pillow pipeline ini tidak
+melakukan apa-apa dan klien memakai cover aslinya.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from . import storage
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIRECTORY = os.path.join(storage.UPLOAD_DIRECTORY, "thumbs")
+# Lebar maksimum per varian; tinggi mengikuti rasio cover (maks 3:2)
+THUMBNAIL_SIZES = {"sm": 160, "md": 320, "lg": 640}
+THUMBNAIL_FORMAT = "webp"
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", 1))
+
+
+def _pillow():
+    """Mengimpor Pillow saat dibutuhkan saja; None jika tidak terpasang."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def available() -> bool:
+    return _pillow() is not None
+
+
+def _cover_key(cover_path: str) -> str:
+    name = os.path.splitext(os.path.basename(cover_path))[0]
+    if storage.is_content_address(name):
+        return name
+    # Cover lama di luar blob storage: kunci dari path-nya
+    return hashlib.sha256(cover_path.encode()).hexdigest()
+
+
+def thumbnail_path(cover_path: str, size: str) -> str:
+    key = _cover_key(cover_path)
+    return os.path.join(THUMBNAIL_DIRECTORY, key[:2], f"{key}-{size}.{THUMBNAIL_FORMAT}")
+
+
+def format_sizes(sizes: Iterable[str]) -> Optional[str]:
+    """Nilai kolom ebooks.thumbnail_sizes untuk ukuran yang tersedia; None jika tidak ada."""
+    sizes = set(sizes)
+    return ",".join(size for size in THUMBNAIL_SIZES if size in sizes) or None
+
+
+def thumbnail_urls(cover_path: Optional[str], sizes: Optional[str]) -> Dict[str, str]:
+    """Path thumbnail dari nilai ebooks.thumbnail_sizes, tanpa akses disk."""
+    if not cover_path or not sizes:
+        return {}
+    return {size: thumbnail_path(cover_path, size) for size in sizes.split(",") if size in THUMBNAIL_SIZES}
+
+
+def existing_thumbnails(cover_path: Optional[str]) -> Dict[str, str]:
+    """Varian thumbnail yang sudah tersedia di disk untuk sebuah cover."""
+    if not cover_path:
+        return {}
+    paths = {size: thumbnail_path(cover_path, size) for size in THUMBNAIL_SIZES}
+    return {size: path for size, path in paths.items() if os.path.exists(path)}
+
+
+def remove_thumbnails(cover_path: Optional[str]):
+    """Menghapus semua varian thumbnail milik sebuah cover."""
+    for path in existing_thumbnails(cover_path).values():
+        os.remove(path)
+
+
+def generate_thumbnails(cover_path: str) -> Dict[str, str]:
+    """
+    Membuat semua varian thumbnail yang belum ada. Dijalankan di process
+    pool; juga bisa dipanggil langsung (backfill).
+    """
+    Image = _pillow()
+    if Image is None or not os.path.exists(cover_path):
+        return {}
+    results = {}
+    with Image.open(cover_path) as source:
+        source = source.convert("RGB")
+        for size, width in THUMBNAIL_SIZES.items():
+            path = thumbnail_path(cover_path, size)
+            results[size] = path
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            image = source.copy()
+            image.thumbnail((width, width * 3 // 2), Image.LANCZOS)
+            temp_path = f"{path}.{os.getpid()}.part"
+            image.save(temp_path, THUMBNAIL_FORMAT.upper(), quality=THUMBNAIL_QUALITY, method=4)
+            os.replace(temp_path, path)
+    return results
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS)
+        return _executor
+
+
+def _record(cover_path: str, future: Future):
+    exception = future.exception()
+    if exception is not None:
+        logger.error("Gagal membuat thumbnail: %s", exception)
+        return
+    sizes = format_sizes(future.result())
+    if sizes is None:
+        return
+    # Diimpor di sini: crud dan models sendiri mengimpor modul ini
+    from . import crud
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        crud.mark_thumbnails(db, cover_path, sizes)
+    except Exception:
+        logger.exception("Gagal mencatat thumbnail %s", cover_path)
+    finally:
+        db.close()
+
+
+def schedule(cover_path: Optional[str]) -> Optional[Future]:
+    """
+    Menjadwalkan pembuatan thumbnail di latar belakang (fire-and-forget).
+    Setelah selesai, ukurannya dicatat di ebooks.thumbnail_sizes dan cache
+    katalog eBook yang memakai cover ini dibuang.
+    """
+    if not cover_path or not available():
+        return None
+    future = _get_executor().submit(generate_thumbnails, cover_path)
+    future.add_done_callback(lambda done: _record(cover_path, done))
+    return future
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
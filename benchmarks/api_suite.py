@@ -0,0 +1,324 @@
+# benchmarks/api_suite.py
+"""
+Suite benchmark end-to-end untuk API: dataset sintetis (benchmarks/seed.py)
+ditambah skenario request terhadap aplikasi FastAPI yang sebenarnya, dijalankan
+dengan uvicorn sebagai subprocess.
+
+Skenario mencakup katalog dengan setiap sort_by (juga halaman 100 eBook
+lengkap vs fields=summary), pencarian, detail dan ulasan, login, unduhan,
+serta dashboard admin. Untuk setiap skenario dicatat throughput, latensi
+p50/p95/p99, dan rata-rata ukuran body, lalu ditulis sebagai JSON beserta
+commit git dan ukuran dataset, sehingga hasil antar-commit bisa dibandingkan:
+
+    python benchmarks/api_suite.py --size small --output baseline.json
+    (ubah kode)
+    python benchmarks/api_suite.py --size small --output hasil.json --compare baseline.json --max-regression 10
+
+Tanpa DATABASE_URL, database SQLite baru dibuat di direktori kerja sementara
+(BENCHMARK_WORKDIR). Dengan DATABASE_URL ke PostgreSQL, dataset hanya dibuat
+jika belum ada. Pengaturan aplikasi lain (mis. RESPONSE_CACHE_ENABLED,
+USE_ASYNC_DB, DB_POOL_SIZE) diteruskan apa adanya ke server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+WORKDIR = os.environ.setdefault("BENCHMARK_WORKDIR", tempfile.mkdtemp(prefix="bench-api-"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORKDIR}/bench.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import seed  # noqa: E402
+
+PERCENTILES = {"p50": 0.50, "p95": 0.95, "p99": 0.99}
+
+
+class Request(NamedTuple):
+    method: str
+    url: str
+    auth: Optional[str] = None
+    data: Optional[dict] = None
+
+
+class Scenario(NamedTuple):
+    name: str
+    build: Callable[[random.Random, dict], Request]
+    # Porsi dari --requests; login jauh lebih mahal karena bcrypt
+    weight: float = 1.0
+
+
+def _ebook_id(rng: random.Random, context: dict) -> int:
+    return rng.randint(1, context["ebooks"])
+
+
+def _since(days: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("browse_id", lambda rng, ctx: Request("GET", "/ebooks/?limit=20")),
+    Scenario("browse_newest", lambda rng, ctx: Request("GET", "/ebooks/?limit=20&sort_by=newest")),
+    Scenario("browse_popular", lambda rng, ctx: Request("GET", "/ebooks/?limit=20&sort_by=popular")),
+    Scenario("browse_rating", lambda rng, ctx: Request("GET", "/ebooks/?limit=20&sort_by=rating")),
+    Scenario("browse_full_100", lambda rng, ctx: Request("GET", "/ebooks/?limit=100")),
+    Scenario("browse_summary_100", lambda rng, ctx: Request("GET", "/ebooks/?limit=100&fields=summary")),
+    Scenario("browse_offset", lambda rng, ctx: Request("GET", f"/ebooks/?limit=20&skip={rng.randrange(0, 2000, 20)}")),
+    Scenario("search_word", lambda rng, ctx: Request("GET", f"/ebooks/?limit=20&search={rng.choice(seed.WORDS)}")),
+    Scenario("search_prefix", lambda rng, ctx: Request("GET", f"/ebooks/?limit=20&search={rng.choice(seed.WORDS)[:4]}")),
+    Scenario("ebook_detail", lambda rng, ctx: Request("GET", f"/ebooks/{_ebook_id(rng, ctx)}")),
+    Scenario("ebook_reviews", lambda rng, ctx: Request("GET", f"/ebooks/{_ebook_id(rng, ctx)}/reviews/?limit=20")),
+    Scenario(
+        "login",
+        lambda rng, ctx: Request("POST", "/auth/login", data={
+            "username": seed.user_email(rng.randint(1, ctx["users"] - 1)), "password": seed.BENCHMARK_PASSWORD,
+        }),
+        weight=0.1,
+    ),
+    Scenario("download", lambda rng, ctx: Request("GET", f"/ebooks/{_ebook_id(rng, ctx)}/download", auth="user")),
+    Scenario("admin_summary", lambda rng, ctx: Request("GET", "/admin/stats/summary", auth="admin")),
+    Scenario(
+        "admin_summary_30d",
+        lambda rng, ctx: Request("GET", f"/admin/stats/summary?start={_since(30)}", auth="admin"),
+    ),
+    Scenario("admin_most_downloaded", lambda rng, ctx: Request("GET", "/admin/stats/most-downloaded", auth="admin")),
+]
+
+
+# --- Server dan dataset ---
+
+def _dataset_counts() -> Dict[str, int]:
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return {
+            "users": db.query(models.User).count(),
+            "ebooks": db.query(models.Ebook).count(),
+            "activity": db.query(models.ActivityLog).count(),
+            "reviews": db.query(models.Review).count(),
+        }
+    finally:
+        db.close()
+
+
+def _start_server(port: int, workers: int) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app", "--app-dir", ROOT,
+        "--port", str(port), "--workers", str(workers), "--log-level", "warning", "--backlog", "4096",
+    ]
+    # Direktori kerja server berisi uploads/ milik dataset benchmark
+    process = subprocess.Popen(command, cwd=WORKDIR, env=dict(os.environ))
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/readyz", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Server tidak bisa dijalankan.")
+
+
+def _git_commit() -> Dict[str, Optional[str]]:
+    def git(*args):
+        try:
+            return subprocess.run(
+                ["git", *args], cwd=ROOT, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git("status", "--porcelain")
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(status) if status is not None else None}
+
+
+# --- Beban ---
+
+async def _login(client: httpx.AsyncClient, email: str) -> Dict[str, str]:
+    response = await client.post("/auth/login", data={"username": email, "password": seed.BENCHMARK_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _send(client: httpx.AsyncClient, request: Request, auth_headers: Dict[str, dict]) -> Tuple[int, int]:
+    headers = auth_headers[request.auth] if request.auth else None
+    response = await client.request(request.method, request.url, data=request.data, headers=headers)
+    body = await response.aread()
+    return response.status_code, len(body)
+
+
+async def _run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, context: dict, auth_headers: Dict[str, dict],
+    total: int, concurrency: int, warmup: int,
+) -> dict:
+    rng = random.Random(f"{seed.RANDOM_SEED}:{scenario.name}")
+    for _ in range(warmup):
+        await _send(client, scenario.build(rng, context), auth_headers)
+
+    requests = [scenario.build(rng, context) for _ in range(total)]
+    latencies: List[float] = []
+    sizes: List[int] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while requests:
+            request = requests.pop()
+            start = time.perf_counter()
+            try:
+                status_code, size = await _send(client, request, auth_headers)
+                sizes.append(size)
+                if status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    result = {
+        "requests": len(ordered),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        "mean_bytes": round(sum(sizes) / len(sizes)) if sizes else 0,
+    }
+    for label, fraction in PERCENTILES.items():
+        value = ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+        result[f"{label}_ms"] = round(value * 1000, 2)
+    return result
+
+
+async def run_suite(base_url: str, scenarios: List[Scenario], context: dict, args) -> Dict[str, dict]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        auth_headers = {
+            "admin": await _login(client, seed.ADMIN_EMAIL),
+            "user": await _login(client, seed.user_email(1)),
+        }
+        results = {}
+        for scenario in scenarios:
+            total = max(1, int(args.requests * scenario.weight))
+            results[scenario.name] = await _run_scenario(
+                client, scenario, context, auth_headers, total, args.concurrency, args.warmup
+            )
+            row = results[scenario.name]
+            print(
+                f"{scenario.name:24} {row['throughput_rps']:8.1f} req/s  p50={row['p50_ms']:7.1f}ms  "
+                f"p95={row['p95_ms']:7.1f}ms  p99={row['p99_ms']:7.1f}ms  {row['mean_bytes']:8d}B  error={row['errors']}",
+                file=sys.stderr,
+            )
+        return results
+
+
+# --- Perbandingan ---
+
+def compare(baseline: dict, current: dict, max_regression: Optional[float]) -> List[str]:
+    """Mencetak selisih per skenario; mengembalikan skenario yang melewati batas regresi."""
+    regressions = []
+    print(f"\nDibandingkan dengan commit {baseline['meta'].get('commit')}:", file=sys.stderr)
+    for name, row in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        p95_change = (row["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0.0
+        rps_change = (
+            (row["throughput_rps"] - old["throughput_rps"]) / old["throughput_rps"] * 100
+            if old["throughput_rps"] else 0.0
+        )
+        flag = ""
+        if max_regression is not None and (p95_change > max_regression or -rps_change > max_regression):
+            regressions.append(name)
+            flag = "  REGRESI"
+        print(f"{name:24} p95 {p95_change:+7.1f}%  throughput {rps_change:+7.1f}%{flag}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", choices=sorted(seed.PRESETS), default="small")
+    parser.add_argument("--requests", type=int, default=500, help="Jumlah request per skenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="Jumlah worker uvicorn")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--base-url", default=None, help="Pakai server yang sudah berjalan (dataset harus sudah ada).")
+    parser.add_argument("--scenario", action="append", default=None, help="Hanya skenario ini (boleh berulang).")
+    parser.add_argument("--output", default=None, help="File JSON hasil (default: stdout).")
+    parser.add_argument("--compare", default=None, help="File JSON hasil sebelumnya sebagai pembanding.")
+    parser.add_argument("--max-regression", type=float, default=None, help="Batas regresi dalam persen.")
+    args = parser.parse_args()
+
+    scenarios = [s for s in SCENARIOS if args.scenario is None or s.name in args.scenario]
+    if not seed.is_seeded():
+        start = time.perf_counter()
+        print(f"Membuat dataset '{args.size}'...", file=sys.stderr)
+        seed.seed(args.size, WORKDIR)
+        print(f"Dataset selesai dalam {time.perf_counter() - start:.1f} detik.", file=sys.stderr)
+    context = _dataset_counts()
+
+    process = None if args.base_url else _start_server(args.port, args.workers)
+    base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+    try:
+        results = asyncio.run(run_suite(base_url, scenarios, context, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    from sqlalchemy.engine import make_url
+
+    report = {
+        "meta": {
+            **_git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": make_url(os.environ["DATABASE_URL"]).get_backend_name(),
+            "dataset": context,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "replica": bool(os.environ.get("DATABASE_REPLICA_URL")),
+            "settings": {
+                name: os.environ[name]
+                for name in ("RESPONSE_CACHE_ENABLED", "USE_ASYNC_DB", "METRICS_ENABLED", "DB_POOL_SIZE", "DB_MAX_OVERFLOW")
+                if name in os.environ
+            },
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(json.load(handle), report, args.max_regression)
+        if regressions:
+            raise SystemExit(f"Regresi pada {len(regressions)} skenario: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
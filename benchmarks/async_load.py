@@ -0,0 +1,143 @@
+# benchmarks/async_load.py
+"""
+Membandingkan stack sync (thread pool Starlette + Session) dengan jalur async
+(USE_ASYNC_DB, AsyncSession + driver async) di bawah banyak koneksi serentak.
+
+Server dijalankan dengan uvicorn sebagai subprocess, sekali per mode, terhadap
+database yang sama. Klien httpx async membuka hingga ``--concurrency`` koneksi
+dan mencatat requests/detik serta p50/p99 per endpoint.
+
+Jalankan dari root repo (butuh uvicorn, httpx, dan driver async, mis.
+aiosqlite atau asyncpg):
+    python benchmarks/async_load.py --concurrency 1000 --requests 20000
+Tanpa DATABASE_URL, database SQLite sementara dibuat dan diisi otomatis.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench-async-')}/bench.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+ENDPOINTS = ["/ebooks/?limit=20", "/ebooks/?limit=20&sort_by=popular", "/ebooks/{ebook_id}"]
+
+
+def _seed(count: int) -> int:
+    """Mengisi katalog dengan ``count`` eBook jika masih kosong; mengembalikan id eBook contoh."""
+    from app import migrations, models
+    from app.database import SessionLocal, engine
+
+    migrations.migrate(engine)
+    db = SessionLocal()
+    try:
+        if db.query(models.Ebook).count() == 0:
+            db.add_all(
+                models.Ebook(
+                    title=f"Buku Benchmark {i}",
+                    author=f"Penulis {i % 50}",
+                    description="Deskripsi buku untuk pengujian beban.",
+                    publication_year=1990 + i % 30,
+                    file_path=f"uploads/bench-{i}.pdf",
+                    stats=models.EbookStats(download_count=i % 97),
+                )
+                for i in range(count)
+            )
+            db.commit()
+        return db.query(models.Ebook.id).order_by(models.Ebook.id).first()[0]
+    finally:
+        db.close()
+
+
+def _start_server(port: int, use_async: bool) -> subprocess.Popen:
+    env = dict(os.environ, USE_ASYNC_DB="true" if use_async else "false")
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--port", str(port), "--log-level", "warning", "--backlog", "4096",
+    ]
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/readyz", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Server tidak bisa dijalankan.")
+
+
+async def _run_load(base_url: str, path: str, total: int, concurrency: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies, errors = [], 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(path)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            while True:
+                try:
+                    url = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=10000, help="Jumlah request per endpoint")
+    parser.add_argument("--ebooks", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    ebook_id = _seed(args.ebooks)
+    for use_async in (False, True):
+        mode = "async" if use_async else "sync"
+        process = _start_server(args.port, use_async)
+        try:
+            for endpoint in ENDPOINTS:
+                path = endpoint.format(ebook_id=ebook_id)
+                latencies, errors, elapsed = asyncio.run(
+                    _run_load(f"http://127.0.0.1:{args.port}", path, args.requests, args.concurrency)
+                )
+                print(
+                    f"{mode:5} {endpoint:36} {len(latencies) / elapsed:8.1f} req/s  "
+                    f"p50={_percentile(latencies, 0.50) * 1000:7.1f}ms  "
+                    f"p99={_percentile(latencies, 0.99) * 1000:7.1f}ms  error={errors}"
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
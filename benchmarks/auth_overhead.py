@@ -0,0 +1,79 @@
+# benchmarks/auth_overhead.py
+"""
+Mengukur biaya autentikasi per request untuk dependency di app/security.py.
+
+Skenario:
+- tanpa cache : jwt.decode + lookup user ke database setiap request (perilaku lama)
+- dengan cache: token yang sudah diverifikasi dilayani dari TokenCache
+- admin       : get_current_admin_user memakai snapshot user yang sama (cache)
+
+Jalankan dari root repo:
+    python benchmarks/auth_overhead.py --iterations 20000
+Tanpa DATABASE_URL, benchmark memakai database SQLite sementara.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+WORKDIR = tempfile.mkdtemp(prefix="bench-auth-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORKDIR}/bench.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from app import models, security  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+
+
+def _timed(label, iterations, func):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / iterations * 1e6
+    print(f"{label:14} {per_call:9.1f} us/request  {iterations / elapsed:10.0f} request/s")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = db.query(models.User).filter(models.User.email == "bench@example.com").first()
+    if user is None:
+        user = models.User(name="Bench", email="bench@example.com", hashed_password="-", role="admin")
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+    token = security.create_access_token({"sub": user.email, "uid": user.id, "role": user.role})
+
+    db.close()
+
+    # Setiap request memakai sesi baru, seperti dependency get_db
+    def uncached():
+        security.token_cache.clear()
+        with SessionLocal() as session:
+            security.get_current_user(token=token, db=session)
+
+    def cached():
+        with SessionLocal() as session:
+            security.get_current_user(token=token, db=session)
+
+    def admin_cached():
+        with SessionLocal() as session:
+            security.get_current_admin_user(token=token, db=session)
+
+    before = _timed("tanpa cache", args.iterations, uncached)
+    after = _timed("dengan cache", args.iterations, cached)
+    _timed("admin", args.iterations, admin_cached)
+    print(f"percepatan jalur cache: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/file_delivery.py
+"""
+Mengukur biaya yang ditanggung worker Python untuk satu unduhan PDF pada
+setiap FILE_DELIVERY_MODE (lihat app/file_responses.py): waktu per request
+dan jumlah byte body yang melewati worker.
+
+Yang diukur hanya file_responses.deliver di dalam app ASGI minimal, tanpa
+autentikasi dan lookup database (biayanya sama untuk semua mode). Untuk
+x-accel / x-sendfile / signed, pengiriman isi file oleh nginx atau handler
+URL bertanda tangan tidak termasuk; itulah pekerjaan yang dipindahkan.
+
+Jalankan dari root repo:
+    python benchmarks/file_delivery.py --size-mb 20 --iterations 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+WORKDIR = tempfile.mkdtemp(prefix="bench-delivery-")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.chdir(WORKDIR)
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import file_responses, storage  # noqa: E402
+
+PDF_PATH = os.path.join(storage.UPLOAD_DIRECTORY, "blobs", "bench.pdf")
+
+
+def _write_pdf(size_mb: int):
+    os.makedirs(os.path.dirname(PDF_PATH), exist_ok=True)
+    with open(PDF_PATH, "wb") as handle:
+        handle.write(b"%PDF-1.4\n" + os.urandom(size_mb * 1024 * 1024) + b"\n%%EOF\n")
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/download/{mode}")
+    def download(mode: str, request: Request):
+        return file_responses.deliver(
+            request, PDF_PATH, media_type="application/pdf", filename="bench.pdf", mode=mode
+        )
+
+    return TestClient(app)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    _write_pdf(args.size_mb)
+    client = _client()
+    print(f"file {args.size_mb} MB, {args.iterations} request per mode")
+    for mode in file_responses.DELIVERY_MODES:
+        client.get(f"/download/{mode}", follow_redirects=False)
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            response = client.get(f"/download/{mode}", follow_redirects=False)
+        per_request = (time.perf_counter() - start) / args.iterations * 1000
+        print(f"{mode:11} {per_request:9.2f} ms/request  {len(response.content):10d} byte lewat worker  (status {response.status_code})")
+
+
+if __name__ == "__main__":
+    main()
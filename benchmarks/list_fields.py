@@ -0,0 +1,81 @@
+# benchmarks/list_fields.py
+"""
+Mengukur biaya satu halaman katalog 100 eBook di sisi server: bentuk lengkap
+(objek ORM + schemas.Ebook) dibandingkan proyeksi kolom lewat fields=
+(crud.get_ebook_rows + response_cache.dumps).
+
+Yang diukur adalah query + serialisasi, tanpa HTTP dan tanpa cache respons,
+yaitu pekerjaan yang dilakukan build() di GET /ebooks/ saat cache miss.
+Dicetak waktu per halaman dan ukuran body JSON untuk setiap varian.
+
+Jalankan dari root repo:
+    python benchmarks/list_fields.py --iterations 200
+Tanpa DATABASE_URL, dataset kecil dibuat di database SQLite sementara.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+WORKDIR = tempfile.mkdtemp(prefix="bench-fields-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORKDIR}/bench.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import seed  # noqa: E402
+from app import crud, response_cache, schemas  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+
+PAGE_SIZE = 100
+VARIANTS = {
+    "lengkap": None,
+    "summary": "summary",
+    "summary+kategori": "summary,categories",
+    "id,title": "id,title",
+}
+
+
+def _page(fields, sort_by):
+    # Sesi baru per halaman, seperti dependency get_read_db
+    with SessionLocal() as db:
+        if fields is None:
+            ebooks, _ = crud.get_ebooks_page(db, limit=PAGE_SIZE, sort_by=sort_by)
+            return response_cache.serialize(List[schemas.Ebook], ebooks)
+        rows, _ = crud.get_ebook_rows(db, fields, limit=PAGE_SIZE, sort_by=sort_by)
+        return response_cache.dumps(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--sort-by", default=None, choices=[None, "newest", "popular", "rating"])
+    parser.add_argument("--ebooks", type=int, default=2000)
+    args = parser.parse_args()
+
+    if not seed.is_seeded():
+        seed.seed("small", WORKDIR, ebooks=args.ebooks, activity=10_000, reviews=2000)
+
+    encoder = "orjson" if response_cache._orjson is not None else "pydantic_core"
+    print(f"halaman {PAGE_SIZE} eBook, sort_by={args.sort_by}, encoder={encoder}")
+    baseline = None
+    for label, value in VARIANTS.items():
+        fields = crud.parse_ebook_fields(value)
+        for _ in range(10):
+            _page(fields, args.sort_by)
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            body = _page(fields, args.sort_by)
+        per_page = (time.perf_counter() - start) / args.iterations * 1000
+        baseline = baseline or (per_page, len(body))
+        print(
+            f"{label:18} {per_page:8.2f} ms/halaman  {len(body):8d} byte  "
+            f"({baseline[0] / per_page:4.1f}x lebih cepat, {len(body) / baseline[1] * 100:5.1f}% ukuran)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/login_throughput.py
+"""
+Mengukur throughput verifikasi password (jalur /auth/login) terhadap
+tingkat konkurensi, termasuk berapa request yang ditolak 503 oleh
+admission control PasswordHasher.
+
+Jalankan dari root repo:
+    python benchmarks/login_throughput.py --requests 200 --concurrency 1 4 16 64
+Konfigurasi pool mengikuti BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, dan
+PASSWORD_HASH_QUEUE_LIMIT dari environment.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench-login-')}/bench.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from fastapi import HTTPException  # noqa: E402
+
+from app import security  # noqa: E402
+
+
+def _login(hashed):
+    start = time.perf_counter()
+    try:
+        security.verify_password("password-benchmark", hashed)
+        return time.perf_counter() - start, True
+    except HTTPException:
+        return time.perf_counter() - start, False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    hasher = security.password_hasher
+    print(
+        f"bcrypt rounds={security.BCRYPT_ROUNDS} workers={hasher.workers} "
+        f"queue_limit={hasher.queue_limit}"
+    )
+    hashed = security.get_password_hash("password-benchmark")
+
+    for concurrency in args.concurrency:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(_login, [hashed] * args.requests))
+        elapsed = time.perf_counter() - start
+        accepted = sorted(duration for duration, ok in results if ok)
+        rejected = len(results) - len(accepted)
+        p95 = accepted[int(len(accepted) * 0.95) - 1] if accepted else 0.0
+        print(
+            f"konkurensi={concurrency:4}  {len(accepted) / elapsed:7.1f} login/s  "
+            f"p50={statistics.median(accepted) * 1000 if accepted else 0:7.1f}ms  "
+            f"p95={p95 * 1000:7.1f}ms  ditolak(503)={rejected}"
+        )
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# benchmarks/seed.py
+"""
+Mengisi database dengan dataset sintetis untuk benchmark: user, kategori,
+eBook, log aktivitas, dan ulasan. Data dibangkitkan dari seed acak yang
+tetap, sehingga dua run dengan ukuran yang sama menghasilkan data identik.
+
+Baris dimasukkan lewat insert Core per chunk (bukan ORM) agar jutaan baris
+activity_log dan reviews bisa dimuat dalam hitungan menit. Tabel turunan
+(ebook_stats, rollup aktivitas, indeks pencarian) dihitung ulang setelahnya
+dengan fungsi yang sama dengan perintah manage.
+
+Dipakai oleh benchmarks/api_suite.py, atau sendiri:
+    DATABASE_URL=postgresql://... python benchmarks/seed.py --size large
+Semua user memakai password BENCHMARK_PASSWORD; admin-nya ADMIN_EMAIL.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PRESETS = {
+    "small": {"users": 200, "categories": 20, "ebooks": 2000, "activity": 100_000, "reviews": 10_000},
+    "medium": {"users": 5000, "categories": 50, "ebooks": 20_000, "activity": 1_000_000, "reviews": 200_000},
+    "large": {"users": 50_000, "categories": 100, "ebooks": 40_000, "activity": 5_000_000, "reviews": 1_000_000},
+}
+RANDOM_SEED = 20240601
+CHUNK_SIZE = 10_000
+ACTIVITY_DAYS = 365
+
+BENCHMARK_PASSWORD = "benchmark-password"
+ADMIN_EMAIL = "admin@benchmark.example.com"
+SAMPLE_PDF_PATH = os.path.join("uploads", "benchmark", "sample.pdf")
+
+# Kosakata judul; juga dipakai skenario pencarian di api_suite.py
+WORDS = [
+    "sejarah", "python", "algoritma", "ekonomi", "biologi", "fisika", "kimia", "matematika",
+    "hukum", "filsafat", "sastra", "puisi", "novel", "pemrograman", "jaringan", "statistik",
+    "akuntansi", "psikologi", "sosiologi", "geografi", "astronomi", "arsitektur", "musik",
+    "kuliner", "pertanian", "kesehatan", "manajemen", "pemasaran", "teknik", "data",
+]
+
+
+def user_email(index: int) -> str:
+    return f"user{index}@benchmark.example.com"
+
+
+def _insert_chunks(connection, table, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            connection.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        connection.execute(table.insert(), chunk)
+
+
+def _sync_sequences(connection, tables):
+    """PostgreSQL: sequence id dimajukan melewati id eksplisit hasil seed."""
+    if connection.dialect.name != "postgresql":
+        return
+    for table in tables:
+        connection.exec_driver_sql(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), (SELECT max(id) FROM {table.name}))"
+        )
+
+
+def _write_sample_pdf(workdir: str):
+    path = os.path.join(workdir, SAMPLE_PDF_PATH)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as handle:
+        handle.write(b"%PDF-1.4\n" + os.urandom(256 * 1024) + b"\n%%EOF\n")
+
+
+def is_seeded() -> bool:
+    from app import models
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        return db.query(models.User.id).filter(models.User.email == ADMIN_EMAIL).first() is not None
+    finally:
+        db.close()
+
+
+def seed(size: str = "small", workdir: str = ".", **overrides) -> dict:
+    """Membuat dataset ke DATABASE_URL; mengembalikan jumlah baris per jenis."""
+    from app import crud, migrations, models, search, security
+    from app.database import SessionLocal, engine
+
+    counts = dict(PRESETS[size], **{key: value for key, value in overrides.items() if value is not None})
+    rng = random.Random(RANDOM_SEED)
+    migrations.migrate(engine)
+    _write_sample_pdf(workdir)
+
+    # Semua user berbagi satu hash: bcrypt sengaja lambat
+    hashed = security.get_password_hash(BENCHMARK_PASSWORD)
+    security.password_hasher.shutdown()
+    now = datetime.now(timezone.utc)
+
+    with engine.begin() as connection:
+        _insert_chunks(connection, models.User.__table__, (
+            {
+                "id": index + 1,
+                "name": "Admin Benchmark" if index == 0 else f"Pembaca {index}",
+                "email": ADMIN_EMAIL if index == 0 else user_email(index),
+                "hashed_password": hashed,
+                "role": "admin" if index == 0 else "user",
+            }
+            for index in range(counts["users"])
+        ))
+        _insert_chunks(connection, models.Category.__table__, (
+            {"id": index + 1, "name": f"Kategori {WORDS[index % len(WORDS)]} {index}"}
+            for index in range(counts["categories"])
+        ))
+        _insert_chunks(connection, models.Ebook.__table__, (
+            {
+                "id": index + 1,
+                "title": " ".join(rng.sample(WORDS, 3)).title() + f" {index}",
+                "author": f"Penulis {rng.randrange(counts['ebooks'] // 10 + 1)}",
+                "description": "Buku tentang " + ", ".join(rng.sample(WORDS, 5)) + ".",
+                "publication_year": rng.randint(1950, 2024),
+                "file_path": SAMPLE_PDF_PATH,
+            }
+            for index in range(counts["ebooks"])
+        ))
+        _insert_chunks(connection, models.EbookCategory.__table__, (
+            {"ebook_id": ebook_id, "category_id": category_id}
+            for ebook_id in range(1, counts["ebooks"] + 1)
+            for category_id in rng.sample(range(1, counts["categories"] + 1), min(2, counts["categories"]))
+        ))
+        # Popularitas tidak merata: sebagian kecil buku mendapat sebagian besar unduhan
+        _insert_chunks(connection, models.ActivityLog.__table__, (
+            {
+                "user_id": rng.randint(1, counts["users"]),
+                "ebook_id": min(int(rng.paretovariate(1.2)), counts["ebooks"]),
+                "action": "download",
+                "timestamp": now - timedelta(seconds=rng.randrange(ACTIVITY_DAYS * 86400)),
+            }
+            for _ in range(counts["activity"])
+        ))
+        _insert_chunks(connection, models.Review.__table__, (
+            {
+                "user_id": rng.randint(1, counts["users"]),
+                "ebook_id": rng.randint(1, counts["ebooks"]),
+                "rating": rng.choice((1, 2, 3, 3, 4, 4, 4, 5, 5, 5)),
+                "comment": "Ulasan benchmark.",
+                "timestamp": now - timedelta(seconds=rng.randrange(ACTIVITY_DAYS * 86400)),
+            }
+            for _ in range(counts["reviews"])
+        ))
+        _sync_sequences(connection, (models.User.__table__, models.Category.__table__, models.Ebook.__table__))
+
+    db = SessionLocal()
+    try:
+        crud.rebuild_ebook_stats(db)
+        crud.rebuild_activity_rollups(db)
+        search.rebuild_index(db)
+        db.commit()
+    finally:
+        db.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", choices=sorted(PRESETS), default="small")
+    for name in PRESETS["small"]:
+        parser.add_argument(f"--{name}", type=int, default=None)
+    parser.add_argument("--workdir", default=".", help="Direktori kerja server (tempat uploads/).")
+    args = parser.parse_args()
+
+    if is_seeded():
+        raise SystemExit("Database sudah berisi dataset benchmark.")
+    start = time.perf_counter()
+    counts = seed(args.size, args.workdir, **{name: getattr(args, name) for name in PRESETS["small"]})
+    print(f"Dataset {counts} dibuat dalam {time.perf_counter() - start:.1f} detik.")
+
+
+if __name__ == "__main__":
+    main()
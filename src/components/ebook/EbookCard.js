@@ -5,9 +5,18 @@ import "./EbookCard.css";
 
 function EbookCard({ book }) {
   const defaultCover = "https://via.placeholder.com/150x200.png?text=No+Cover";
-  const coverImageUrl = book.cover_image_path
-    ? `http://localhost:8000/${book.cover_image_path}`
+  const thumbnails = book.cover_thumbnails || {};
+  // Pakai thumbnail kecil jika sudah tersedia, cover asli sebagai cadangan
+  const coverPath = thumbnails.md || book.cover_image_path;
+  const coverImageUrl = coverPath
+    ? `http://localhost:8000/${coverPath}`
     : defaultCover;
+  // Lebar varian sesuai THUMBNAIL_SIZES di backend (app/thumbnails.py)
+  const thumbnailWidths = { sm: 160, md: 320, lg: 640 };
+  const coverSrcSet = Object.keys(thumbnailWidths)
+    .filter((size) => thumbnails[size])
+    .map((size) => `http://localhost:8000/${thumbnails[size]} ${thumbnailWidths[size]}w`)
+    .join(", ");
 
   return (
     // Bungkus seluruh kartu dengan komponen Link
@@ -15,8 +24,12 @@ function EbookCard({ book }) {
       <div className="ebook-card">
         <img
           src={coverImageUrl}
+          srcSet={coverSrcSet || undefined}
+          sizes="200px"
           alt={`Cover of ${book.title}`}
           className="ebook-card-cover"
+          loading="lazy"
+          decoding="async"
         />
         <div className="ebook-card-body">
           <h3 className="ebook-card-title">{book.title}</h3>
@@ -4,10 +4,12 @@ import { useParams, useNavigate } from "react-router-dom";
 import {
   getEbookById,
   getReviewsForEbook,
+  getRelatedEbooks,
   downloadEbookFile,
 } from "../services/api";
 import { useAuth } from "../context/AuthContext";
 import AddReviewForm from "../components/reviews/AddReviewForm";
+import EbookList from "../components/ebook/EbookList";
 import "./EbookDetailPage.css";
 
 function EbookDetailPage() {
@@ -16,6 +18,8 @@ function EbookDetailPage() {
   const { isAuthenticated } = useAuth();
   const [ebook, setEbook] = useState(null);
   const [reviews, setReviews] = useState([]);
+  const [reviewSort, setReviewSort] = useState("newest");
+  const [relatedEbooks, setRelatedEbooks] = useState([]);
   const [loading, setLoading] = useState(true);
   const [isDownloading, setIsDownloading] = useState(false);
 
@@ -24,12 +28,8 @@ function EbookDetailPage() {
   useEffect(() => {
     const fetchDetails = async () => {
       try {
-        const [ebookResponse, reviewsResponse] = await Promise.all([
-          getEbookById(ebookId),
-          getReviewsForEbook(ebookId),
-        ]);
+        const ebookResponse = await getEbookById(ebookId);
         setEbook(ebookResponse.data);
-        setReviews(reviewsResponse.data);
       } catch (error) {
         console.error("Gagal mengambil detail e-book:", error);
       } finally {
@@ -38,11 +38,24 @@ function EbookDetailPage() {
     };
 
     fetchDetails();
+    // Rekomendasi bersifat tambahan: jika gagal, bagian ini cukup tidak ditampilkan
+    getRelatedEbooks(ebookId)
+      .then((response) => setRelatedEbooks(response.data))
+      .catch(() => setRelatedEbooks([]));
   }, [ebookId]);
 
-  // ✅ Callback tambah ulasan
+  useEffect(() => {
+    getReviewsForEbook(ebookId, reviewSort)
+      .then((response) => setReviews(response.data))
+      .catch((error) => console.error("Gagal mengambil ulasan:", error));
+  }, [ebookId, reviewSort]);
+
+  // ✅ Callback tambah ulasan; ringkasan rating diambil ulang dari server
   const handleReviewAdded = (newReview) => {
     setReviews([newReview, ...reviews]);
+    getEbookById(ebookId)
+      .then((response) => setEbook(response.data))
+      .catch(() => {});
   };
 
   // ✅ Handle download
@@ -94,6 +107,28 @@ function EbookDetailPage() {
           <h1>{ebook.title}</h1>
           <p className="author">oleh {ebook.author}</p>
           <p className="year">Tahun Terbit: {ebook.publication_year}</p>
+          {ebook.rating && ebook.rating.count > 0 && (
+            <div className="rating-summary">
+              <p>
+                <strong>{ebook.rating.average.toFixed(1)}/5</strong> dari{" "}
+                {ebook.rating.count} ulasan
+              </p>
+              {[5, 4, 3, 2, 1].map((star) => (
+                <div key={star} className="rating-row">
+                  <span>{star}★</span>
+                  <div className="rating-bar">
+                    <div
+                      className="rating-bar-fill"
+                      style={{
+                        width: `${(ebook.rating.histogram[star] / ebook.rating.count) * 100}%`,
+                      }}
+                    />
+                  </div>
+                  <span>{ebook.rating.histogram[star]}</span>
+                </div>
+              ))}
+            </div>
+          )}
           <h3>Deskripsi</h3>
           <p>{ebook.description || "Tidak ada deskripsi."}</p>
 
@@ -113,9 +148,27 @@ function EbookDetailPage() {
         </div>
       </div>
 
+      {relatedEbooks.length > 0 && (
+        <div className="detail-related">
+          <h2>Pembaca yang mengunduh buku ini juga mengunduh</h2>
+          <EbookList ebooks={relatedEbooks} />
+        </div>
+      )}
+
       <div className="detail-reviews">
         <h2>Ulasan Pengguna</h2>
 
+        <select
+          value={reviewSort}
+          onChange={(event) => setReviewSort(event.target.value)}
+          className="review-sort"
+        >
+          <option value="newest">Terbaru</option>
+          <option value="oldest">Terlama</option>
+          <option value="highest">Rating tertinggi</option>
+          <option value="lowest">Rating terendah</option>
+        </select>
+
         {isAuthenticated && (
           <AddReviewForm ebookId={ebookId} onReviewAdded={handleReviewAdded} />
         )}
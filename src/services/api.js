@@ -21,8 +21,8 @@ apiClient.interceptors.request.use(
 );
 
 export const getAllEbooks = (searchQuery) => {
-  // Siapkan parameter URL
-  const params = {};
+  // Siapkan parameter URL; daftar hanya butuh field kartu (tanpa deskripsi)
+  const params = { fields: "summary" };
   if (searchQuery) {
     params.search = searchQuery;
   }
@@ -83,9 +83,14 @@ export const getEbookById = (ebookId) => {
   return apiClient.get(`/ebooks/${ebookId}`);
 };
 
-// Mengambil ulasan untuk sebuah e-book
-export const getReviewsForEbook = (ebookId) => {
-  return apiClient.get(`/ebooks/${ebookId}/reviews`);
+// Mengambil e-book yang juga diunduh oleh pembaca e-book ini
+export const getRelatedEbooks = (ebookId) => {
+  return apiClient.get(`/ebooks/${ebookId}/related`, { params: { limit: 6 } });
+};
+
+// Mengambil ulasan untuk sebuah e-book (sort: oldest, newest, highest, lowest)
+export const getReviewsForEbook = (ebookId, sort = "newest") => {
+  return apiClient.get(`/ebooks/${ebookId}/reviews`, { params: { sort } });
 };
 
 // Menambahkan ulasan baru untuk sebuah e-book
@@ -0,0 +1,149 @@
+# tests/test_query_counts.py
+"""
+Pemeriksaan anggaran query per endpoint (deteksi N+1).
+
+Setiap endpoint list dipanggil dua kali terhadap database SQLite di memori
+dengan jumlah data yang berbeda. Jika jumlah query ikut bertambah seiring
+ukuran hasil, berarti ada relasi yang masih dimuat secara lazy per baris.
+
+Lifespan aplikasi tidak dijalankan (tanpa migrasi, warm-up pool, maupun
+layanan latar belakang) dan database dari DATABASE_URL tidak pernah disentuh.
+
+Dijalankan dari root repo:
+    python -m pytest tests
+"""
+import os
+
+# app.database membuat engine saat diimpor; engine ini tidak pernah dipakai di sini
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from typing import Dict, Tuple  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app import database, models, response_cache, security  # noqa: E402
+from app.database import Base, count_queries, get_db, get_read_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+# Endpoint yang diperiksa; {ebook_id} diganti dengan eBook yang punya ulasan
+ENDPOINTS = [
+    "/ebooks/?limit=100",
+    "/ebooks/?limit=100&sort_by=newest",
+    "/ebooks/?limit=100&sort_by=popular",
+    "/ebooks/?limit=100&sort_by=rating",
+    "/ebooks/?limit=100&fields=summary,categories",
+    "/ebooks/{ebook_id}",
+    "/ebooks/{ebook_id}/reviews/?limit=100",
+    "/ebooks/{ebook_id}/reviews/?limit=100&sort=highest",
+    "/users/me/favorites",
+    "/users/me/history?limit=100",
+    "/admin/stats/most-downloaded",
+    "/admin/stats/summary",
+    "/admin/stats/summary?start=2000-01-01T00:00:00Z&end=2100-01-01T00:00:00Z",
+    "/admin/monitoring/latest",
+]
+
+SMALL, LARGE = 3, 30
+
+
+def _seed(db, size: int) -> Tuple[models.User, int]:
+    """Mengisi database dengan ``size`` eBook, ulasan, favorit, dan riwayat."""
+    categories = [models.Category(name=f"Kategori {i}") for i in range(3)]
+    users = [
+        models.User(name=f"Pembaca {i}", email=f"pembaca{i}@example.com", hashed_password="-", role="admin")
+        for i in range(size)
+    ]
+    ebooks = [
+        models.Ebook(
+            title=f"Buku {i}",
+            author=f"Penulis {i}",
+            publication_year=2000 + i,
+            file_path=f"uploads/buku-{i}.pdf",
+            categories=categories[: 1 + i % 3],
+            stats=models.EbookStats(download_count=1, review_count=1, rating_sum=4, rating_avg=4.0),
+        )
+        for i in range(size)
+    ]
+    db.add_all(categories + users + ebooks)
+    db.flush()
+
+    reader = users[0]
+    for user in users:
+        db.add(models.Review(rating=4, comment="Bagus", user_id=user.id, ebook_id=ebooks[0].id))
+    for ebook in ebooks:
+        db.add(models.Favorite(user_id=reader.id, ebook_id=ebook.id))
+        db.add(models.ActivityLog(user_id=reader.id, ebook_id=ebook.id, action="download"))
+    db.commit()
+    # User dipakai di luar sesi ini sebagai hasil dependency autentikasi
+    db.refresh(reader)
+    db.expunge(reader)
+    return reader, ebooks[0].id
+
+
+def _measure(size: int) -> Dict[str, int]:
+    """Menghitung jumlah query setiap endpoint untuk dataset berukuran ``size``."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    db = Session()
+    reader, ebook_id = _seed(db, size)
+    db.close()
+
+    def _get_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    overrides = {
+        get_db: _get_db,
+        get_read_db: _get_db,
+        response_cache.get_catalog_db: _get_db,
+        security.get_current_user: lambda: reader,
+        security.get_current_admin_user: lambda: reader,
+    }
+    app.dependency_overrides.update(overrides)
+    # Cache respons dimatikan agar setiap request benar-benar menjalankan query
+    cache_enabled = response_cache.catalog_cache.enabled
+    response_cache.catalog_cache.enabled = False
+    counts = {}
+    try:
+        # Tanpa `with`: TestClient tidak menjalankan lifespan aplikasi
+        client = TestClient(app)
+        with count_queries(database.engine) as primary, count_queries(database.read_engine) as replica:
+            for endpoint in ENDPOINTS:
+                url = endpoint.format(ebook_id=ebook_id)
+                with count_queries(engine) as statements:
+                    response = client.get(url)
+                response.raise_for_status()
+                counts[endpoint] = len(statements)
+        assert not primary and not replica, "Endpoint memakai engine aplikasi, bukan database uji"
+    finally:
+        for dependency in overrides:
+            app.dependency_overrides.pop(dependency, None)
+        response_cache.catalog_cache.enabled = cache_enabled
+        engine.dispose()
+    return counts
+
+
+@pytest.fixture(scope="module")
+def query_counts() -> Tuple[Dict[str, int], Dict[str, int]]:
+    return _measure(SMALL), _measure(LARGE)
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_query_count_does_not_grow_with_result_size(query_counts, endpoint):
+    small, large = query_counts
+    assert large[endpoint] == small[endpoint], (
+        f"{endpoint}: {small[endpoint]} query untuk {SMALL} baris, {large[endpoint]} untuk {LARGE} (pola N+1)"
+    )